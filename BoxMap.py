@@ -1,6 +1,12 @@
-from BoxMap_assets import Hallway, Room, MST, MinimumSpanningTree, FloorTile, WallTile
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+from BoxMap_assets import Hallway, Room, RoomIndex, GridRoomIndex, RoomRaster, SparseRoomRaster, OccupancyGrid, TileView, MST, FloorTile, WallTile, Target
+from BoxMap_assets import pack_links, unpack_links
+from BoxMap_assets import BuildStats, timed
+from BoxMap_assets import MapChunk, ChunkTarget, ChunkRoomTarget, plan_hallways
+from BoxMap_assets.chunks import cell_uniforms
+from collections import OrderedDict
+from math import floor
+import numpy as np
+import random
 
 
 
@@ -11,10 +17,39 @@ class BoxMap():
     
     The self.floors variable is a dictionary with coordinates mapped to floor tiles.
     Targets can be extracted from the floor tiles. (See FloorTile class in Tile.py)
+
+    room_index is called with no arguments to make the RoomIndex every room containment
+    query goes through. By default rooms are bucketed in a grid sized to the largest room.
+
+    With grid=True the hallway tiles stay in an OccupancyGrid (self.grid) and get_floors()/get_walls()
+    return lazy views that only build tile objects when they are accessed. Target traversal counts
+    then live in self.grid.traversals.
+
+    Rooms and target offsets are drawn from rng, which defaults to the MST's rng so the whole map
+    follows from the MST seed.
+
+    stats turns on instrumentation (see BoxMap_assets/stats.py): a BuildStats to add to, or True for a new one.
+    It defaults to the MST's stats. The stats end up in self.stats and are passed to on_stats when the
+    map is built. Without stats, self.stats is None and nothing is counted.
     """
-    def __init__(self, mst: MST, target_offset=0) -> None:
+    stats: BuildStats = None
+    grid: OccupancyGrid = None  # pickles from before the grid backend have no grid
+
+    def __init__(self, mst: MST, target_offset=0, room_index=None, grid: bool = False, rng: random.Random = None,
+                 stats: BuildStats = None, on_stats=None) -> None:
         self.map = mst
-        self.floors, self.walls = _build(mst, target_offset)
+        if room_index is None:
+            room_index = lambda: GridRoomIndex(2 * mst.get_max_room_size())
+        if rng is None:
+            rng = mst.get_rng()
+        if stats is None:
+            stats = mst.stats
+        elif stats is True:
+            stats = BuildStats()
+        self.floors, self.walls, self.grid = _build(mst, target_offset, room_index, grid, rng, stats)
+        self.stats = stats
+        if on_stats is not None and stats is not None:
+            on_stats(stats)
         
         
     def get_floors(self) -> list[FloorTile]:
@@ -23,128 +58,336 @@ class BoxMap():
         return self.walls
     def get_seed(self) -> int:
         return self.map.get_seed()
+
+    def __getstate__(self) -> dict:
+        # Target links are stored as indices, so pickling doesn't recurse along the hallways
+        state = self.__dict__.copy()
+        if self.grid is None:
+            targets = [floor.get_target() for floor in self.floors]
+        else:
+            # Only the targets built so far, the rest of the grid stays lazy
+            targets = [floor.get_target() for floor in self.floors._tiles] + list(self.grid._targets.values())
+        state["_target_links"] = pack_links(targets)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        links = state.pop("_target_links", None)
+        self.__dict__.update(state)
+        if links is not None:
+            unpack_links(links)
     
-    def draw_map(self, show: bool = False):
+    def draw_map(self, show: bool = False, scale: int = None):
         """
-        Draws a matplotlib graph of the tiles to visualize the tile map.
+        Draws a matplotlib graph of the tiles to visualize the tile map (see map_render.draw_map).
+        matplotlib is only imported when a map is drawn, so using maps without drawing them stays light.
         """
-        _, ax = plt.subplots()
+        from map_render import draw_map
+        return draw_map(self, show, scale)
+
+class ChunkedBoxMap():
+    """
+    Map of rooms and hallways whose tiles are built one square chunk at a time, when they are first needed.
+    For maps too big to hold every tile in memory.
 
-        x, y = self.map.map_size
-        ax.set_xlim(0, x)
-        ax.set_ylim(0, y)
+    The MST, the rooms and a compact plan of every hallway are made up front (see BoxMap_assets/chunks.py).
+    The floors, walls and hallway targets of a chunk are built from the plan the first time the chunk is
+    asked for, and kept in an LRU cache of max_chunks chunks. A chunk only depends on the plan, so it comes
+    out the same whichever chunks were built before it, and hallways crossing a chunk border line up.
+    With target_offset=0 the tiles are exactly the ones BoxMap builds, split by chunk.
 
-        color_map = {
-            "floor": 'grey',
-            "wall": 'green',
-            "target": 'red',
-            "traversed_target": 'green',
-            "connection": 'purple'
-        }
+    Rooms are placed with rng like in BoxMap. Hallway target offsets are drawn from a hash of the MST seed
+    and the cell instead, since drawing them from rng would depend on the order chunks are built in.
+    find_target() expects target_offset below 1.
 
-        # Plot floor tiles
-        for tile in self.get_floors():  # Assuming get_floors() returns iterable of floor tiles
-            left_x, bottom_y, right_x, top_y = tile.get_boundaries()
+    Hallway traversal counts live in self.traversals by cell, so nothing is lost when a chunk is evicted.
+    get_floors()/get_walls() return every tile in BoxMap's order, which builds every chunk.
+    Chunk cache hits, misses and evictions are counted in self.chunk_stats. The build isn't instrumented,
+    so self.stats is None like a BoxMap built without stats.
+    """
+    stats: BuildStats = None
+    def __init__(self, mst: MST, target_offset=0, chunk_size: int = 64, max_chunks: int = 256, room_index=None,
+                 rng: random.Random = None) -> None:
+        self.map = mst
+        self.target_offset = target_offset
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        if room_index is None:
+            room_index = lambda: GridRoomIndex(2 * mst.get_max_room_size())
+        if rng is None:
+            rng = mst.get_rng()
 
-            width = right_x - left_x
-            height = top_y - bottom_y
+        rooms = _construct_rooms(mst.get_vertices(), mst.get_max_room_size(), target_offset, room_index(), rng)
+        self.rooms: list[Room] = list(rooms)
+        self.plan = plan_hallways(_hallway_blueprint(mst), rooms, mst.get_map_size(), chunk_size)
 
-            # Corrected to use bottom-left corner for Rectangle
-            rect = patches.Rectangle((left_x, bottom_y), width, height, linewidth=0.2, edgecolor='none', facecolor=color_map["floor"])
-            ax.add_patch(rect)
+        self.traversals: dict[int, int] = {}  # cell -> times its hallway target was traversed
+        self.chunks: OrderedDict[tuple, MapChunk] = OrderedDict()
+        self.chunk_stats = {"hits": 0, "misses": 0, "evictions": 0}
 
-            # Add target
-            target = tile.get_target()
-            target_X, target_Y = target.get_coordinates()
-            target_color = "target" if target.get_times_traversed() == 0 else 'traversed_target'
-            target_patch = patches.Circle((target_X, target_Y), 0.1, color=color_map[target_color])
-            ax.add_patch(target_patch)
-            
-            # Draw connections to other targets
-            for connected_target in target.get_adjacent_targets():
-                x, y = connected_target.get_coordinates()
-                plt.plot([target_X, x], [target_Y, y], color=color_map["connection"], linewidth=0.5)
+        # Room targets find their hallway targets through the map. A room's tiles belong to the chunk of its vertex
+        self.room_targets: list[ChunkRoomTarget] = []
+        self._room_chunks: dict[tuple, list[Room]] = {}
+        for i, (room, vertex) in enumerate(zip(self.rooms, mst.get_vertices())):
+            target = ChunkRoomTarget(self, i, *room.get_target().get_coordinates())
+            room.get_floor().target = target
+            self.room_targets.append(target)
+            self._room_chunks.setdefault(self.chunk_key(*vertex), []).append(room)
+        self._room_targets_at = {target.get_coordinates(): target for target in self.room_targets}
+        self._room_cells: dict[int, list[int]] = {}
+        self._num_hallway_floors = None
+        self._visible_room_targets: list[ChunkRoomTarget] = None
 
+    def get_seed(self) -> int:
+        return self.map.get_seed()
 
-        # Plot wall tiles
-        for tile in self.get_walls():
-            left_x, bottom_y, right_x, top_y = tile.get_boundaries()
+    def chunk_key(self, x, y) -> tuple:
+        return x // self.chunk_size, y // self.chunk_size
+    def get_chunk_keys(self) -> list[tuple]:
+        """
+        Every chunk with tiles in it
+        """
+        return sorted(set(self.plan.pieces) | set(self._room_chunks))
 
-            width = right_x - left_x
-            height = top_y - bottom_y
+    def get_chunk(self, key: tuple) -> MapChunk:
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            self.chunk_stats["hits"] += 1
+            return chunk
+        self.chunk_stats["misses"] += 1
+        chunk = self._build_chunk(key)
+        self.chunks[key] = chunk
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+            self.chunk_stats["evictions"] += 1
+        return chunk
 
-            # Corrected to use bottom-left corner for Rectangle
-            rect = patches.Rectangle((left_x, bottom_y), width, height, linewidth=1, edgecolor='black', facecolor=color_map["wall"])
-            ax.add_patch(rect)
+    def get_chunk_at(self, x, y) -> MapChunk:
+        return self.get_chunk(self.chunk_key(x, y))
+
+    def find_target(self, coordinates: tuple) -> Target:
+        """
+        The target at coordinates, or None. Like in a TargetHandler filled from BoxMap's floors, a hallway
+        target hides a room target with the same coordinates
+        """
+        x, y = floor(coordinates[0]), floor(coordinates[1])
+        # With an offset the target can be off its own cell, by less than one cell
+        for cell_x, cell_y in ((x, y), (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1),
+                               (x - 1, y - 1), (x - 1, y + 1), (x + 1, y - 1), (x + 1, y + 1)):
+            target = self.get_chunk_at(cell_x, cell_y).targets.get(self.plan.cell(cell_x, cell_y))
+            if target is not None and target.get_coordinates() == coordinates:
+                return target
+        return self._room_targets_at.get(coordinates)
+
+    def get_floors(self) -> list[FloorTile]:
+        """
+        Every floor, in the order BoxMap has them. Builds every chunk
+        """
+        hallway_floors = []
+        for key in self.get_chunk_keys():
+            chunk = self.get_chunk(key)
+            hallway_floors += zip(chunk.contents.floor_keys, chunk.hallway_floors)
+        hallway_floors.sort(key=lambda keyed: keyed[0])
+        return [room.get_floor() for room in self.rooms] + [tile for _, tile in hallway_floors]
+
+    def get_walls(self) -> list[WallTile]:
+        """
+        Every wall, in the order BoxMap has them. Builds every chunk
+        """
+        hallway_walls = []
+        for key in self.get_chunk_keys():
+            chunk = self.get_chunk(key)
+            hallway_walls += zip(chunk.contents.wall_keys, chunk.hallway_walls)
+        hallway_walls.sort(key=lambda keyed: keyed[0])
+        return [wall for room in self.rooms for wall in room.get_walls()] + [tile for _, tile in hallway_walls]
+
+    def count_targets(self) -> int:
+        """
+        Number of targets find_target can reach, like the number of targets in a TargetHandler.
+        Replays the plan without building tiles
+        """
+        if self._num_hallway_floors is None:
+            self._num_hallway_floors = 0
+            hidden = set()
+            for key in self.plan.pieces:
+                floor_order = self.plan.build(key).floor_order
+                self._num_hallway_floors += len(floor_order)
+                hidden.update(coordinates for coordinates in zip(*self._target_coordinates(floor_order))
+                              if coordinates in self._room_targets_at)
+            self._visible_room_targets = [target for coordinates, target in self._room_targets_at.items()
+                                          if coordinates not in hidden]
+        return len(self._visible_room_targets) + self._num_hallway_floors
+
+    def count_untraversed(self) -> int:
+        """
+        Number of targets find_target can reach that were never traversed
+        """
+        self.count_targets()
+        untraversed_rooms = sum(1 for target in self._visible_room_targets if target.get_times_traversed() == 0)
+        return untraversed_rooms + self._num_hallway_floors - len(self.traversals)
+
+    def reset_traversals(self) -> None:
+        self.traversals.clear()
+        for target in self.room_targets:
+            target.reset()
+
+    def draw_map(self, show: bool = False, scale: int = None):
+        """
+        Draws the whole map like BoxMap.draw_map, which builds every chunk
+        """
+        from map_render import draw_map
+        return draw_map(self, show, scale)
+
+    def _build_chunk(self, key: tuple) -> MapChunk:
+        contents = self.plan.build(key)
+        target_x, target_y = self._target_coordinates(contents.floor_order)
+        targets = {cell: ChunkTarget(self, cell, x, y) for cell, x, y in zip(contents.floor_order, target_x, target_y)}
+        return MapChunk(contents, self.plan, self._room_chunks.get(key, []), targets)
+
+    def _target_coordinates(self, cells: list[int]) -> tuple[list, list]:
+        """
+        x and y of the hallway targets on cells: the cell centres, moved by the hashed offsets
+        """
+        cells = np.array(cells, dtype=np.int64)
+        columns, rows = np.divmod(cells, self.plan.shape[1])
+        target_x = columns - self.plan.padding + 0.5
+        target_y = rows - self.plan.padding + 0.5
+        if self.target_offset != 0:
+            seed = self.get_seed()
+            target_x += (2 * cell_uniforms(seed, cells, 0) - 1) * self.target_offset
+            target_y += (2 * cell_uniforms(seed, cells, 1) - 1) * self.target_offset
+        return target_x.tolist(), target_y.tolist()
+
+    def _contents(self, cell: int):
+        return self.get_chunk(self.plan.chunk_of(cell)).contents
+
+    def _hallway_adjacency(self, cell: int) -> tuple[Target, ...]:
+        """
+        Floors directly above, below, left and right of cell, then the rooms linked to it, like GridTarget
+        """
+        height = self.plan.shape[1]
+        adjacent_targets = []
+        for neighbour in (cell - height, cell + height, cell - 1, cell + 1):
+            chunk = self.get_chunk(self.plan.chunk_of(neighbour))
+            if chunk.contents.is_floor(neighbour):
+                adjacent_targets.append(chunk.targets[neighbour])
+        for room in self._contents(cell).room_links.get(cell, ()):
+            if self.room_targets[room] not in adjacent_targets:
+                adjacent_targets.append(self.room_targets[room])
+        return tuple(adjacent_targets)
+
+    def _room_adjacency(self, room: int) -> tuple[Target, ...]:
+        """
+        Hallway floors linked to the room, in floor order
+        """
+        cells = self._room_cells.get(room)
+        if cells is None:
+            # The plan has every cell the room may be linked to, the chunks know which links were made
+            cells = [cell for cell in dict.fromkeys(self.plan.room_cells.get(room, ()))
+                     if room in self._contents(cell).room_links.get(cell, ())]
+            cells.sort(key=lambda cell: self._contents(cell).floor_key(cell))
+            self._room_cells[room] = cells
+        return tuple(self.get_chunk(self.plan.chunk_of(cell)).targets[cell] for cell in cells)
 
-        if show:
-            plt.show()
 
 def _hallway_blueprint(mst: MST) -> list:
-    # save the hallway as a list of point pairs
-    hallways = []
-    # Get Room Centers
+    # save the hallway as a list of point pairs, one per pair of room indices (i < j) that are connected,
+    # ordered by (i, j). Duplicate rooms get a hallway for every copy.
     vertices = mst.get_vertices()
-    n = len(vertices)
-
-    for i in range(n):
-        vertex1 = vertices[i]
-        for j in range(i+1,n):
-            vertex2 = vertices[j]
-            if MinimumSpanningTree.directly_connected(mst, vertex1, vertex2):
-                room1 = vertex1
-                room2 = vertex2
-                # build hallway between those points
-                hallways.append((room1, room2))
-    return hallways
+    indices = {}
+    for i, vertex in enumerate(vertices):
+        indices.setdefault(vertex, []).append(i)
+
+    index_pairs = []
+    for room1, room2, _ in mst.get_edges():
+        for i in indices[room1]:
+            for j in indices[room2]:
+                if i < j or (i > j and room1 != room2):
+                    index_pairs.append((min(i, j), max(i, j)))
+    index_pairs.sort()
+    # build hallway between those points
+    return [(vertices[i], vertices[j]) for i, j in index_pairs]
 
-def _construct_rooms(planned_rooms: list, max_size: int, target_offset) -> list[Room]:
-    # list of rooms, passed into Room class to avoid collisions and overwriting
-    rooms = []
+def _construct_rooms(planned_rooms: list, max_size: int, target_offset, rooms: RoomIndex, rng: random.Random,
+                     stats: BuildStats = None) -> RoomIndex:
+    # index of rooms, passed into Room class to avoid collisions and overwriting
     for room in planned_rooms:
-        addition = Room(room, max_size, rooms, target_offset)
-        rooms.append(addition)
+        addition = Room(room, max_size, rooms, target_offset, rng)
+        rooms.add(addition)
+    if stats is not None:
+        # Each room's walls ask the index for the rooms overlapping each of its four sides
+        stats.count("overlap_queries", 4 * len(planned_rooms))
     return rooms
 
-def _construct_hallways(planned_hallways: list[tuple], rooms, target_offset) -> tuple:
-    walls = []
+_CELLS_PER_ROOM_CELL = 64  # rooms are rasterised up to this many map cells per cell in a room
+
+def _room_raster(rooms: RoomIndex, grid: OccupancyGrid) -> RoomRaster:
+    """
+    Rasterises the rooms once, so every hallway can check whole runs of cells against them.
+    On maps that are mostly empty the raster would be mostly -1, so rooms are looked up along
+    each run instead.
+    """
+    room_cells = sum((right_x - left_x) * (top_y - bottom_y) for left_x, bottom_y, right_x, top_y
+                     in (room.boundaries for room in rooms))
+    if grid.shape[0] * grid.shape[1] > _CELLS_PER_ROOM_CELL * room_cells:
+        return SparseRoomRaster(grid, rooms)
+    return RoomRaster(grid, rooms)
+
+def _construct_hallways(planned_hallways: list[tuple], rooms: RoomIndex, grid: OccupancyGrid,
+                        stats: BuildStats = None) -> list[Hallway]:
     hallways = []
-    floors = []
-    floor_locations: dict[tuple, FloorTile] = {}
-    wall_locations: dict[tuple, WallTile] = {}
+    room_raster = _room_raster(rooms, grid)
     # Build Hallway floors
     for start, end in planned_hallways:
-        hallway = Hallway(start, end, rooms, floor_locations, wall_locations, target_offset)
+        hallway = Hallway(start, end, room_raster, grid, stats)
         hallways.append(hallway)
-        floors.extend(hallway.get_floors())
-        walls.extend(hallway.get_walls())
     # Build hallway walls
     for hallway in hallways:
-        hallway.build_walls(hallways, rooms, floors) # TODO: finish function
-        # walls.append(hallway.get_walls())
-    return floors, walls
+        hallway.build_walls(hallways, rooms, grid) # TODO: finish function
+    return hallways
 
-def _build(mst: MST, target_offset) -> tuple:
+def _build(mst: MST, target_offset, room_index, use_grid: bool, rng: random.Random, stats: BuildStats = None) -> tuple:
     """
-    Returns: a list of rooms and hallways
+    Returns: floors, walls and the hallway grid (None unless use_grid is set)
     """
     floors = []
     walls = []
     
     # Create blueprint
     planned_rooms = mst.get_vertices()
-    planned_hallways = _hallway_blueprint(mst)
+    with timed(stats, "blueprint"):
+        planned_hallways = _hallway_blueprint(mst)
 
     # place rooms
-    rooms = _construct_rooms(planned_rooms, mst.get_max_room_size(), target_offset)
+    with timed(stats, "rooms"):
+        rooms = _construct_rooms(planned_rooms, mst.get_max_room_size(), target_offset, room_index(), rng, stats)
     # connect rooms
-    hallway_floors, hallway_walls = _construct_hallways(planned_hallways, rooms, target_offset)
-
-    # separate floors and walls
-    for room in rooms:
-        floors.append(room.get_floor())
-        walls += room.get_walls()
-    floors += hallway_floors
-    walls += hallway_walls
-    
-    return floors, walls
+    with timed(stats, "hallways"):
+        grid = OccupancyGrid(mst.get_map_size(), target_offset, rng)
+        _construct_hallways(planned_hallways, rooms, grid, stats)
+
+    with timed(stats, "tiles"):
+        # separate floors and walls
+        for room in rooms:
+            floors.append(room.get_floor())
+            walls += room.get_walls()
+
+        if use_grid:
+            grid.link_room_targets()
+            result = TileView(floors, grid.floor_order, grid.floor_tile), TileView(walls, grid.wall_order, grid.wall_tile), grid
+        else:
+            hallway_floors, hallway_walls = grid.build_tiles()
+            result = floors + hallway_floors, walls + hallway_walls, None
+        if stats is not None:
+            _count_tiles(stats, len(floors), len(walls), grid)
+    return result
+
+def _count_tiles(stats: BuildStats, room_floors: int, room_walls: int, grid: OccupancyGrid) -> None:
+    stats.count("maps")
+    stats.count("room_floors", room_floors)
+    stats.count("room_walls", room_walls)
+    stats.count("hallway_floors", len(grid.floor_order))
+    stats.count("hallway_walls", len(grid.wall_order))
+    stats.count("walls_replaced_by_floors", grid.count_replaced_walls())
+    stats.count("room_links", sum(len(room_targets) for room_targets in grid.room_links.values()))
+    stats.count("target_links", grid.count_links())
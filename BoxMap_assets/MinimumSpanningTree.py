@@ -1,18 +1,57 @@
 import random
 import heapq
+import bisect
+import numpy as np
+from .stats import BuildStats, timed
 
 class MST():
     """
     This class creates a minimum spanning tree using a dictionary with (X,Y) vertices as
     the keys and a value of a list of vertices that the key is connected to.
+
+    backend="complete" connects every room to every other room before running Prim's.
+    backend="sparse" only keeps the candidate edges that can be in a Manhattan MST, which
+    scales to thousands of rooms and gives a tree with the same total weight.
+    backend="array" keeps the vertices in an (n, 2) numpy array (self.points) and runs Prim's on
+    distance rows computed in bulk, with no heap and no edge tuples.
+    Every backend places the same rooms for a seed and gives a tree of the same total length, but where
+    rooms are equally far apart they can pick different connections, so the hallways can differ.
+
+    All randomness for the map comes from rng, a random.Random seeded with seed unless one is passed in.
+    BoxMap keeps drawing from the same rng, so a seed always gives the same map, whatever else
+    is using the random module.
+
+    With a BuildStats as stats, the construction stages and add_cycles are timed into it, and a
+    BoxMap built from this MST reports into it too (see stats.py). It is not pickled.
     """
-    def __init__(self, num_points: int, map_size_x: int, map_size_y: int, max_room_size: int, seed: int) -> None:
+    stats: BuildStats = None
+
+    def __init__(self, num_points: int, map_size_x: int, map_size_y: int, max_room_size: int, seed: int,
+                 backend: str = "complete", rng: random.Random = None, stats: BuildStats = None) -> None:
         self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
         self.map_size = (map_size_x, map_size_y)
         self.max_room_size = max_room_size
-        self.vertices = _create_points(num_points, map_size_x, map_size_y, max_room_size)
-        graph = _generate_graph(self.vertices)
-        self.mst = _prims_algorithm(graph, next(iter(graph)))
+        self.backend = backend
+        self.stats = stats
+        if backend == "array":
+            with timed(stats, "points"):
+                self.points = _create_point_array(num_points, map_size_x, map_size_y, max_room_size, self.rng)
+                self.vertices = [tuple(point) for point in self.points.tolist()]
+            with timed(stats, "mst"):
+                self.mst = _dense_prims_algorithm(self.points)
+            return
+        with timed(stats, "points"):
+            self.vertices = _create_points(num_points, map_size_x, map_size_y, max_room_size, self.rng)
+        with timed(stats, "graph"):
+            if backend == "complete":
+                graph = _generate_graph(self.vertices)
+            elif backend == "sparse":
+                graph = _generate_sparse_graph(self.vertices)
+            else:
+                raise ValueError(f"Unknown MST backend: {backend}")
+        with timed(stats, "mst"):
+            self.mst = _prims_algorithm(graph, next(iter(graph)))
     
     def get_mst(self) -> dict:
         return self.mst
@@ -22,40 +61,171 @@ class MST():
         return self.map_size
     def get_seed(self) -> int:
         return self.seed
+    def get_rng(self) -> random.Random:
+        return self.rng
     def get_num_rooms(self) -> int:
         return len(self.vertices)
     def get_max_room_size(self) -> int:
         return self.max_room_size
     
-    # Adds additional connections between rooms to create loops and complexity
+    def get_edges(self):
+        """
+        Iterates over every connection once as (room1, room2, distance), with room1 <= room2,
+        in the order they were added, or room by room for an MST that was unpickled or loaded from a
+        map file. Self loops from duplicate rooms come out as (room, room, 0).
+        """
+        for (room1, room2), distance in self._get_edge_index().items():
+            yield room1, room2, distance
+    def get_num_edges(self) -> int:
+        return len(self._get_edge_index())
+
+    def is_connected(self, room1: tuple, room2: tuple) -> bool:
+        """
+        True if the rooms have a hallway between them, in either direction
+        """
+        return _edge_key(room1, room2) in self._get_edge_index()
+
+    # Adds additional connections between rooms to create loops and complexity.
+    # The shortest pairs that are not connected yet come first. Can be called again to keep adding loops.
     def add_cycles(self, num_cycles: int) -> None:
-        possible_connections = []
-        vertices = self.vertices
+        with timed(self.stats, "cycles"):
+            self._add_cycles(num_cycles)
 
-        for i in range(len(vertices)):
-            vertex1 = vertices[i]
-            for j in range(i+1,len(vertices)):
-                vertex2 = vertices[j]
-                if not directly_connected(self, vertex1, vertex2):
-                    distance = manhattan_distance(vertex1, vertex2)
-                    # Use a heap to maintain the smallest distances at the top
-                    heapq.heappush(possible_connections, (distance, vertex1, vertex2))
-        
-        for _ in range(num_cycles):
-            if possible_connections:
-                distance, room1, room2 = heapq.heappop(possible_connections)
-                self.mst[room1].append((room2, distance))
-            else:
+    def _add_cycles(self, num_cycles: int) -> None:
+        candidates = self._get_candidate_pairs()
+        new_connections = []
+        while len(new_connections) < num_cycles:
+            pair = candidates.pop()
+            if pair is None:
                 break  # No more connections to add - you have turned it back into a fully connected graph!
+            distance, room1, room2 = pair
+            # Only connections from earlier calls count, like the heap this replaced
+            if not self.is_connected(room1, room2):
+                new_connections.append(pair)
+
+        edge_index = self._get_edge_index()
+        for distance, room1, room2 in new_connections:
+            self.mst[room1].append((room2, distance))
+            edge_index.setdefault(_edge_key(room1, room2), distance)
+
+    # The edge index maps (room1, room2) with room1 <= room2 to the distance, in the order the
+    # connections were made: it is both the canonical edge list and the O(1) lookup.
+    # It and the candidate pairs are built on first use and left out of pickles, so MSTs loaded from
+    # older pickles or map files work too. The candidate pairs can start over after loading, since
+    # every pair they already handed out is connected by then.
+    def _get_edge_index(self) -> dict[tuple, int]:
+        if getattr(self, "edge_index", None) is None:
+            self.edge_index = {}
+            for frm, connections in self.mst.items():
+                for to, distance in connections:
+                    self.edge_index.setdefault(_edge_key(frm, to), distance)
+        return self.edge_index
+    def _get_candidate_pairs(self) -> '_CandidatePairs':
+        if getattr(self, "candidate_pairs", None) is None:
+            self.candidate_pairs = _CandidatePairs(self.vertices)
+        return self.candidate_pairs
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("edge_index", None)
+        state.pop("candidate_pairs", None)
+        state.pop("stats", None)
+        return state
+
+
+class _CandidatePairs():
+    """
+    Hands out vertex pairs (i < j) one at a time, shortest first, ordered by
+    (distance, vertices[i], vertices[j]) - the order a heap of every pair would pop them in.
+
+    Vertices are bucketed into square cells. Every vertex searches the rings of cells around it,
+    one ring at a time, and only offers its closest pair once no unsearched ring can hold a closer one.
+    The closest pair of every vertex waits in a heap, so popping k pairs costs about O(n + k) searches
+    instead of building all n² pairs.
+    """
+    def __init__(self, vertices: list[tuple]) -> None:
+        self.vertices = vertices
+        self.heap = []
+        if not vertices:
+            return
+        min_x = min(x for x, _ in vertices)
+        min_y = min(y for _, y in vertices)
+        width = max(x for x, _ in vertices) - min_x + 1
+        height = max(y for _, y in vertices) - min_y + 1
+        # About one vertex per cell
+        self.cell_size = max(1, int((width * height / len(vertices)) ** 0.5))
+        self.origin = (min_x, min_y)
+        self.num_cells = ((width - 1) // self.cell_size + 1, (height - 1) // self.cell_size + 1)
 
+        self.cells: dict[tuple, list[int]] = {}
+        for i, vertex in enumerate(vertices):
+            self.cells.setdefault(self._cell(vertex), []).append(i)
+        self.rings = [0] * len(vertices)  # next ring each vertex searches
+        self.found = [[] for _ in vertices]  # heap of (distance, vertex2, j) found by each vertex
+        for i in range(len(vertices)):
+            self._offer_next(i)
+
+    def pop(self) -> tuple:
+        """
+        Returns the next (distance, vertex1, vertex2), or None once every pair has been handed out
+        """
+        if not self.heap:
+            return None
+        distance, vertex1, vertex2, i = heapq.heappop(self.heap)
+        self._offer_next(i)
+        return distance, vertex1, vertex2
+
+    def _cell(self, vertex: tuple) -> tuple:
+        return ((vertex[0] - self.origin[0]) // self.cell_size, (vertex[1] - self.origin[1]) // self.cell_size)
+
+    # Puts vertex i's next closest pair in the heap
+    def _offer_next(self, i: int) -> None:
+        found = self.found[i]
+        max_ring = max(self.num_cells)
+        while True:
+            # After searching rings 0..r, every vertex closer than r * cell_size has been found
+            if found and (found[0][0] < (self.rings[i] - 1) * self.cell_size or self.rings[i] > max_ring):
+                distance, vertex2, _ = heapq.heappop(found)
+                heapq.heappush(self.heap, (distance, self.vertices[i], vertex2, i))
+                return
+            if self.rings[i] > max_ring:
+                return
+            self._search_ring(i, self.rings[i])
+            self.rings[i] += 1
+
+    def _search_ring(self, i: int, ring: int) -> None:
+        vertex1 = self.vertices[i]
+        column, row = self._cell(vertex1)
+        columns = range(max(column - ring, 0), min(column + ring, self.num_cells[0] - 1) + 1)
+        rows = range(max(row - ring + 1, 0), min(row + ring - 1, self.num_cells[1] - 1) + 1)
+        ring_cells = []
+        for y in {row - ring, row + ring}:
+            ring_cells.extend((x, y) for x in columns)
+        for x in {column - ring, column + ring}:
+            if x in columns:
+                ring_cells.extend((x, y) for y in rows)
+        for cell in ring_cells:
+            for j in self.cells.get(cell, ()):
+                if j > i:
+                    vertex2 = self.vertices[j]
+                    heapq.heappush(self.found[i], (manhattan_distance(vertex1, vertex2), vertex2, j))
 
-def _create_points(num_points: int, x: int, y: int, max_room_size: int) -> list:
+
+def _create_points(num_points: int, x: int, y: int, max_room_size: int, rng: random.Random) -> list:
     points = []
     buffer = max_room_size
     for _ in range(num_points):
-        points.append((random.randint(0+buffer,x-buffer), random.randint(0+buffer,y-buffer)))
+        points.append((rng.randint(0+buffer,x-buffer), rng.randint(0+buffer,y-buffer)))
     return points
 
+def _create_point_array(num_points: int, x: int, y: int, max_room_size: int, rng: random.Random) -> np.ndarray:
+    # The same draws as _create_points, so a seed places the rooms the same way with every backend
+    points = _create_points(num_points, x, y, max_room_size, rng)
+    return np.array(points, dtype=np.int64).reshape(num_points, 2)
+
+def _edge_key(room1: tuple, room2: tuple) -> tuple:
+    return (room1, room2) if room1 <= room2 else (room2, room1)
+
 def manhattan_distance(point1, point2):
     return abs(point1[0] - point2[0]) + abs(point1[1] - point2[1])
 
@@ -70,6 +240,55 @@ def _generate_graph(points: list) -> dict:
                 graph[point1].append((point2, distance))
     return graph
 
+# Generate a sparse graph that still contains a Manhattan minimum spanning tree.
+# Around every point, only the nearest point in each of the 8 octants can be an MST edge,
+# so 4 sweeps over the points (one per pair of opposite octants) leave at most 4n edges.
+def _generate_sparse_graph(points: list) -> dict:
+    unique_points = list(dict.fromkeys(points))  # duplicate points collapse, like in _generate_graph
+    graph = {point: [] for point in unique_points}
+    coordinates = [list(point) for point in unique_points]
+    order = list(range(len(unique_points)))
+    seen = set()
+
+    for sweep in range(4):
+        order.sort(key=lambda i: coordinates[i][0] + coordinates[i][1])
+        # Points still waiting for their nearest neighbour in this octant, sorted by -y
+        keys = []
+        active = []
+        for i in order:
+            x, y = coordinates[i]
+            start = bisect.bisect_left(keys, -y)
+            end = start
+            while end < len(keys):
+                j = active[end]
+                dx = x - coordinates[j][0]
+                dy = y - coordinates[j][1]
+                if dy > dx:
+                    break
+                # i is the nearest point in j's octant
+                edge = (i, j) if i < j else (j, i)
+                if edge not in seen:
+                    seen.add(edge)
+                    point1, point2 = unique_points[i], unique_points[j]
+                    distance = manhattan_distance(point1, point2)
+                    graph[point1].append((point2, distance))
+                    graph[point2].append((point1, distance))
+                end += 1
+            del keys[start:end]
+            del active[start:end]
+            if start < len(keys) and keys[start] == -y:
+                active[start] = i
+            else:
+                keys.insert(start, -y)
+                active.insert(start, i)
+        # Rotate/reflect the plane so the next sweep covers the next octant
+        for coordinate in coordinates:
+            if sweep % 2:
+                coordinate[0] = -coordinate[0]
+            else:
+                coordinate[0], coordinate[1] = coordinate[1], coordinate[0]
+    return graph
+
 
 # Prim's Algorithm to find the MST - chatGPT
 def _prims_algorithm(graph: dict, starting_vertex: tuple) -> dict[tuple, list[tuple]]:
@@ -95,11 +314,34 @@ def _prims_algorithm(graph: dict, starting_vertex: tuple) -> dict[tuple, list[tu
     return mst
 
 
+# Prim's Algorithm on an (n, 2) array of points. Every step adds the closest point outside the
+# tree and updates the distances to the tree with one distance row, so it is O(n²) time and O(n) memory.
+def _dense_prims_algorithm(points: np.ndarray) -> dict[tuple, list[tuple]]:
+    # Keep the first copy of duplicate points, the same way the graph dict does
+    _, first_index = np.unique(points, axis=0, return_index=True)
+    points = points[np.sort(first_index)]
+    vertices = [tuple(point) for point in points.tolist()]
+
+    unreachable = np.iinfo(points.dtype).max
+    distances = np.abs(points - points[0]).sum(axis=1)
+    parents = np.zeros(len(points), dtype=np.intp)
+    in_tree = np.zeros(len(points), dtype=bool)
+    in_tree[0] = True
+    distances[0] = unreachable
+
+    mst = {vertices[0]: []}
+    for _ in range(len(points) - 1):
+        to = int(np.argmin(distances))
+        mst[vertices[parents[to]]].append((vertices[to], int(distances[to])))
+        mst[vertices[to]] = []
+        in_tree[to] = True
+        distances[to] = unreachable
+
+        new_distances = np.abs(points - points[to]).sum(axis=1)
+        closer = (new_distances < distances) & ~in_tree
+        distances[closer] = new_distances[closer]
+        parents[closer] = to
+    return mst
+
 def directly_connected(mst: MST, room1: tuple, room2: tuple) -> bool:
-    for dest, _ in mst.get_mst()[room1]:
-        if dest == room2:
-            return True
-    for dest, _ in mst.get_mst()[room2]:
-        if dest == room1:
-            return True
-    return False
\ No newline at end of file
+    return mst.is_connected(room1, room2)
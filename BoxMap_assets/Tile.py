@@ -1,10 +1,16 @@
+from array import array
 import random
 
 # Note: tiles are built using the vertex as the bottom left corner
 class Tile():
     """
     Base tile Class
+
+    Tiles and targets use __slots__ instead of a per-instance __dict__, since a map holds tens of
+    thousands of them.
     """
+    __slots__ = ("_left_X_boundary", "_bottom_Y_boundary", "_right_X_boundary", "_top_Y_boundary", "_tile_type")
+
     def __init__(self, left_X, bottom_Y, right_X, top_Y):
         self._left_X_boundary = left_X
         self._bottom_Y_boundary = bottom_Y
@@ -21,10 +27,15 @@ class Tile():
     def set_type(self, type: str):
         self._tile_type = type
 
+    def __setstate__(self, state):
+        _set_slots(self, state)
+
 class WallTile(Tile):
     """
     It's a wall...
     """
+    __slots__ = ()
+
     def __init__(self, left_X, bottom_Y, right_X, top_Y):
         super().__init__(left_X, bottom_Y, right_X, top_Y)
         self._tile_type = "wall"
@@ -32,18 +43,26 @@ class WallTile(Tile):
 class FloorTile(Tile):
     """
     Floor with a target somewhere around the center, depending on how high target_offset is.
+    An existing target can be passed in instead, e.g. when rebuilding a tile from stored data.
+    The offset is drawn from rng, or from the random module if no rng is given.
     """
-    def __init__(self, left_X_boundary, bottom_Y_boundary, right_X_boundary, top_Y_boundary, target_offset=0):
+    __slots__ = ("target",)
+
+    def __init__(self, left_X_boundary, bottom_Y_boundary, right_X_boundary, top_Y_boundary, target_offset=0,
+                 target: 'Target' = None, rng: random.Random = None):
         super().__init__(left_X_boundary, bottom_Y_boundary, right_X_boundary, top_Y_boundary)
-        # Calculate center
-        target_X = (right_X_boundary + left_X_boundary) / 2
-        target_Y = (top_Y_boundary + bottom_Y_boundary) / 2
-
-        # Apply a random offset to the target position if target_offset is not 0
-        if target_offset != 0:
-            target_X += random.uniform(-target_offset, target_offset)
-            target_Y += random.uniform(-target_offset, target_offset)
-        self.target = Target(target_X, target_Y)
+        if target is None:
+            # Calculate center
+            target_X = (right_X_boundary + left_X_boundary) / 2
+            target_Y = (top_Y_boundary + bottom_Y_boundary) / 2
+
+            # Apply a random offset to the target position if target_offset is not 0
+            if target_offset != 0:
+                rng = rng or random
+                target_X += rng.uniform(-target_offset, target_offset)
+                target_Y += rng.uniform(-target_offset, target_offset)
+            target = Target(target_X, target_Y)
+        self.target = target
         self._tile_type = "floor"
     
     def get_target(self) -> 'Target':
@@ -57,31 +76,41 @@ class Target():
     Target object for navigating. 
 
     It stores the coordinates of the target, nearby Target objects, and the number of times the target has been traversed.
+    A hallway target has at most four neighbours, so they are kept in a small tuple rather than a set.
+
+    Pickled targets leave their adjacent targets out: following them would recurse along every hallway and
+    overflow the stack on big maps. BoxMap and TargetHandler pickle the links as indices instead (see pack_links).
     """
+    __slots__ = ("_coordinates", "_times_traversed", "_adjacent_targets")
+    _UNLINKED = ()  # adjacent targets of a target unpickled on its own
+
     def __init__(self, x, y):
         self._coordinates = (x,y)
         self._times_traversed = 0
-        self._adjacent_targets = set()
+        self._adjacent_targets = ()
     
     def get_times_traversed(self) -> int:
         return self._times_traversed
     def get_coordinates(self) -> tuple:
         return self._coordinates
-    def get_adjacent_targets(self) -> set['Target']:
+    def get_adjacent_targets(self) -> tuple['Target', ...]:
         """
-        Returns a list of targets that can be traveled to from this target
+        Returns the targets that can be traveled to from this target
         """
         return self._adjacent_targets
     def add_target(self, target: 'Target'):
         """
         Add a target to this targets's list of adjacent targets
         """
-        self._adjacent_targets.add(target)
+        if target not in self._adjacent_targets:
+            self._adjacent_targets += (target,)
     def remove_target(self, target: 'Target'):
         """
         Remove a target from this target's list of adjacent targets
         """
-        self._adjacent_targets.remove(target)
+        if target not in self._adjacent_targets:
+            raise KeyError(target)
+        self._adjacent_targets = tuple(adjacent for adjacent in self._adjacent_targets if adjacent is not target)
     def traverse(self):
         self._times_traversed += 1
     def reset(self):
@@ -90,3 +119,70 @@ class Target():
         """
         self._times_traversed = 0
 
+    def __getstate__(self):
+        return None, {name: getattr(self, name) for name in _slot_names(type(self))
+                      if name != "_adjacent_targets" and hasattr(self, name)}
+
+    def __setstate__(self, state):
+        _set_slots(self, state)
+        if not hasattr(self, "_adjacent_targets"):
+            self._adjacent_targets = self._UNLINKED
+        # Older pickles stored the adjacent targets as a set
+        elif isinstance(self._adjacent_targets, set):
+            self._adjacent_targets = tuple(self._adjacent_targets)
+
+
+def pack_links(targets) -> tuple:
+    """
+    Every target reachable from targets, with their adjacent targets as indices into that list:
+    (targets, lengths, indices), the adjacent targets of each target following the previous one's in indices.
+    A length of -1 marks a lazy target that hasn't looked its adjacent targets up yet.
+    Walks the links with a loop, so it works for any map size where pickling them directly would not.
+    """
+    order = []
+    ids = {}
+    for target in targets:
+        if id(target) not in ids:
+            ids[id(target)] = len(order)
+            order.append(target)
+    lengths = array('i')
+    indices = array('q')
+    position = 0
+    while position < len(order):
+        adjacent_targets = order[position]._adjacent_targets
+        position += 1
+        if adjacent_targets is None:
+            lengths.append(-1)
+            continue
+        lengths.append(len(adjacent_targets))
+        for adjacent in adjacent_targets:
+            if id(adjacent) not in ids:
+                ids[id(adjacent)] = len(order)
+                order.append(adjacent)
+            indices.append(ids[id(adjacent)])
+    return order, lengths, indices
+
+def unpack_links(links: tuple) -> None:
+    """
+    Gives the targets packed by pack_links their adjacent targets back
+    """
+    targets, lengths, indices = links
+    start = 0
+    for target, length in zip(targets, lengths):
+        if length < 0:
+            continue
+        target._adjacent_targets = tuple(targets[i] for i in indices[start:start + length])
+        start += length
+
+def _slot_names(cls: type) -> list[str]:
+    return [name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ())]
+
+def _set_slots(obj, state):
+    """
+    Restores pickled attributes. Pickles from before __slots__ hold a plain attribute dict,
+    newer ones a (None, slots) tuple.
+    """
+    if isinstance(state, tuple):
+        _, state = state
+    for name, value in state.items():
+        setattr(obj, name, value)
@@ -1,3 +1,6 @@
-from .Tile import FloorTile, WallTile, Target
-from .structures import Room, Hallway
-from .MinimumSpanningTree import MST, directly_connected
\ No newline at end of file
+from .Tile import FloorTile, WallTile, Target, pack_links, unpack_links
+from .grid import OccupancyGrid, GridTarget, TileView
+from .structures import Room, Hallway, RoomIndex, GridRoomIndex, RoomRaster, SparseRoomRaster
+from .MinimumSpanningTree import MST, directly_connected
+from .stats import BuildStats, timed
+from .chunks import HallwayPlan, MapChunk, ChunkTarget, ChunkRoomTarget, plan_hallways
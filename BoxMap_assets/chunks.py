@@ -0,0 +1,301 @@
+from BoxMap_assets.Tile import FloorTile, WallTile, Target
+from BoxMap_assets.grid import OccupancyGrid, FLOOR, WALL
+from BoxMap_assets.structures import RoomIndex, SparseRoomRaster, Room, _Route, _build_hallway
+import numpy as np
+
+"""
+Hallways planned up front and built one chunk at a time
+
+Every cell's floor/wall state, target links and place in the tile order only depend on the hallways
+that touch that cell, in the order they are built. So the hallways are routed once into a HallwayPlan:
+their floor runs, wall runs and room links, split by the square chunk each cell falls in and kept in
+build order. Building a chunk replays just its own pieces, which gives the same tiles the eager build
+gives for those cells, whichever chunks were built before.
+"""
+
+
+class HallwayPlan():
+    """
+    Floor runs, wall runs and room links of every hallway, as flat OccupancyGrid cell indices split
+    by chunk. Runs are numbered in build order, so a floor's or wall's (run, position) is its place in
+    the eager map's floor or wall order.
+    """
+    def __init__(self, map_size: tuple, chunk_size: int) -> None:
+        self.padding = OccupancyGrid._PADDING
+        self.shape = (map_size[0] + 2 * self.padding + 1, map_size[1] + 2 * self.padding + 1)
+        self.chunk_size = chunk_size
+        self.pieces: dict[tuple, list[tuple]] = {}  # chunk -> pieces of runs and links, in build order
+        self.room_cells: dict[int, list[int]] = {}  # room -> cells it may be linked to
+        self._runs = 0
+
+    def cell(self, x, y) -> int:
+        return (x + self.padding) * self.shape[1] + (y + self.padding)
+    def coordinates(self, cell: int) -> tuple:
+        column, row = divmod(cell, self.shape[1])
+        return column - self.padding, row - self.padding
+    def chunk_of(self, cell: int) -> tuple:
+        x, y = self.coordinates(cell)
+        return x // self.chunk_size, y // self.chunk_size
+    def chunk_origin(self, chunk: tuple) -> tuple:
+        return chunk[0] * self.chunk_size, chunk[1] * self.chunk_size
+
+    def add_floors(self, cells: np.ndarray, room: int = None) -> None:
+        """
+        A run of floors. If room is given, it is linked to the first cell if that cell wasn't a floor yet
+        """
+        run = self._runs
+        self._runs += 1
+        if room is not None:
+            self.room_cells.setdefault(room, []).append(int(cells[0]))
+        for chunk, positions in self._split(cells):
+            link = room if positions[0] == 0 else None
+            self.pieces.setdefault(chunk, []).append(("floors", cells[positions], run, positions, link))
+
+    def add_walls(self, cells: np.ndarray) -> None:
+        """
+        Walls on the cells that are still empty
+        """
+        run = self._runs
+        self._runs += 1
+        for chunk, positions in self._split(cells):
+            self.pieces.setdefault(chunk, []).append(("walls", cells[positions], run, positions))
+
+    def link(self, room: int, cell: int) -> None:
+        self.room_cells.setdefault(room, []).append(cell)
+        self.pieces.setdefault(self.chunk_of(cell), []).append(("link", room, cell))
+
+    def _split(self, cells: np.ndarray) -> list[tuple]:
+        """
+        (chunk, positions in cells) for every chunk the cells fall in, positions in order
+        """
+        if len(cells) == 0:
+            return []
+        columns, rows = np.divmod(cells, self.shape[1])
+        chunk_x = (columns - self.padding) // self.chunk_size
+        chunk_y = (rows - self.padding) // self.chunk_size
+        if chunk_x.min() == chunk_x.max() and chunk_y.min() == chunk_y.max():
+            return [((int(chunk_x[0]), int(chunk_y[0])), np.arange(len(cells)))]
+        keys = chunk_x * (1 << 32) + chunk_y
+        split = []
+        for key in np.unique(keys).tolist():
+            positions = np.flatnonzero(keys == key)
+            split.append(((int(chunk_x[positions[0]]), int(chunk_y[positions[0]])), positions))
+        return split
+
+    def build(self, chunk: tuple) -> 'ChunkContents':
+        """
+        Replays the chunk's pieces in build order
+        """
+        contents = ChunkContents(chunk, self)
+        for piece in self.pieces.get(chunk, ()):
+            if piece[0] == "floors":
+                contents.add_floors(*piece[1:])
+            elif piece[0] == "walls":
+                contents.add_walls(*piece[1:])
+            else:
+                contents.room_links.setdefault(piece[2], []).append(piece[1])
+        return contents
+
+
+class ChunkContents():
+    """
+    Hallway cells of one chunk, the way OccupancyGrid would hold them after the eager build:
+    floors and walls in the order they were placed, and the rooms linked to each floor.
+    """
+    def __init__(self, chunk: tuple, plan: HallwayPlan) -> None:
+        self.chunk = chunk
+        size = plan.chunk_size
+        x0, y0 = plan.chunk_origin(chunk)
+        # Grid column and row of the chunk's bottom left corner. It can be outside the grid, when the
+        # chunk reaches past the padding, so local cells are worked out from coordinates and not cell offsets
+        self._first_column = x0 + plan.padding
+        self._first_row = y0 + plan.padding
+        self._height = plan.shape[1]
+        self.cells = np.zeros(size * size, dtype=np.uint8)
+        self.size = size
+        self.floor_order: list[int] = []
+        self.floor_keys: list[tuple] = []  # (run, position) of every floor, its place in the map's floor order
+        self.wall_order: list[int] = []
+        self.wall_keys: list[tuple] = []
+        self.room_links: dict[int, list[int]] = {}  # cell -> rooms linked to it
+        self._floor_index: dict[int, int] = None
+
+    def local(self, cells: np.ndarray) -> np.ndarray:
+        columns, rows = np.divmod(cells, self._height)
+        return (columns - self._first_column) * self.size + (rows - self._first_row)
+
+    def is_floor(self, cell: int) -> bool:
+        return bool(self.cells[self.local(cell)] & FLOOR)
+    def floor_key(self, cell: int) -> tuple:
+        if self._floor_index is None:
+            self._floor_index = {floor: i for i, floor in enumerate(self.floor_order)}
+        return self.floor_keys[self._floor_index[cell]]
+
+    def add_floors(self, cells: np.ndarray, run: int, positions: np.ndarray, link: int) -> None:
+        local = self.local(cells)
+        new = (self.cells[local] & FLOOR) == 0
+        if link is not None and new[0]:
+            self.room_links.setdefault(int(cells[0]), []).append(link)
+        self.cells[local] = FLOOR
+        self.floor_order.extend(cells[new].tolist())
+        self.floor_keys.extend((run, position) for position in positions[new].tolist())
+
+    def add_walls(self, cells: np.ndarray, run: int, positions: np.ndarray) -> None:
+        local = self.local(cells)
+        empty = self.cells[local] == 0
+        self.cells[local[empty]] |= WALL
+        self.wall_order.extend(cells[empty].tolist())
+        self.wall_keys.extend((run, position) for position in positions[empty].tolist())
+
+
+class MapChunk():
+    """
+    Tiles of one chunk of a ChunkedBoxMap: the rooms whose vertex is in the chunk, then the hallway
+    tiles in the order they were placed. Hallway floors have ChunkTargets.
+    """
+    def __init__(self, contents: ChunkContents, plan: HallwayPlan, rooms: list[Room],
+                 targets: dict[int, 'ChunkTarget']) -> None:
+        self.contents = contents
+        self.rooms = rooms
+        self.targets = targets  # cell -> target of the hallway floor on it, in floor order
+        self.hallway_floors: list[FloorTile] = []
+        self.hallway_walls: list[WallTile] = []
+        for cell, target in targets.items():
+            x, y = plan.coordinates(cell)
+            self.hallway_floors.append(FloorTile(x, y, x+1, y+1, target=target))
+        for cell in contents.wall_order:
+            x, y = plan.coordinates(cell)
+            self.hallway_walls.append(WallTile(x, y, x+1, y+1))
+
+    def get_floors(self) -> list[FloorTile]:
+        return [room.get_floor() for room in self.rooms] + self.hallway_floors
+    def get_walls(self) -> list[WallTile]:
+        return [wall for room in self.rooms for wall in room.get_walls()] + self.hallway_walls
+
+
+class _PlanGrid():
+    """
+    The parts of OccupancyGrid the router uses, writing into a HallwayPlan
+    """
+    _PADDING = OccupancyGrid._PADDING
+
+    def __init__(self, plan: HallwayPlan, room_of_target: dict[int, int]) -> None:
+        self.plan = plan
+        self.shape = plan.shape
+        self.room_of_target = room_of_target
+
+    def cell(self, x, y) -> int:
+        return self.plan.cell(x, y)
+    def link_room(self, room_target: Target, cell: int) -> None:
+        self.plan.link(self.room_of_target[id(room_target)], cell)
+
+
+class _PlannedRoute(_Route):
+    """
+    Route that records its runs in a HallwayPlan instead of writing them to a grid
+    """
+    def add_floors(self, cells: np.ndarray) -> None:
+        room = None if self.room_target is None else self.grid.room_of_target[id(self.room_target)]
+        self.grid.plan.add_floors(cells, room)
+        self.room_target = None
+        self.last_floor = int(cells[-1])
+
+    def add_walls(self, cells: np.ndarray) -> None:
+        outside_rooms = self.lookup(cells) < 0
+        self.grid.plan.add_walls(cells[outside_rooms])
+
+
+def plan_hallways(planned_hallways: list[tuple], rooms: RoomIndex, map_size: tuple, chunk_size: int) -> HallwayPlan:
+    """
+    Routes every hallway the way BoxMap does and records it in a HallwayPlan
+    """
+    plan = HallwayPlan(map_size, chunk_size)
+    grid = _PlanGrid(plan, {id(room.get_target()): i for i, room in enumerate(rooms)})
+    raster = SparseRoomRaster(grid, rooms)
+    for start, end in planned_hallways:
+        _build_hallway(start, end, raster, grid, _PlannedRoute(grid, raster))
+    return plan
+
+
+def cell_uniforms(seed: int, cells: np.ndarray, stream: int) -> np.ndarray:
+    """
+    A uniform number in [0, 1) for every cell, from a hash of (seed, cell, stream),
+    so it is the same whichever chunk is built first
+    """
+    mask = (1 << 64) - 1
+    # seed and stream are mixed as plain integers, since hash() of a tuple can change between Python versions
+    key = _splitmix(((seed & mask) * 0x9E3779B97F4A7C15 + stream) & mask)
+    z = np.asarray(cells, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    z = z + np.uint64(key * 0xD1B54A32D192ED03 & mask)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def _splitmix(z: int) -> int:
+    """
+    The splitmix64 finalizer on a Python integer below 2 ** 64
+    """
+    mask = (1 << 64) - 1
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & mask
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & mask
+    return z ^ (z >> 31)
+
+
+class ChunkTarget(Target):
+    """
+    Target of a hallway floor in a ChunkedBoxMap. Traversal counts are kept by the map, so they
+    survive the chunk being evicted. Adjacent targets are looked up through the map every time,
+    building neighbouring chunks when needed.
+    """
+    __slots__ = ("_map", "_cell")
+    _UNLINKED = None  # looked up again when needed
+
+    def __init__(self, chunked_map, cell: int, x, y):
+        super().__init__(x, y)
+        self._map = chunked_map
+        self._cell = cell
+        self._adjacent_targets = None
+
+    def __eq__(self, other) -> bool:
+        # A target of an evicted chunk equals the one built when the chunk comes back
+        return isinstance(other, ChunkTarget) and other._cell == self._cell and other._map is self._map
+    def __hash__(self) -> int:
+        return hash(self._cell)
+
+    def get_times_traversed(self) -> int:
+        return self._map.traversals.get(self._cell, 0)
+    def get_adjacent_targets(self) -> tuple[Target, ...]:
+        return self._map._hallway_adjacency(self._cell)
+    def add_target(self, target: Target):
+        raise TypeError("Targets of a chunked map are rebuilt with their chunk, their links can't be changed")
+    def remove_target(self, target: Target):
+        raise TypeError("Targets of a chunked map are rebuilt with their chunk, their links can't be changed")
+    def traverse(self):
+        self._map.traversals[self._cell] = self._map.traversals.get(self._cell, 0) + 1
+    def reset(self):
+        self._map.traversals.pop(self._cell, None)
+
+
+class ChunkRoomTarget(Target):
+    """
+    Target of a room in a ChunkedBoxMap. It lives as long as the map, its hallway targets are looked up
+    through the map, building the chunks they are in when needed.
+    """
+    __slots__ = ("_map", "_room")
+    _UNLINKED = None  # looked up again when needed
+
+    def __init__(self, chunked_map, room: int, x, y):
+        super().__init__(x, y)
+        self._map = chunked_map
+        self._room = room
+        self._adjacent_targets = None
+
+    def get_adjacent_targets(self) -> tuple[Target, ...]:
+        return self._map._room_adjacency(self._room)
+    def add_target(self, target: Target):
+        raise TypeError("Targets of a chunked map are rebuilt with their chunk, their links can't be changed")
+    def remove_target(self, target: Target):
+        raise TypeError("Targets of a chunked map are rebuilt with their chunk, their links can't be changed")
@@ -0,0 +1,268 @@
+from BoxMap_assets.Tile import FloorTile, WallTile, Target
+from collections.abc import Sequence
+from array import array
+import numpy as np
+import random
+
+"""
+Occupancy grid for hallway tiles
+"""
+FLOOR = 1
+WALL = 2
+NOT_WALL = 0xFF ^ WALL
+
+class OccupancyGrid():
+    """
+    Stores the 1x1 hallway floors and walls of a map as a numpy array instead of tile objects.
+
+    cells[x, y] holds FLOOR/WALL flags. Only floors have a target offset and only traversed targets
+    a traversal count, so those are kept by cell in offsets and traversals instead of arrays the size
+    of the map. Floors and walls are also kept as flat cell indices in the order they were placed,
+    which is the order tiles come out in. Tile and Target objects are only built when asked for.
+    Target offsets are drawn from rng.
+    """
+    _PADDING = 2  # walls can be placed one cell outside the map
+
+    def __init__(self, map_size: tuple, target_offset=0, rng: random.Random = None) -> None:
+        width, height = map_size
+        self.map_size = map_size
+        self.target_offset = target_offset
+        self.rng = rng or random
+        self.shape = (width + 2 * self._PADDING + 1, height + 2 * self._PADDING + 1)
+
+        self.cells = np.zeros(self.shape, dtype=np.uint8)
+        self.traversals: dict[int, int] = {}  # cell -> times its target was traversed
+        self.offsets: dict[int, tuple] = {} if target_offset != 0 else None  # floor cell -> (x, y) target offset
+
+        self.floor_order = array('q')
+        self.wall_order = array('q')
+        self.room_links: dict[int, list[Target]] = {}  # cell -> room targets linked to it
+
+        self._targets: dict[int, 'GridTarget'] = {}
+        self._floor_tiles: dict[int, FloorTile] = {}
+        self._wall_tiles: dict[int, WallTile] = {}
+
+    def cell(self, x, y) -> int:
+        return (x + self._PADDING) * self.shape[1] + (y + self._PADDING)
+    def coordinates(self, cell: int) -> tuple:
+        column, row = divmod(cell, self.shape[1])
+        return column - self._PADDING, row - self._PADDING
+
+    def is_floor(self, x, y) -> bool:
+        return bool(self.cells[x + self._PADDING, y + self._PADDING] & FLOOR)
+    def is_wall(self, x, y) -> bool:
+        return bool(self.cells[x + self._PADDING, y + self._PADDING] & WALL)
+
+    def add_floor(self, x, y) -> int:
+        """
+        Places a floor, replacing any wall on that cell, and returns the cell.
+        The target offset is drawn the same way FloorTile draws it.
+        """
+        self.cells[x + self._PADDING, y + self._PADDING] = FLOOR
+        cell = self.cell(x, y)
+        if self.offsets is not None:
+            offset_x = self.rng.uniform(-self.target_offset, self.target_offset)
+            self.offsets[cell] = (offset_x, self.rng.uniform(-self.target_offset, self.target_offset))
+        self.floor_order.append(cell)
+        return cell
+
+    def delete_wall(self, x, y) -> None:
+        self.cells[x + self._PADDING, y + self._PADDING] &= NOT_WALL
+
+    def add_wall(self, x, y) -> int:
+        self.cells[x + self._PADDING, y + self._PADDING] |= WALL
+        cell = self.cell(x, y)
+        self.wall_order.append(cell)
+        return cell
+
+    def add_floors(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Places floors on a run of cells in one go, replacing any walls, and returns the cells
+        that did not have a floor yet. Their target offsets are drawn in order, like add_floor does.
+        """
+        flat_cells = self.cells.reshape(-1)
+        new_cells = cells[(flat_cells[cells] & FLOOR) == 0]
+        flat_cells[cells] = FLOOR
+        if self.offsets is not None and len(new_cells):
+            offsets = [self.rng.uniform(-self.target_offset, self.target_offset) for _ in range(2 * len(new_cells))]
+            self.offsets.update(zip(new_cells.tolist(), zip(offsets[::2], offsets[1::2])))
+        self.floor_order.extend(new_cells.tolist())
+        return new_cells
+
+    def add_walls(self, cells: np.ndarray, allowed: np.ndarray = None) -> np.ndarray:
+        """
+        Places walls on the cells that are still empty (and allowed, if given) and returns them
+        """
+        flat_cells = self.cells.reshape(-1)
+        empty = flat_cells[cells] == 0
+        if allowed is not None:
+            empty &= allowed
+        new_cells = cells[empty]
+        flat_cells[new_cells] |= WALL
+        self.wall_order.extend(new_cells.tolist())
+        return new_cells
+
+    def count_replaced_walls(self) -> int:
+        """
+        Walls placed on a cell that got a floor afterwards
+        """
+        if not self.wall_order:
+            return 0
+        return int(((self.cells.reshape(-1)[self.wall_order] & WALL) == 0).sum())
+
+    def count_links(self) -> int:
+        """
+        Links between the targets of the map, both directions counted, worked out from the cells
+        without building any Target: two per pair of floors next to each other, and two per room link
+        """
+        floors = np.unique(np.array(self.floor_order, dtype=np.int64))
+        flat_cells = self.cells.reshape(-1)
+        neighbours = (np.count_nonzero(flat_cells[floors + 1] & FLOOR)
+                      + np.count_nonzero(flat_cells[floors + self.shape[1]] & FLOOR))
+        # A room can be linked to a floor more than once, but its target only holds it once
+        room_links = {(cell, id(room_target)) for cell, room_targets in self.room_links.items() for room_target in room_targets}
+        return 2 * (neighbours + len(room_links))
+
+    def link_room(self, room_target: Target, cell: int) -> None:
+        """
+        Links a room's target to the floor on cell.
+        Floors next to each other are always linked, so those links are not stored.
+        """
+        self.room_links.setdefault(cell, []).append(room_target)
+
+    def neighbours(self, cell: int) -> list[int]:
+        """
+        Floor cells directly above, below, left and right of cell
+        """
+        height = self.shape[1]
+        flat_cells = self.cells.reshape(-1)
+        return [n for n in (cell - height, cell + height, cell - 1, cell + 1) if flat_cells[n] & FLOOR]
+
+    def target_coordinates(self, cell: int) -> tuple:
+        x, y = self.coordinates(cell)
+        target_X = (x + x + 1) / 2
+        target_Y = (y + y + 1) / 2
+        if self.offsets is not None:
+            offset_x, offset_y = self.offsets[cell]
+            target_X += offset_x
+            target_Y += offset_y
+        return target_X, target_Y
+
+    # Lazily built objects
+    def target(self, cell: int) -> 'GridTarget':
+        target = self._targets.get(cell)
+        if target is None:
+            target = GridTarget(self, cell)
+            self._targets[cell] = target
+        return target
+
+    def floor_tile(self, cell: int) -> FloorTile:
+        tile = self._floor_tiles.get(cell)
+        if tile is None:
+            x, y = self.coordinates(cell)
+            tile = FloorTile(x, y, x+1, y+1, target=self.target(cell))
+            self._floor_tiles[cell] = tile
+        return tile
+
+    def wall_tile(self, cell: int) -> WallTile:
+        tile = self._wall_tiles.get(cell)
+        if tile is None:
+            x, y = self.coordinates(cell)
+            tile = WallTile(x, y, x+1, y+1)
+            self._wall_tiles[cell] = tile
+        return tile
+
+    def link_room_targets(self) -> None:
+        """
+        Adds the linked hallway targets to the room targets. Call once after all hallways are built.
+        """
+        for cell, room_targets in self.room_links.items():
+            for room_target in room_targets:
+                room_target.add_target(self.target(cell))
+
+    def build_tiles(self) -> tuple[list[FloorTile], list[WallTile]]:
+        """
+        Builds plain FloorTile/WallTile objects for every hallway cell, with fully linked Targets,
+        in the order they were placed.
+        """
+        targets: dict[int, Target] = {}
+        floors = []
+        for cell in self.floor_order:
+            x, y = self.coordinates(cell)
+            target = Target(*self.target_coordinates(cell))
+            targets[cell] = target
+            floors.append(FloorTile(x, y, x+1, y+1, target=target))
+        for cell, target in targets.items():
+            for neighbour in self.neighbours(cell):
+                target.add_target(targets[neighbour])
+            for room_target in self.room_links.get(cell, ()):
+                target.add_target(room_target)
+                room_target.add_target(target)
+
+        walls = []
+        for cell in self.wall_order:
+            x, y = self.coordinates(cell)
+            walls.append(WallTile(x, y, x+1, y+1))
+        return floors, walls
+
+
+class GridTarget(Target):
+    """
+    Target of a hallway floor in an OccupancyGrid.
+
+    The traversal count lives in the grid and the adjacent targets are looked up from the grid
+    the first time they are needed.
+    """
+    __slots__ = ("_grid", "_cell")
+    _UNLINKED = None  # looked up again when needed
+
+    def __init__(self, grid: OccupancyGrid, cell: int):
+        super().__init__(*grid.target_coordinates(cell))
+        self._grid = grid
+        self._cell = cell
+        self._adjacent_targets = None
+
+    def get_times_traversed(self) -> int:
+        return self._grid.traversals.get(self._cell, 0)
+    def get_adjacent_targets(self) -> tuple[Target, ...]:
+        if self._adjacent_targets is None:
+            adjacent_targets = [self._grid.target(n) for n in self._grid.neighbours(self._cell)]
+            for room_target in self._grid.room_links.get(self._cell, ()):
+                if room_target not in adjacent_targets:
+                    adjacent_targets.append(room_target)
+            self._adjacent_targets = tuple(adjacent_targets)
+        return self._adjacent_targets
+    def add_target(self, target: Target):
+        self.get_adjacent_targets()
+        super().add_target(target)
+    def remove_target(self, target: Target):
+        self.get_adjacent_targets()
+        super().remove_target(target)
+    def traverse(self):
+        self._grid.traversals[self._cell] = self._grid.traversals.get(self._cell, 0) + 1
+    def reset(self):
+        self._grid.traversals.pop(self._cell, None)
+
+
+class TileView(Sequence):
+    """
+    Read only list of tiles: the room tiles, followed by grid tiles that are built on first access.
+    """
+    def __init__(self, tiles: list, cells: array, make_tile) -> None:
+        self._tiles = tiles
+        self._cells = cells
+        self._make_tile = make_tile
+
+    def __len__(self) -> int:
+        return len(self._tiles) + len(self._cells)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("tile index out of range")
+        if index < len(self._tiles):
+            return self._tiles[index]
+        return self._make_tile(self._cells[index - len(self._tiles)])
@@ -0,0 +1,100 @@
+from contextlib import nullcontext
+import tracemalloc
+import time
+
+"""
+Opt-in instrumentation of map builds
+
+Pass stats=BuildStats() to MST and BoxMap (or stats=True to BoxMap) to get wall time per stage and
+counters of what the build did. Without it the build only pays for a None check per stage.
+Passing the same BuildStats to many builds adds them up, for batch jobs.
+
+    stats = BuildStats()
+    mst = MST(num_rooms, map_size_x, map_size_y, max_room_size, seed, stats=stats)
+    mst.add_cycles(num_cycles)
+    box_map = BoxMap(mst)           # picks up the MST's stats, see box_map.stats
+    print(stats.summary())
+"""
+_NOT_TIMED = nullcontext()
+
+
+class BuildStats():
+    """
+    Seconds per stage and counters, summed over every build they were passed to.
+
+    Stages: points, graph, mst, cycles (MST) and blueprint, rooms, hallways, tiles (BoxMap).
+    Counters:
+        maps                    BoxMap builds
+        containment_queries     room lookups of the two ends of every hallway
+        overlap_queries         RoomIndex.overlapping calls, one per side of every room, while building room walls
+        lookup_cells            cells the hallway router checked against the rooms
+        room_floors, room_walls, hallway_floors, hallway_walls      tiles created
+        walls_replaced_by_floors    hallway walls a later hallway put a floor on
+        room_links              links between a room target and a hallway target
+        target_links            adjacent targets over all targets, both directions counted
+
+    With trace_memory=True, peak_bytes holds the most memory each stage allocated on top of what was
+    in use when it started. Only allocations tracemalloc sees are counted, so it has to be tracing.
+    """
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.seconds: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.peak_bytes: dict[str, int] = {} if trace_memory else None
+
+    def time(self, stage: str) -> '_StageTimer':
+        return _StageTimer(self, stage)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add(self, other: 'BuildStats') -> None:
+        """
+        Adds the stats of other to these, e.g. ones sent back from worker processes
+        """
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        for counter, amount in other.counters.items():
+            self.count(counter, amount)
+        if self.peak_bytes is not None and other.peak_bytes is not None:
+            for stage, peak in other.peak_bytes.items():
+                self.peak_bytes[stage] = max(self.peak_bytes.get(stage, 0), peak)
+
+    def as_dict(self) -> dict:
+        return {"seconds": dict(self.seconds), "counters": dict(self.counters)}
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in self.seconds.items())
+        counters = ", ".join(f"{counter} {amount}" for counter, amount in self.counters.items())
+        return f"{stages}\n{counters}"
+
+    def __repr__(self) -> str:
+        return f"BuildStats({self.as_dict()})"
+
+
+class _StageTimer():
+    __slots__ = ("stats", "stage", "start", "start_bytes")
+
+    def __init__(self, stats: BuildStats, stage: str) -> None:
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        if self.stats.peak_bytes is not None:
+            tracemalloc.reset_peak()
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+    def __exit__(self, *exc_info) -> None:
+        seconds = self.stats.seconds
+        seconds[self.stage] = seconds.get(self.stage, 0.0) + time.perf_counter() - self.start
+        peak_bytes = self.stats.peak_bytes
+        if peak_bytes is not None:
+            peak = tracemalloc.get_traced_memory()[1] - self.start_bytes
+            peak_bytes[self.stage] = max(peak_bytes.get(self.stage, 0), peak)
+
+
+def timed(stats: BuildStats, stage: str):
+    """
+    Context manager timing stage into stats, or doing nothing if stats is None
+    """
+    return _NOT_TIMED if stats is None else stats.time(stage)
+
@@ -1,4 +1,7 @@
 from BoxMap_assets.Tile import FloorTile, WallTile, Target
+from BoxMap_assets.grid import OccupancyGrid
+from BoxMap_assets.stats import BuildStats
+import numpy as np
 import random
 
 """
@@ -8,18 +11,21 @@ class Room():
     """
     A room of variable size surrounded by walls.
 
-    Contains a single floor tile and multiple surrounding walls
+    Contains a single floor tile and multiple surrounding walls.
+    The room size and target offset are drawn from rng, or from the random module if no rng is given.
     """
-    def __init__(self, vertex: tuple, max_room_size: int, other_rooms: list['Room'], target_offset):
+    def __init__(self, vertex: tuple, max_room_size: int, other_rooms: 'RoomIndex', target_offset,
+                 rng: random.Random = None):
         x, y = vertex
+        rng = rng or random
         
-        top_Y = y + random.randint(1, max_room_size)
-        right_X = x + random.randint(1,max_room_size)
-        left_X = x - random.randint(1,max_room_size)
-        bottom_Y = y - random.randint(1, max_room_size)
+        top_Y = y + rng.randint(1, max_room_size)
+        right_X = x + rng.randint(1,max_room_size)
+        left_X = x - rng.randint(1,max_room_size)
+        bottom_Y = y - rng.randint(1, max_room_size)
 
         self.boundaries = (left_X, bottom_Y, right_X, top_Y)
-        self.floor = _build_floor(self.boundaries, target_offset)
+        self.floor = _build_floor(self.boundaries, target_offset, rng)
         self.walls = _build_walls(self.floor, other_rooms)
         
         
@@ -39,69 +45,220 @@ class Room():
         left_x, bottom_y, right_x, top_y = self.floor.get_boundaries()
         return ((left_x <= x < right_x) and (bottom_y <= y < top_y))
     
-def _build_floor(boundaries: tuple, target_offset: float) -> FloorTile:
+
+class RoomIndex():
+    """
+    Answers "which room contains (x, y)?" by scanning every room.
+
+    Rooms are kept in the order they were added and the first room containing the point wins,
+    so every index returns the same room as a scan over the room list.
+    """
+    def __init__(self) -> None:
+        self.rooms: list[Room] = []
+
+    def add(self, room: Room) -> None:
+        self.rooms.append(room)
+    def find(self, x, y) -> Room:
+        for room in self.rooms:
+            if room.contains(x, y):
+                return room
+        return None
+    def overlapping(self, left_x, bottom_y, right_x, top_y) -> list[Room]:
+        """
+        Rooms containing at least one point with left_x <= x <= right_x and bottom_y <= y <= top_y
+        """
+        return [room for room in self.rooms if _overlaps(room, left_x, bottom_y, right_x, top_y)]
+
+    def __iter__(self):
+        return iter(self.rooms)
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+class GridRoomIndex(RoomIndex):
+    """
+    Buckets rooms into a uniform grid of cell_size x cell_size cells, so a lookup only checks
+    the rooms overlapping the cell the point is in.
+    """
+    def __init__(self, cell_size: int = 16) -> None:
+        super().__init__()
+        self.cell_size = max(1, cell_size)
+        self.cells: dict[tuple, list[Room]] = {}
+
+    def add(self, room: Room) -> None:
+        super().add(room)
+        left_x, bottom_y, right_x, top_y = room.boundaries
+        size = self.cell_size
+        # contains() is half open, so the right and top edges are not part of the room
+        for cell_x in range(left_x // size, (right_x - 1) // size + 1):
+            for cell_y in range(bottom_y // size, (top_y - 1) // size + 1):
+                self.cells.setdefault((cell_x, cell_y), []).append(room)
+
+    def find(self, x, y) -> Room:
+        for room in self.cells.get((x // self.cell_size, y // self.cell_size), ()):
+            if room.contains(x, y):
+                return room
+        return None
+    def overlapping(self, left_x, bottom_y, right_x, top_y) -> list[Room]:
+        size = self.cell_size
+        found = {}
+        for cell_x in range(left_x // size, right_x // size + 1):
+            for cell_y in range(bottom_y // size, top_y // size + 1):
+                for room in self.cells.get((cell_x, cell_y), ()):
+                    if id(room) not in found and _overlaps(room, left_x, bottom_y, right_x, top_y):
+                        found[id(room)] = room
+        return list(found.values())
+
+class RoomRaster(RoomIndex):
+    """
+    Rasterises rooms onto the cells of an OccupancyGrid: cells[x, y] is the index of the first
+    room containing (x, y), or -1. A lookup is a single array read, and the hallway router
+    checks whole runs of cells at once.
+    """
+    def __init__(self, grid: OccupancyGrid, rooms=()) -> None:
+        super().__init__()
+        self.grid = grid
+        self.cells = np.full(grid.shape, -1, dtype=np.int32)
+        for room in rooms:
+            self.add(room)
+
+    def add(self, room: Room) -> None:
+        index = len(self.rooms)
+        super().add(room)
+        left_x, bottom_y, right_x, top_y = room.boundaries
+        padding = self.grid._PADDING
+        columns = slice(max(left_x + padding, 0), max(right_x + padding, 0))
+        rows = slice(max(bottom_y + padding, 0), max(top_y + padding, 0))
+        # Earlier rooms win where rooms overlap, like in a scan over the room list
+        cells = self.cells[columns, rows]
+        cells[cells < 0] = index
+
+    def find(self, x, y) -> Room:
+        column, row = x + self.grid._PADDING, y + self.grid._PADDING
+        if not (0 <= column < self.cells.shape[0] and 0 <= row < self.cells.shape[1]):
+            return super().find(x, y)
+        index = self.cells[column, row]
+        return self.rooms[index] if index >= 0 else None
+
+    def lookup(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Index of the first room containing each flat grid cell, or -1
+        """
+        return self.cells.reshape(-1)[cells]
+
+class SparseRoomRaster(RoomRaster):
+    """
+    RoomRaster that works out the room of each cell when it is asked, from the rooms' RoomIndex,
+    instead of holding an array the size of the map. The hallway router only ever asks for the
+    cells along its path, so memory stays with the rooms on maps that are mostly empty.
+    """
+    def __init__(self, grid: OccupancyGrid, rooms: RoomIndex) -> None:
+        RoomIndex.__init__(self)
+        self.grid = grid
+        self.index = rooms
+        self.rooms = list(rooms)
+        self.order = {id(room): i for i, room in enumerate(self.rooms)}
+
+    def add(self, room: Room) -> None:
+        raise TypeError("SparseRoomRaster is read only")
+    def find(self, x, y) -> Room:
+        return self.index.find(x, y)
+
+    def lookup(self, cells: np.ndarray) -> np.ndarray:
+        cells = np.asarray(cells)
+        columns, rows = np.divmod(cells, self.grid.shape[1])
+        x = columns - self.grid._PADDING
+        y = rows - self.grid._PADDING
+        indices = np.full(cells.shape, -1, dtype=np.int32)
+        if cells.size == 0:
+            return indices
+        candidates = self.index.overlapping(int(x.min()), int(y.min()), int(x.max()), int(y.max()))
+        for room in sorted(candidates, key=lambda room: self.order[id(room)]):
+            left_x, bottom_y, right_x, top_y = room.boundaries
+            inside = (left_x <= x) & (x < right_x) & (bottom_y <= y) & (y < top_y) & (indices < 0)
+            indices[inside] = self.order[id(room)]
+        return indices
+
+def _overlaps(room: Room, left_x, bottom_y, right_x, top_y) -> bool:
+    room_left_x, room_bottom_y, room_right_x, room_top_y = room.boundaries
+    # contains() is half open, so the room's right and top edges are not part of it
+    return room_left_x <= right_x and left_x < room_right_x and room_bottom_y <= top_y and bottom_y < room_top_y
+
+def _build_floor(boundaries: tuple, target_offset: float, rng: random.Random) -> FloorTile:
     left_x, bottom_y, right_x, top_y = boundaries
-    return FloorTile(left_x, bottom_y, right_x, top_y, target_offset)
+    return FloorTile(left_x, bottom_y, right_x, top_y, target_offset, rng=rng)
 
-def _build_walls(floor: FloorTile, other_rooms: list[Room]) -> list:
+def _build_walls(floor: FloorTile, other_rooms: RoomIndex) -> list:
     walls = []
     left_x, bottom_y, right_x, top_y = floor.get_boundaries()
 
-    def _add_wall_segments(constant, range_start, range_end, vertical=False):
-        start = None
-        for pos in range(range_start, range_end + 1):
-            is_blocked = any(room.contains(pos, constant) if vertical else room.contains(constant, pos) for room in other_rooms)
-
-            if not is_blocked:
-                if start is None:
-                    start = pos
-                # Add the segment if this is the last position in range and a start point was marked
-                if pos == range_end:
-                    if vertical:
-                        walls.append(WallTile(constant, start, constant, pos))
-                    else:
-                        walls.append(WallTile(start, constant, pos, constant))
+    sides = (
+        (left_x, bottom_y, top_y, True),  # Left wall
+        (top_y, left_x, right_x, False),  # Top wall
+        (right_x, bottom_y, top_y, True),  # Right wall
+        (bottom_y, left_x, right_x, False),  # Bottom wall
+    )
+    for constant, range_start, range_end, vertical in sides:
+        for start, end in _exposed_segments(constant, range_start, range_end, vertical, other_rooms):
+            if vertical:
+                walls.append(WallTile(constant, start, constant, end))
             else:
-                if start is not None:
-                    if vertical:
-                        walls.append(WallTile(constant, start, constant, pos - 1))
-                    else:
-                        walls.append(WallTile(start, constant, pos - 1, constant))
-                    start = None  # Reset start for the next segment
-    
-    # Left wall
-    _add_wall_segments(left_x, bottom_y, top_y, vertical=True)
-    # Top wall
-    _add_wall_segments(top_y, left_x, right_x, vertical=False)
-    # Right wall
-    _add_wall_segments(right_x, bottom_y, top_y, vertical=True)
-    # Bottom wall
-    _add_wall_segments(bottom_y, left_x, right_x, vertical=False)
-
+                walls.append(WallTile(start, constant, end, constant))
     return walls
 
+def _exposed_segments(constant, range_start, range_end, vertical: bool, rooms: RoomIndex) -> list[tuple]:
+    """
+    The runs of positions from range_start to range_end (inclusive) that no other room covers,
+    found by subtracting each overlapping room's interval instead of checking every position.
+    Positions are checked as (pos, constant) on vertical walls and (constant, pos) on horizontal
+    ones, the same points the original position by position walk looked at.
+    """
+    if vertical:
+        blockers = _rooms_overlapping(range_start, constant, range_end, constant, rooms)
+        blocked = sorted((room.boundaries[0], room.boundaries[2] - 1) for room in blockers)
+    else:
+        blockers = _rooms_overlapping(constant, range_start, constant, range_end, rooms)
+        blocked = sorted((room.boundaries[1], room.boundaries[3] - 1) for room in blockers)
+
+    segments = []
+    start = range_start
+    for blocked_start, blocked_end in blocked:
+        if blocked_start > start:
+            segments.append((start, blocked_start - 1))
+        start = max(start, blocked_end + 1)
+    if start <= range_end:
+        segments.append((start, range_end))
+    return segments
+
+def _rooms_overlapping(left_x, bottom_y, right_x, top_y, rooms: RoomIndex) -> list[Room]:
+    if isinstance(rooms, RoomIndex):
+        return rooms.overlapping(left_x, bottom_y, right_x, top_y)
+    return [room for room in rooms if _overlaps(room, left_x, bottom_y, right_x, top_y)]
+
 
 class Hallway:
     """
     Builds floors along the path between two rooms.
    
+    Floors and walls are placed on the shared OccupancyGrid, which also holds the rng used for
+    their target offsets. The hallway keeps the cells it added.
     Walls should be built using build_walls after all hallways have been constructed.
+    With stats, the router counts its room lookups into it.
     """
-    def __init__(self, start: tuple, end: tuple, rooms: list, floor_locations: dict[tuple, FloorTile],
-                    wall_locations: dict[tuple, WallTile], target_offset):
+    def __init__(self, start: tuple, end: tuple, rooms: RoomIndex, grid: OccupancyGrid, stats: BuildStats = None):
         
         self.vertex1 = start
         self.vertex2 = end
-        self.floors, self.walls = _build_hallway(start, end, rooms, floor_locations, wall_locations, target_offset)
+        self.grid = grid
+        self.floor_cells, self.wall_cells = _build_hallway(start, end, rooms, grid, stats=stats)
         
     def get_hallway(self):
-        return self.walls + self.floors
+        return self.get_walls() + self.get_floors()
     
-    def get_floors(self):
-        return self.floors
+    def get_floors(self) -> list[FloorTile]:
+        return [self.grid.floor_tile(cell) for cell in self.floor_cells]
     
-    def get_walls(self):
-        return self.walls
+    def get_walls(self) -> list[WallTile]:
+        return [self.grid.wall_tile(cell) for cell in self.wall_cells]
     
     def build_walls(self, wall_locations, floor_locations: list, rooms: list):
         walls_to_add = []
@@ -109,10 +266,18 @@ class Hallway:
 
         return walls_to_add
     
-def _build_hallway(start: tuple, end: tuple, rooms: list[Room],
-                   floor_locations, wall_locations, target_offset):
-    hallway_floors: list[FloorTile] = []
-    hallway_walls:list[WallTile] = []
+def _build_hallway(start: tuple, end: tuple, rooms: RoomIndex, grid: OccupancyGrid, route: '_Route' = None,
+                   stats: BuildStats = None):
+    """
+    Routes an L shaped hallway: out of the start room, along x to the end's column, then along y.
+    Every stretch between rooms is written to the grid as one run of floors and walls.
+    Returns the floor and wall cells the hallway added, in order.
+    route can be a _Route subclass that records the runs somewhere else (see chunks.py).
+    """
+    if not isinstance(rooms, RoomRaster):
+        rooms = RoomRaster(grid, rooms)
+    if route is None:
+        route = _Route(grid, rooms, stats)
 
     # Initialize location and hallway direction
     current_x, current_y = start
@@ -122,158 +287,121 @@ def _build_hallway(start: tuple, end: tuple, rooms: list[Room],
     x_step = 1 if end[0] >= start[0] else -1
     y_step = 1 if end[1] >= start[1] else -1
 
-    
-    start_room = is_in_any_room(current_x, current_y, rooms)
-    start_target = start_room.get_target()
-
-    # navigate to the end of the room
-    while current_x != end_x:
-        current_x += x_step
-        if not start_room.contains(current_x + x_step, current_y):
-            break
-            # You have exited the room
-    if start_room.contains(current_x, current_y): # still in room
-        while current_y != end_y:
-            current_y += y_step
-            if not start_room.contains(current_x, current_y):
-                break
+    start_room = route.find(current_x, current_y)
+    left_x, bottom_y, right_x, top_y = start_room.boundaries
+
+    # navigate to the edge of the room: along x until the next step would leave it,
+    # then, still in the room, along y until the hallway is out
+    if current_x != end_x:
+        if x_step == 1:
+            current_x = min(max(current_x + 1, right_x - 1), end_x)
+        else:
+            current_x = max(min(current_x - 1, left_x), end_x)
+    if start_room.contains(current_x, current_y) and current_y != end_y:
+        if y_step == 1:
+            current_y = min(top_y, end_y)
+        else:
+            current_y = max(bottom_y - 1, end_y)
     # add the floor tile and link to the room
-    _add_floor_and_targets(current_x, current_y, floor_locations,
-                            hallway_floors, wall_locations, target_offset, start_target)
-    start_target = None
-    while current_x != end_x:
-        # Check room entry
-        room = is_in_any_room(current_x, current_y, rooms)
-        if room: # Entering room
-            start_target = room.get_target()
-            # link room to entering hallway
-            _link_targets(start_target, hallway_floors[-1].get_target())
-            # traverse through room
-            while current_x != end_x:
-                current_x += x_step
-                if not room.contains(current_x, current_y): # Exiting room
-                    break
-        # In case you end in a room
-        if current_x == end_x: 
-            break
-        _add_floor_and_targets(current_x, current_y, floor_locations,
-                                hallway_floors, wall_locations, target_offset, start_target)
-        _add_hall_walls(rooms, hallway_walls, floor_locations, wall_locations, "horizontal", (current_x,current_y))
-        start_target = None
-        current_x += x_step
+    route.room_target = start_room.get_target()
+    route.add_floors(np.array([grid.cell(current_x, current_y)]))
+
+    height = grid.shape[1]
+    route.follow(grid.cell(current_x, current_y), current_x, end_x, x_step, height, 1, 0)
 
     # Turning point
-    if current_y < end_y and x_step == -1:  # Going left up
-        _put_wall(current_x, current_y-1, rooms, wall_locations, floor_locations, hallway_walls)
-        _put_wall(current_x-1, current_y-1, rooms, wall_locations, floor_locations, hallway_walls)
-    if current_y > end_y and x_step == -1:  # Going left down
-        _put_wall(current_x, current_y+1, rooms, wall_locations, floor_locations, hallway_walls)
-        _put_wall(current_x-1, current_y+1, rooms, wall_locations, floor_locations, hallway_walls)
-    if current_y < end_y and x_step == 1:  # Going right up
-        _put_wall(current_x, current_y-1, rooms, wall_locations, floor_locations, hallway_walls)
-        _put_wall(current_x+1, current_y-1, rooms, wall_locations, floor_locations, hallway_walls)
-    if current_y > end_y and x_step == 1:  # Going right down
-        _put_wall(current_x, current_y+1, rooms, wall_locations, floor_locations, hallway_walls)
-        _put_wall(current_x+1, current_y+1, rooms, wall_locations, floor_locations, hallway_walls)         
+    if current_y < end_y:  # Going up
+        route.add_walls(np.array([grid.cell(end_x, current_y-1), grid.cell(end_x+x_step, current_y-1)]))
+    if current_y > end_y:  # Going down
+        route.add_walls(np.array([grid.cell(end_x, current_y+1), grid.cell(end_x+x_step, current_y+1)]))
 
     # Vertical
-    while current_y != end_y:
-        room = is_in_any_room(current_x, current_y, rooms)
-        if room:
-            start_target = room.get_target()
-            # link room to entering hallway
-            room.add_target(hallway_floors[-1].get_target())
-            hallway_floors[-1].add_target(room.get_target())
-            # Traverse through room
-            while current_y != end_y:
-                current_y += y_step
-                if not room.contains(current_x, current_y): # Exiting room
-                    break
-        if current_y == end_y:
-            break
-        _add_floor_and_targets(current_x, current_y, floor_locations,
-                                hallway_floors, wall_locations, target_offset, start_target)
-        _add_hall_walls(rooms, hallway_walls, floor_locations, wall_locations, "vertical", (current_x,current_y))
-        start_target = None
-        current_y += y_step
-
-
-    end_room = is_in_any_room(end_x, end_y, rooms)
+    route.follow(grid.cell(end_x, current_y), current_y, end_y, y_step, 1, height, 1)
+
+    end_room = route.find(end_x, end_y)
     if end_room:
-        end_target = end_room.get_target()
-        if hallway_floors:
-            last_floor = hallway_floors[-1]
-            last_floor.add_target(end_target)
-            end_room.add_target(last_floor.get_target())
+        grid.link_room(end_room.get_target(), route.last_floor)
+
+    return route.floors, route.walls
+
+class _Route():
+    """
+    A hallway being routed through a RoomRaster. Room lookups go through find and lookup,
+    which count them into stats if there is one.
+    """
+    def __init__(self, grid: OccupancyGrid, rooms: RoomRaster, stats: BuildStats = None):
+        self.grid = grid
+        self.rooms = rooms
+        self.stats = stats
+        self.floors: list[int] = []  # new floor cells, in order
+        self.walls: list[int] = []
+        self.last_floor = None  # the last floor cell the hallway went over, new or not
+        self.room_target = None  # target of the room the hallway just came out of
+
+    def follow(self, first_cell: int, position: int, end: int, step: int, stride: int, side: int, axis: int) -> None:
+        """
+        Walks from position towards end (not included) along one axis, starting on first_cell.
+        Cells step * stride apart are next to each other along the way, and cells side apart
+        across it. Stretches outside rooms become floors with walls on both sides; a room is
+        linked to the floors on either side of it and skipped.
+        """
+        length = abs(end - position)
+        if length == 0:
+            return
+        cells = first_cell + step * stride * np.arange(length)
+        room_indices = self.lookup(cells)
+        in_room = np.flatnonzero(room_indices >= 0)
+
+        k = 0
+        while k < length:
+            if room_indices[k] >= 0:
+                # Entering room: link it to the hallway and go through it
+                room = self.rooms.rooms[room_indices[k]]
+                self.room_target = room.get_target()
+                self.grid.link_room(self.room_target, self.last_floor)
+                low, high = room.boundaries[axis], room.boundaries[axis + 2]
+                exit = high if step == 1 else low - 1
+                k = (exit - position) * step
+                if k >= length:
+                    break  # In case you end in a room
+                run_end = k + 1
+            else:
+                next_room = np.searchsorted(in_room, k)
+                run_end = int(in_room[next_room]) if next_room < len(in_room) else length
+            run = cells[k:run_end]
+            self.add_floors(run)
+            self.add_walls(np.stack((run + side, run - side), axis=1).reshape(-1))
+            k = run_end
 
-    return hallway_floors, hallway_walls
+    def find(self, x, y) -> Room:
+        if self.stats is not None:
+            self.stats.count("containment_queries")
+        return self.rooms.find(x, y)
+    def lookup(self, cells: np.ndarray) -> np.ndarray:
+        if self.stats is not None:
+            self.stats.count("lookup_cells", len(cells))
+        return self.rooms.lookup(cells)
 
-def is_in_any_room(x, y, rooms: list[Room]) -> Room:
+    def add_floors(self, cells: np.ndarray) -> None:
+        new_cells = self.grid.add_floors(cells)
+        # link the room the hallway came out of to the first floor after it
+        if self.room_target is not None and len(new_cells) and new_cells[0] == cells[0]:
+            self.grid.link_room(self.room_target, int(cells[0]))
+        self.room_target = None
+        self.floors.extend(new_cells.tolist())
+        self.last_floor = int(cells[-1])
+
+    def add_walls(self, cells: np.ndarray) -> None:
+        outside_rooms = self.lookup(cells) < 0
+        self.walls.extend(self.grid.add_walls(cells, outside_rooms).tolist())
+
+def is_in_any_room(x, y, rooms: RoomIndex) -> Room:
+    """
+    Returns the first room containing (x, y), or None. rooms can be a RoomIndex or a plain list.
+    """
+    if isinstance(rooms, RoomIndex):
+        return rooms.find(x, y)
     for room in rooms:
         if room.contains(x, y):
             return room
     return None
-
-def _add_floor_and_targets(x, y, floor_locations: dict[tuple, FloorTile], hallway_floors: list,
-                            wall_locations: dict, target_offset, target: Target=None):
-    
-    # Delete any walls here
-    wall_here = wall_locations.get((x,y))
-    if wall_here: 
-        del wall_locations[(x,y)]
-    
-    # add floor and link targets
-    proposed_location = floor_locations.get((x,y))
-    if proposed_location is None: # empty/no floor
-        # build floor
-        new_floor = FloorTile(x, y, x+1, y+1, target_offset)
-        new_target = new_floor.get_target()
-         # link room
-        if target:
-            _link_targets(new_target, target)
-        # Add new floor
-        floor_locations[(x,y)] = new_floor
-        hallway_floors.append(new_floor)
-    else: # Already a floor here
-        new_target = proposed_location.get_target()
-    # link surrounding targets
-    for adj_target in find_surrounding_targets(x, y, floor_locations):
-        _link_targets(adj_target, new_target)
-
-def _add_hall_walls(rooms, hallway_walls: list, floor_locations: dict, wall_locations: dict, direction, location: tuple):
-    """
-    Adds a wall on both sides of a hallway tile
-    """
-    x, y = location
-    if direction == "horizontal": 
-        # top
-        _put_wall(x, y+1, rooms, wall_locations, floor_locations, hallway_walls)
-        # bottom
-        _put_wall(x, y-1, rooms, wall_locations, floor_locations, hallway_walls)
-    else:
-        # right
-        _put_wall(x+1, y, rooms, wall_locations, floor_locations, hallway_walls)
-        # left
-        _put_wall(x-1, y, rooms, wall_locations, floor_locations, hallway_walls)
-
-def find_surrounding_targets(x, y, floor_tiles:dict[tuple, FloorTile]) -> list[Target]:
-    targets = []
-    for i in range(x-1,x+2):
-        for j in range(y-1,y+2):
-             # Skip the center tile and corners
-            if (i == x and j == y) or (abs(i - x) == 1 and abs(j - y) == 1):
-                continue
-            floor = floor_tiles.get((i,j))
-            if floor is not None:
-                # add target
-                targets.append(floor.get_target())
-    return targets
-                
-def _put_wall(x, y, rooms: list, wall_locations: dict, floor_locations: dict, hallway_walls: list):
-    if floor_locations.get((x, y)) is None and wall_locations.get((x,y)) is None and not is_in_any_room(x,y,rooms):
-        wall = WallTile(x,y,x+1,y+1)
-        wall_locations[x,y] = wall
-        hallway_walls.append(wall)
-def _link_targets(x: Target, y: Target):
-    x.add_target(y)
-    y.add_target(x)
\ No newline at end of file
@@ -1,4 +1,9 @@
-from BoxMap_assets.Tile import Target, FloorTile
+from BoxMap_assets.Tile import Target, FloorTile, pack_links, unpack_links
+from collections import deque
+from collections.abc import Mapping
+import numpy as np
+import random
+import bisect
 
 class TargetHandler():
     """
@@ -12,16 +17,15 @@ class TargetHandler():
     
     def find_new_target(self, current_coordinates: tuple) -> tuple:
         """
-        Gets the coordinates of the target that has been traversed the least.
-
-        TODO: Maybe randomize which target is picked if multiple are 0?
+        Gets the coordinates of the target that has been traversed the least, the last one on ties.
+        BucketTargetHandler can pick randomly between ties instead.
         """
         current_target = self.targets.get(current_coordinates)
-        lowest = 100
+        lowest = None
         next_target = None
         for adjacent_target in current_target.get_adjacent_targets():
             times_traversed = adjacent_target.get_times_traversed()
-            if times_traversed <= lowest:
+            if lowest is None or times_traversed <= lowest:
                 next_target = adjacent_target
                 lowest = times_traversed
         return next_target.get_coordinates()
@@ -36,7 +40,7 @@ class TargetHandler():
     def get_current_target(self, current_coordinates: tuple) -> Target:
         return self.targets.get(current_coordinates)
 
-    def get_adjacent_targets(self, coordinates: tuple) -> set[Target]:
+    def get_adjacent_targets(self, coordinates: tuple) -> tuple[Target, ...]:
         """
         Returns a list of Target Objects that can be traveled to from this target
         """
@@ -75,4 +79,556 @@ class TargetHandler():
             if target.get_times_traversed() == 0:
                 return False
         return True
-    
\ No newline at end of file
+
+    def __getstate__(self) -> dict:
+        # Target links are stored as indices, so pickling doesn't recurse along the hallways
+        state = self.__dict__.copy()
+        state["_target_links"] = pack_links(self._linked_targets())
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        links = state.pop("_target_links", None)
+        self.__dict__.update(state)
+        if links is not None:
+            unpack_links(links)
+
+    def _linked_targets(self) -> list[Target]:
+        """
+        Targets whose links are pickled as indices
+        """
+        return list(self.targets.values())
+    
+
+class ArrayTargetHandler(TargetHandler):
+    """
+    TargetHandler that keeps the traversal counts in a numpy array indexed by target id, and the
+    adjacency in CSR form: the targets next to target i are indices[indptr[i]:indptr[i+1]].
+
+    A running count of untouched targets makes is_fully_traveresed O(1), and reset_targets is one
+    array fill. The coordinate API works the same through an id lookup. The Targets it hands out
+    are views on these arrays, so traversals are counted here and not in the map's own Target objects.
+
+        target_handler = ArrayTargetHandler()
+        target_handler.add_targets_from_tiles(box_map.get_floors())
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.ids: dict[tuple, int] = {}  # coordinates -> target id
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int64)
+        # Targets that are only reachable as neighbours (e.g. when two targets share coordinates)
+        # are not tracked, the same way TargetHandler only checks the targets it holds
+        self.tracked = np.zeros(0, dtype=bool)
+        self.untouched = 0
+        self._sources: list[Target] = []  # the Target each id was made from
+        self._coordinates: list[tuple] = []
+        self._views: list['ArrayTarget'] = []
+        self._rows: list[tuple[int, ...]] = []  # the CSR rows as tuples, for single lookups
+
+    @classmethod
+    def from_handler(cls, target_handler: TargetHandler) -> 'ArrayTargetHandler':
+        array_handler = cls()
+        array_handler._add_sources(list(target_handler.targets.values()))
+        return array_handler
+
+    # Ids
+    def get_target_id(self, coordinates: tuple) -> int:
+        return self.ids[coordinates]
+    def get_coordinates(self, target_id: int) -> tuple:
+        return self._coordinates[target_id]
+    def get_all_coordinates(self) -> list[tuple]:
+        """
+        Coordinates of every target, indexed by target id
+        """
+        return self._coordinates
+    def get_adjacency(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The adjacency in CSR form, (indptr, indices): the targets next to target i are indices[indptr[i]:indptr[i+1]]
+        """
+        return self.indptr, self.indices
+    def get_adjacency_rows(self) -> list[tuple[int, ...]]:
+        """
+        The same adjacency as a tuple of target ids per target, faster than the arrays one target at a time
+        """
+        return self._rows
+    def get_target(self, target_id: int) -> 'ArrayTarget':
+        view = self._views[target_id]
+        if view is None:
+            view = ArrayTarget(self, target_id)
+            self._views[target_id] = view
+        return view
+
+    def find_new_target_id(self, target_id: int) -> int:
+        """
+        find_new_target by id: the adjacent target traversed the least, the last one on ties
+        """
+        # One target at a time, a loop over a short tuple beats numpy's per call overhead
+        counts = self.counts
+        next_id = None
+        for adjacent_id in self._rows[target_id]:
+            times_traversed = counts[adjacent_id]
+            if next_id is None or times_traversed <= lowest:
+                next_id = adjacent_id
+                lowest = times_traversed
+        return next_id
+    def traverse_id(self, target_id: int) -> None:
+        if self.counts[target_id] == 0 and self.tracked[target_id]:
+            self.untouched -= 1
+        self.counts[target_id] += 1
+    def reset_id(self, target_id: int) -> None:
+        if self.counts[target_id] != 0 and self.tracked[target_id]:
+            self.untouched += 1
+        self.counts[target_id] = 0
+
+    # Coordinate API
+    def find_new_target(self, current_coordinates: tuple) -> tuple:
+        """
+        Gets the coordinates of the target that has been traversed the least.
+        """
+        return self._coordinates[self.find_new_target_id(self.ids[current_coordinates])]
+
+    def add_targets_from_tiles(self, tiles: list[FloorTile]) -> None:
+        self._add_sources([tile.get_target() for tile in tiles])
+
+    def _add_target(self, target: Target) -> None:
+        self._add_sources([target])
+
+    def traverse_target(self, target_coordinates: tuple) -> None:
+        self.traverse_id(self.ids[target_coordinates])
+
+    def reset_targets(self):
+        self.counts.fill(0)
+        self.untouched = int(self.tracked.sum())
+
+    def is_fully_traveresed(self) -> bool:
+        return self.untouched == 0
+
+    def _linked_targets(self) -> list[Target]:
+        return self._sources + [view for view in self._views if view is not None]
+
+    def _add_sources(self, targets: list[Target]) -> None:
+        """
+        Gives ids to the targets and every target reachable from them, then rebuilds the arrays
+        """
+        source_ids = {id(source): i for i, source in enumerate(self._sources)}
+        def add(target: Target) -> int:
+            if id(target) not in source_ids:
+                source_ids[id(target)] = len(self._sources)
+                self._sources.append(target)
+            return source_ids[id(target)]
+
+        new = len(self._sources)
+        for target in targets:
+            target_id = add(target)
+            # Later targets with the same coordinates replace earlier ones, like in TargetHandler
+            self.ids[target.get_coordinates()] = target_id
+        # New targets can only reach other new targets or ones that already have ids
+        next_source = new
+        while next_source < len(self._sources):
+            for adjacent in self._sources[next_source].get_adjacent_targets():
+                add(adjacent)
+            next_source += 1
+
+        counts = np.zeros(len(self._sources), dtype=np.int64)
+        counts[:new] = self.counts
+        counts[new:] = [source.get_times_traversed() for source in self._sources[new:]]
+        self.counts = counts
+        self._coordinates += [source.get_coordinates() for source in self._sources[new:]]
+        self._views += [None] * (len(self._sources) - new)
+        self._build_adjacency()
+
+        self.tracked = np.zeros(len(self._sources), dtype=bool)
+        self.tracked[list(self.ids.values())] = True
+        self.untouched = int((self.tracked & (self.counts == 0)).sum())
+        self.targets = {coordinates: self.get_target(target_id) for coordinates, target_id in self.ids.items()}
+
+    def _build_adjacency(self) -> None:
+        source_ids = {id(source): i for i, source in enumerate(self._sources)}
+        indptr = [0]
+        indices = []
+        for target_id, source in enumerate(self._sources):
+            view = self._views[target_id]
+            # A view whose adjacency was changed with add_target/remove_target wins over its source
+            adjacent = view._adjacent_targets if view is not None and view._adjacent_targets is not None else None
+            if adjacent is None:
+                indices.extend(source_ids[id(target)] for target in source.get_adjacent_targets())
+            else:
+                indices.extend(target._id for target in adjacent)
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self._rows = [tuple(indices[start:end]) for start, end in zip(indptr, indptr[1:])]
+
+
+class ArrayTarget(Target):
+    """
+    Target of an ArrayTargetHandler. The traversal count lives in the handler's counts array
+    and the adjacent targets are read from its CSR arrays, until add_target/remove_target edits them.
+    """
+    __slots__ = ("_handler", "_id")
+    _UNLINKED = None  # looked up again when needed
+
+    def __init__(self, handler: ArrayTargetHandler, target_id: int):
+        super().__init__(*handler.get_coordinates(target_id))
+        self._handler = handler
+        self._id = target_id
+        self._adjacent_targets = None
+
+    def get_times_traversed(self) -> int:
+        return int(self._handler.counts[self._id])
+    def get_adjacent_targets(self) -> tuple[Target, ...]:
+        if self._adjacent_targets is None:
+            handler = self._handler
+            adjacent = handler.indices[handler.indptr[self._id]:handler.indptr[self._id + 1]]
+            return tuple(handler.get_target(i) for i in adjacent.tolist())
+        return self._adjacent_targets
+    def add_target(self, target: 'ArrayTarget'):
+        self._adjacent_targets = self.get_adjacent_targets()
+        super().add_target(target)
+        self._handler._build_adjacency()
+    def remove_target(self, target: 'ArrayTarget'):
+        self._adjacent_targets = self.get_adjacent_targets()
+        super().remove_target(target)
+        self._handler._build_adjacency()
+    def traverse(self):
+        self._handler.traverse_id(self._id)
+    def reset(self):
+        self._handler.reset_id(self._id)
+
+
+class BucketTargetHandler(ArrayTargetHandler):
+    """
+    ArrayTargetHandler that keeps, for every target, its adjacent targets in buckets by times traversed.
+    A traversal moves the target one bucket up in each of its neighbours, so picking the next target
+    is a lookup in the lowest bucket instead of a scan of every adjacent target.
+
+    tie_break "last" picks the same target as find_new_target, "random" picks between the least traversed
+    adjacent targets with a random.Random(seed).
+    mode "frontier" heads for the nearest target that has never been traversed, anywhere on the map, once
+    none of the adjacent targets are new. The way there is planned with a BFS and followed until the target
+    is reached or traversed some other way. With nothing left to visit it falls back to the least traversed rule.
+
+    A search costs O(targets + links) at worst, but it stops at the nearest new target and its plan is then
+    followed without searching again. An agent that traverses every target it steps on and stays on the plan
+    reaches the goal of every plan, so exploring a whole map takes at most one search per target:
+    O(targets * (targets + links)) overall, and in practice about the area around the agent per new target.
+    Leaving the plan, or traversing its goal some other way, costs another search.
+
+        target_handler = BucketTargetHandler(tie_break="random", seed=7, mode="frontier")
+        target_handler.add_targets_from_tiles(box_map.get_floors())
+    """
+    def __init__(self, tie_break: str = "last", seed: int = None, mode: str = "least_traversed") -> None:
+        if tie_break not in ("last", "random"):
+            raise ValueError(f"Unknown tie_break {tie_break}, use last or random")
+        if mode not in ("least_traversed", "frontier"):
+            raise ValueError(f"Unknown mode {mode}, use least_traversed or frontier")
+        self.tie_break = tie_break
+        self.mode = mode
+        self.rng = random.Random(seed)
+        # buckets[i][count] holds the positions in row i of the adjacent targets traversed count times, in order
+        self.buckets: list[dict[int, list[int]]] = []
+        self.lowest: list[int] = []  # lowest count in each target's buckets
+        self._in_rows: list[list[tuple[int, int]]] = []  # (target, position) of every row a target is in
+        self.frontier: set[int] = set()  # tracked targets that were never traversed
+        self._plan: list[int] = []  # way to the frontier, next step last
+        self._stuck_at = None  # frontier size when the last search found nothing reachable
+        super().__init__()
+
+    @classmethod
+    def from_handler(cls, target_handler: TargetHandler, **options) -> 'BucketTargetHandler':
+        bucket_handler = cls(**options)
+        bucket_handler._add_sources(list(target_handler.targets.values()))
+        return bucket_handler
+
+    def find_new_target_id(self, target_id: int) -> int:
+        if (self.mode == "frontier" and self.lowest[target_id] != 0 and self.frontier
+                and (self._stuck_at is None or len(self.frontier) != self._stuck_at)):
+            next_id = self._step_to_frontier(target_id)
+            if next_id is not None:
+                return next_id
+        buckets = self.buckets[target_id]
+        if not buckets:
+            return None
+        positions = buckets[self.lowest[target_id]]
+        position = positions[-1] if self.tie_break == "last" else self.rng.choice(positions)
+        return self._rows[target_id][position]
+
+    def traverse_id(self, target_id: int) -> None:
+        count = int(self.counts[target_id])
+        if count == 0:
+            self.frontier.discard(target_id)
+        super().traverse_id(target_id)
+        for row, position in self._in_rows[target_id]:
+            self._move(row, position, count, count + 1)
+
+    def reset_id(self, target_id: int) -> None:
+        count = int(self.counts[target_id])
+        super().reset_id(target_id)
+        if count == 0:
+            return
+        if self.tracked[target_id]:
+            self.frontier.add(target_id)
+            self._stuck_at = None
+        for row, position in self._in_rows[target_id]:
+            self._move(row, position, count, 0)
+
+    def reset_targets(self):
+        super().reset_targets()
+        self._build_buckets()
+        self._build_frontier()
+
+    def _add_sources(self, targets: list[Target]) -> None:
+        super()._add_sources(targets)
+        self._build_frontier()
+
+    def _build_adjacency(self) -> None:
+        super()._build_adjacency()
+        self._build_buckets()
+
+    def _build_buckets(self) -> None:
+        counts = self.counts.tolist()
+        self.buckets = []
+        self.lowest = []
+        self._in_rows = [[] for _ in self._rows]
+        for target_id, row in enumerate(self._rows):
+            buckets = {}
+            for position, adjacent_id in enumerate(row):
+                buckets.setdefault(counts[adjacent_id], []).append(position)
+                self._in_rows[adjacent_id].append((target_id, position))
+            self.buckets.append(buckets)
+            self.lowest.append(min(buckets, default=0))
+        self._plan = []
+
+    def _build_frontier(self) -> None:
+        self.frontier = set(np.flatnonzero(self.tracked & (self.counts == 0)).tolist())
+        self._plan = []
+        self._stuck_at = None
+
+    def _move(self, row: int, position: int, count: int, new_count: int) -> None:
+        buckets = self.buckets[row]
+        positions = buckets[count]
+        positions.remove(position)
+        if not positions:
+            del buckets[count]
+        bisect.insort(buckets.setdefault(new_count, []), position)
+        if new_count < self.lowest[row]:
+            self.lowest[row] = new_count
+        elif count == self.lowest[row] and count not in buckets:
+            # Counts only go up one at a time, so the moved target is the new lowest
+            self.lowest[row] = new_count
+
+    def _step_to_frontier(self, target_id: int) -> int:
+        """
+        Next step towards the nearest never traversed target, or None if none can be reached
+        """
+        plan = self._plan
+        # Keep following the plan while the agent is on it and its goal is still new
+        if len(plan) >= 2 and plan[-1] == target_id and plan[0] in self.frontier:
+            plan.pop()
+            return plan[-1]
+
+        parents = {target_id: None}
+        queue = deque([target_id])
+        while queue:
+            current = queue.popleft()
+            if current != target_id and current in self.frontier:
+                plan = [current]
+                while parents[plan[-1]] != target_id:
+                    plan.append(parents[plan[-1]])
+                self._plan = plan
+                return plan[-1]
+            for adjacent_id in self._rows[current]:
+                if adjacent_id not in parents:
+                    parents[adjacent_id] = current
+                    queue.append(adjacent_id)
+        # What is left of the frontier can't be reached from here. Traversals only shrink it,
+        # so don't search again until it changes
+        self._plan = []
+        self._stuck_at = len(self.frontier)
+        return None
+
+
+class BatchTargetHandler():
+    """
+    Steps many agents at once, each one on its own copy of the traversal counts of an ArrayTargetHandler.
+    Agents can share a handler or be on different ones. The adjacency of every handler is stored once,
+    the counts once per agent, all in flat arrays, so a step for all agents is a handful of numpy calls.
+
+        batch = BatchTargetHandler([handler_a, handler_b], agent_handlers=[0, 0, 1])
+        target_ids = batch.get_starting_ids()
+        while not batch.is_fully_traveresed().all():
+            target_ids, counts = batch.step(target_ids)
+
+    Target ids are the ids of each agent's own handler. The next target is picked with the same rule as
+    find_new_target: the adjacent target traversed the least, the last one on ties.
+    """
+    def __init__(self, handlers: list[ArrayTargetHandler], agent_handlers: list[int] = None) -> None:
+        self.handlers = list(handlers)
+        # One agent per handler if not told otherwise
+        self.agent_handlers = np.arange(len(self.handlers)) if agent_handlers is None else np.asarray(agent_handlers, dtype=np.int64)
+        sizes = np.array([len(handler.counts) for handler in self.handlers], dtype=np.int64)
+
+        # Adjacency of every handler in one CSR, rows offset by handler_starts. indices stay local ids
+        self.handler_starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        edge_starts = np.cumsum([0] + [len(handler.indices) for handler in self.handlers])
+        self.indptr = np.concatenate([handler.indptr[:-1] + start for handler, start in zip(self.handlers, edge_starts)]
+                                     + [edge_starts[-1:]])
+        self.indices = np.concatenate([handler.indices for handler in self.handlers])
+        self.tracked = np.concatenate([handler.tracked for handler in self.handlers])
+
+        # Counts of every agent in one array, agent a's target i is at agent_starts[a] + i
+        agent_sizes = sizes[self.agent_handlers]
+        self.agent_starts = np.concatenate(([0], np.cumsum(agent_sizes)[:-1]))
+        # Where each agent's targets sit in the handler arrays, for tracked and resetting
+        self._handler_positions = np.concatenate([np.arange(sizes[h]) + self.handler_starts[h] for h in self.agent_handlers])
+        self._agent_of_position = np.repeat(np.arange(len(self.agent_handlers)), agent_sizes)
+        self.counts = np.concatenate([self.handlers[h].counts for h in self.agent_handlers])
+        self.untouched = np.zeros(len(self.agent_handlers), dtype=np.int64)
+        self._count_untouched()
+
+    @classmethod
+    def shared(cls, handler: ArrayTargetHandler, num_agents: int) -> 'BatchTargetHandler':
+        """
+        num_agents agents on the same map
+        """
+        return cls([handler], [0] * num_agents)
+
+    def get_num_agents(self) -> int:
+        return len(self.agent_handlers)
+
+    def get_starting_ids(self) -> np.ndarray:
+        """
+        The id of each agent's handler's starting coordinate
+        """
+        starts = [handler.get_target_id(handler.get_starting_coordinate()) for handler in self.handlers]
+        return np.array(starts, dtype=np.int64)[self.agent_handlers]
+
+    def get_counts(self, agent: int) -> np.ndarray:
+        """
+        Traversal counts of one agent, by target id. This is a view, not a copy
+        """
+        start = self.agent_starts[agent]
+        return self.counts[start:start + len(self.handlers[self.agent_handlers[agent]].counts)]
+
+    def step(self, target_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Traverses every agent's current target, then finds where each goes next.
+        Returns the next target ids and the updated counts of the targets that were traversed
+        """
+        counts = self.traverse(target_ids)
+        return self.find_new_target_ids(target_ids), counts
+
+    def traverse(self, target_ids: np.ndarray) -> np.ndarray:
+        """
+        Adds 1 to times traversed of every agent's target, returns the new counts
+        """
+        target_ids = np.asarray(target_ids, dtype=np.int64)
+        positions = self.agent_starts + target_ids
+        first = (self.counts[positions] == 0) & self.tracked[self.handler_starts[self.agent_handlers] + target_ids]
+        self.untouched -= first
+        # Every agent has its own counts, so positions never repeat
+        self.counts[positions] += 1
+        return self.counts[positions]
+
+    def find_new_target_ids(self, target_ids: np.ndarray) -> np.ndarray:
+        """
+        find_new_target for every agent. An agent on a target with no adjacent targets stays there
+        """
+        target_ids = np.asarray(target_ids, dtype=np.int64)
+        rows = self.handler_starts[self.agent_handlers] + target_ids
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        # Every adjacent target of every agent in one flat array, agent after agent
+        agent = np.repeat(np.arange(len(target_ids)), lengths)
+        segment_starts = np.cumsum(lengths) - lengths
+        edges = np.arange(len(agent)) - segment_starts[agent] + starts[agent]
+        adjacent = self.indices[edges]
+        adjacent_counts = self.counts[self.agent_starts[agent] + adjacent]
+
+        # Lowest count per agent, then the last adjacent target that has it.
+        # reduceat can't do empty segments, so agents without adjacent targets are left out
+        has_adjacent = lengths > 0
+        next_ids = target_ids.copy()
+        if not has_adjacent.any():
+            return next_ids
+        segments = segment_starts[has_adjacent]
+        lowest = np.zeros(len(target_ids), dtype=np.int64)
+        lowest[has_adjacent] = np.minimum.reduceat(adjacent_counts, segments)
+        candidates = np.where(adjacent_counts == lowest[agent], np.arange(len(agent)), -1)
+        next_ids[has_adjacent] = adjacent[np.maximum.reduceat(candidates, segments)]
+        return next_ids
+
+    def reset_targets(self, agents: np.ndarray = None) -> None:
+        """
+        Set times traversed to 0 for all targets of the given agents (a list of agents or a bool mask), or of every agent
+        """
+        if agents is None:
+            self.counts.fill(0)
+        else:
+            agents = np.asarray(agents)
+            if agents.dtype == bool:
+                agents = np.flatnonzero(agents)
+            self.counts[np.isin(self._agent_of_position, agents)] = 0
+        self._count_untouched()
+
+    def is_fully_traveresed(self) -> np.ndarray:
+        """
+        Per agent, whether all of its targets have been traversed
+        """
+        return self.untouched == 0
+
+    def _count_untouched(self) -> None:
+        untouched = (self.counts == 0) & self.tracked[self._handler_positions]
+        self.untouched = np.bincount(self._agent_of_position, weights=untouched, minlength=len(self.agent_handlers)).astype(np.int64)
+
+
+class ChunkTargetHandler(TargetHandler):
+    """
+    TargetHandler for a ChunkedBoxMap. Targets are looked up through the map by coordinates, so only
+    the chunks around the targets an agent asks for are built, and traversal counts stay in the map.
+    is_fully_traveresed counts untraversed targets instead of checking every one.
+
+        target_handler = ChunkTargetHandler(chunked_map)
+    """
+    def __init__(self, chunked_map) -> None:
+        super().__init__()
+        self.map = chunked_map
+        self.targets = _ChunkTargets(chunked_map)
+
+    def get_starting_coordinate(self) -> tuple:
+        # The first room's target, like a TargetHandler filled from BoxMap's floors
+        return self.map.room_targets[0].get_coordinates()
+
+    def add_targets_from_tiles(self, tiles: list[FloorTile]) -> None:
+        raise TypeError("A ChunkTargetHandler gets its targets from its map")
+    def _add_target(self, target: Target) -> None:
+        raise TypeError("A ChunkTargetHandler gets its targets from its map")
+
+    def reset_targets(self):
+        self.map.reset_traversals()
+
+    def _linked_targets(self) -> list[Target]:
+        # Chunk targets look their links up through the map
+        return []
+
+    def is_fully_traveresed(self) -> bool:
+        return self.map.count_untraversed() == 0
+
+
+class _ChunkTargets(Mapping):
+    """
+    Coordinates -> Target of a ChunkedBoxMap. Lookups build the chunks they need, iterating builds every chunk
+    """
+    def __init__(self, chunked_map) -> None:
+        self.map = chunked_map
+
+    def __getitem__(self, coordinates: tuple) -> Target:
+        target = self.map.find_target(coordinates)
+        if target is None:
+            raise KeyError(coordinates)
+        return target
+    def __iter__(self):
+        return iter({floor.get_target().get_coordinates(): None for floor in self.map.get_floors()})
+    def __len__(self) -> int:
+        return self.map.count_targets()
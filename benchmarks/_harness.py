@@ -0,0 +1,55 @@
+"""
+Command line shared by the benchmarks: --repo picks the checkout to import from, --json prints the raw
+result, and --baseline runs the same benchmark against another checkout (e.g. a `git worktree` of an
+older commit) so the two can be reported as before and after.
+"""
+from argparse import ArgumentParser, Namespace
+import subprocess
+import json
+import sys
+import os
+
+
+def add_arguments(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument("--baseline", type=str, default=None, help="Checkout to measure for comparison")
+    arg_parser.add_argument("--repo", type=str, default=None, help="Checkout to import from (defaults to this one)")
+    arg_parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+
+
+def checkout(args: Namespace) -> str:
+    """
+    The checkout to measure: --repo, or the one the benchmarks are in
+    """
+    return os.path.abspath(args.repo or os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure_baseline(script: str, args: Namespace, options: list[str]):
+    """
+    Runs script with --json against the --baseline checkout, passing on the given options with their
+    values in args, and returns its result. It runs in a separate process, so the baseline's modules are
+    imported instead of these
+    """
+    command = [sys.executable, os.path.abspath(script), "--json", "--repo", args.baseline]
+    for option in options:
+        value = getattr(args, option.lstrip("-").replace("-", "_"))
+        if value is True:
+            command.append(option)
+        elif value is not None and value is not False:
+            command += [option, str(value)]
+    return json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+
+
+def run(script: str, args: Namespace, measure, report, options: list[str]) -> None:
+    """
+    measure(args, repo) gives the result for a checkout and report(label, result) prints it.
+    Prints the result as JSON with --json, next to the baseline's with --baseline, or on its own
+    """
+    result = measure(args, checkout(args))
+    if args.json:
+        print(json.dumps(result))
+        return
+    if args.baseline:
+        report("before", measure_baseline(script, args, options))
+        report("after ", result)
+    else:
+        report("current", result)
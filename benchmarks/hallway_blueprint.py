@@ -0,0 +1,60 @@
+"""
+Times BoxMap._hallway_blueprint (turning the MST into a list of hallways) for maps of different sizes.
+
+    python benchmarks/hallway_blueprint.py
+    python benchmarks/hallway_blueprint.py --sizes 100,1000 --baseline /path/to/other/checkout
+
+The MST is built with the sparse backend, so the baseline checkout needs to have it too.
+Maps are scaled with the number of rooms, so the rooms stay about as crowded at every size.
+"""
+from argparse import ArgumentParser, Namespace
+import time
+import sys
+import _harness
+
+
+def parse_args() -> Namespace:
+    arg_parser = ArgumentParser(description="Report how long the hallway blueprint takes per map size.")
+
+    arg_parser.add_argument("--sizes", type=str, default="100,1000,10000", help="Numbers of rooms to time")
+    arg_parser.add_argument("--room_seed", type=int, default=1, help="Determines what the map looks like")
+    arg_parser.add_argument("--max_room_size", type=int, default=10, help="How large the rooms can be")
+    arg_parser.add_argument("--num_cycles", type=int, default=2, help="Extra connections between rooms")
+    arg_parser.add_argument("--repeats", type=int, default=3, help="Best of this many runs is reported")
+    _harness.add_arguments(arg_parser)
+
+    return arg_parser.parse_args()
+
+
+def measure(args: Namespace, repo: str) -> dict:
+    sys.path.insert(0, repo)
+    from BoxMap import _hallway_blueprint
+    from BoxMap_assets import MST
+
+    results = {}
+    for num_rooms in [int(size) for size in args.sizes.split(",")]:
+        map_size = max(80, int(3 * args.max_room_size * num_rooms ** 0.5))
+        mst = MST(num_rooms, map_size, map_size, args.max_room_size, args.room_seed, backend="sparse")
+        mst.add_cycles(args.num_cycles)
+        best = float("inf")
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            hallways = _hallway_blueprint(mst)
+            best = min(best, time.perf_counter() - start)
+        results[num_rooms] = {"hallways": len(hallways), "seconds": best}
+    return results
+
+
+def _report(label: str, results: dict) -> None:
+    for num_rooms, result in results.items():
+        print(f"{label}: {num_rooms} rooms, {result['hallways']} hallways, {result['seconds'] * 1000:.2f} ms")
+
+
+def main():
+    args = parse_args()
+    _harness.run(__file__, args, measure, _report,
+                 ["--sizes", "--room_seed", "--max_room_size", "--num_cycles", "--repeats"])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Times every stage of map generation, from placing the room points to serializing the finished map,
+over a sweep of map parameters with fixed seeds.
+
+    python benchmarks/pipeline.py
+    python benchmarks/pipeline.py --num_rooms 100,1000,5000 --output after.json --plot scaling.png
+    python benchmarks/pipeline.py --compare before.json --output after.json
+    python benchmarks/pipeline.py --baseline /path/to/other/checkout
+
+Maps are built with the public MST and BoxMap constructors, which time their own stages into a BuildStats
+(see BoxMap_assets/stats.py). The best of --repeats runs is reported for every stage:
+
+    points      MST room points
+    graph       candidate edges between rooms (complete or sparse backend)
+    mst         Prim's algorithm
+    cycles      MST.add_cycles
+    blueprint   the list of hallways to build
+    rooms       room floors and walls
+    hallways    hallway floors, targets and walls in the occupancy grid
+    tiles       turning the grid into FloorTile/WallTile objects
+    render      map_render.render_map
+    serialize   map_file.map_to_bytes
+
+After the timed runs, one more run is traced with tracemalloc to get the peak memory of every stage,
+so a --baseline checkout needs a BuildStats that takes trace_memory (or --no-memory).
+Results are written as JSON with the commit they were measured on, so two runs can be compared with --compare.
+The exponent printed per stage is the slope of log(time) against log(num_rooms): 1 is linear, 2 quadratic.
+"""
+from argparse import ArgumentParser, Namespace
+from itertools import product
+import subprocess
+import tracemalloc
+import platform
+import random
+import json
+import math
+import sys
+import _harness
+
+STAGES = ("points", "graph", "mst", "cycles", "blueprint", "rooms", "hallways", "tiles", "render", "serialize")
+
+
+def parse_args() -> Namespace:
+    arg_parser = ArgumentParser(description="Time every stage of map generation over a sweep of map parameters.")
+
+    arg_parser.add_argument("--num_rooms", type=str, default="100,300,1000", help="Numbers of rooms to sweep")
+    arg_parser.add_argument("--map_sizes", type=str, default="auto", help="X and Y axis sizes to sweep. auto scales the map with the rooms, so they stay about as crowded")
+    arg_parser.add_argument("--max_room_sizes", type=str, default="10", help="Largest room sizes to sweep")
+    arg_parser.add_argument("--num_cycles", type=str, default="2", help="Extra connections between rooms to sweep")
+    arg_parser.add_argument("--seeds", type=str, default="0,1,2", help="Seeds every combination is built with")
+    arg_parser.add_argument("--mst_backend", type=str, default="sparse", choices=["complete", "sparse", "array"], help="How the room graph is built")
+    arg_parser.add_argument("--stages", type=str, default=",".join(STAGES), help="Stages to time. Earlier stages still run, they just aren't reported")
+    arg_parser.add_argument("--repeats", type=int, default=1, help="Best of this many runs is reported")
+    arg_parser.add_argument("--no-memory", dest="no_memory", action="store_true", help="Skip the tracemalloc run")
+    arg_parser.add_argument("--output", type=str, default=None, help="Write the results to this JSON file")
+    arg_parser.add_argument("--compare", type=str, default=None, help="JSON file of an earlier run to compare against")
+    arg_parser.add_argument("--plot", type=str, default=None, help="Save a log-log plot of time per stage against the number of rooms (needs matplotlib)")
+    _harness.add_arguments(arg_parser)
+
+    return arg_parser.parse_args()
+
+
+def _ints(values: str) -> list[int]:
+    return [int(value) for value in values.split(",")]
+
+
+def _map_size(num_rooms: int, max_room_size: int) -> int:
+    return max(80, int(3 * max_room_size * num_rooms ** 0.5))
+
+
+def _cases(args: Namespace) -> list[dict]:
+    cases = []
+    map_sizes = [None] if args.map_sizes == "auto" else _ints(args.map_sizes)
+    for num_rooms, map_size, max_room_size, num_cycles, seed in product(
+            _ints(args.num_rooms), map_sizes, _ints(args.max_room_sizes), _ints(args.num_cycles), _ints(args.seeds)):
+        cases.append({
+            "num_rooms": num_rooms,
+            "map_size": map_size or _map_size(num_rooms, max_room_size),
+            "max_room_size": max_room_size,
+            "num_cycles": num_cycles,
+            "seed": seed,
+        })
+    return cases
+
+
+def run_stages(case: dict, backend: str, trace_memory: bool = False) -> tuple:
+    """
+    Builds, renders and serializes one map. Returns the map's sizes and the BuildStats
+    the MST and BoxMap timed their stages into, with render and serialize timed into it too
+    """
+    from BoxMap_assets import MST, BuildStats
+    from BoxMap import BoxMap
+    from map_render import render_map
+    from map_file import map_to_bytes
+
+    seed, map_size = case["seed"], case["map_size"]
+    stats = BuildStats(trace_memory=trace_memory)
+    mst = MST(case["num_rooms"], map_size, map_size, case["max_room_size"], seed, backend=backend,
+              rng=random.Random(seed), stats=stats)
+    mst.add_cycles(case["num_cycles"])
+    box_map = BoxMap(mst)
+    with stats.time("render"):
+        render_map(box_map)
+    with stats.time("serialize"):
+        data = map_to_bytes(box_map)
+    sizes = {"floors": len(box_map.get_floors()), "walls": len(box_map.get_walls()), "bytes": len(data)}
+    return sizes, stats
+
+
+def measure_case(case: dict, args: Namespace) -> dict:
+    seconds = dict.fromkeys(STAGES, math.inf)
+    for _ in range(args.repeats):
+        sizes, stats = run_stages(case, args.mst_backend)
+        for stage in STAGES:
+            # The array backend builds its graph as part of the mst stage
+            seconds[stage] = min(seconds[stage], stats.seconds.get(stage, 0.0))
+
+    result = dict(case, **sizes, seconds=seconds)
+    if not args.no_memory:
+        tracemalloc.start()
+        _, stats = run_stages(case, args.mst_backend, trace_memory=True)
+        tracemalloc.stop()
+        result["peak_bytes"] = {stage: stats.peak_bytes.get(stage, 0) for stage in STAGES}
+    return result
+
+
+def measure(args: Namespace, repo: str) -> dict:
+    sys.path.insert(0, repo)
+    cases = [measure_case(case, args) for case in _cases(args)]
+    return {
+        "commit": _commit(repo),
+        "python": platform.python_version(),
+        "mst_backend": args.mst_backend,
+        "map_sizes": args.map_sizes,
+        "cases": cases,
+    }
+
+
+def _commit(repo: str) -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=repo).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _group(results: dict) -> dict:
+    """
+    Cases averaged over their seeds, keyed by (num_rooms, map_size, max_room_size, num_cycles)
+    """
+    groups = {}
+    for case in results["cases"]:
+        key = (case["num_rooms"], case["map_size"], case["max_room_size"], case["num_cycles"])
+        groups.setdefault(key, []).append(case)
+    averaged = {}
+    for key, cases in groups.items():
+        averaged[key] = {
+            "floors": sum(case["floors"] for case in cases) / len(cases),
+            "seconds": {stage: sum(case["seconds"][stage] for case in cases) / len(cases) for stage in STAGES},
+            "peak_bytes": {stage: max(case["peak_bytes"][stage] for case in cases) for stage in STAGES}
+                          if "peak_bytes" in cases[0] else None,
+        }
+    return averaged
+
+
+def _exponents(groups: dict, stages: list[str], scaled_maps: bool) -> dict:
+    """
+    Slope of log(seconds) against log(num_rooms) per stage, over the groups that only differ in num_rooms
+    """
+    exponents = {}
+    for stage in stages:
+        slopes = []
+        by_rest = {}
+        for (num_rooms, map_size, max_room_size, num_cycles), group in groups.items():
+            # With auto map sizes the map grows with the rooms, so it is part of the sweep
+            rest = (max_room_size, num_cycles) if scaled_maps else (map_size, max_room_size, num_cycles)
+            by_rest.setdefault(rest, []).append((num_rooms, group["seconds"][stage]))
+        for points in by_rest.values():
+            points = [(math.log(n), math.log(max(s, 1e-9))) for n, s in sorted(points)]
+            if len(points) < 2:
+                continue
+            mean_x = sum(x for x, _ in points) / len(points)
+            mean_y = sum(y for _, y in points) / len(points)
+            variance = sum((x - mean_x) ** 2 for x, _ in points)
+            if variance:
+                slopes.append(sum((x - mean_x) * (y - mean_y) for x, y in points) / variance)
+        if slopes:
+            exponents[stage] = sum(slopes) / len(slopes)
+    return exponents
+
+
+def _report(label: str, results: dict, stages: list[str], compare: dict = None) -> None:
+    groups = _group(results)
+    baseline = _group(compare) if compare else {}
+    print(f"{label} ({results['commit'] or 'unknown commit'}, {results['mst_backend']} backend)")
+    for key, group in groups.items():
+        num_rooms, map_size, max_room_size, num_cycles = key
+        print(f"  {num_rooms} rooms, {map_size}x{map_size}, max room {max_room_size}, {num_cycles} cycles, "
+              f"{group['floors']:.0f} floors")
+        for stage in stages:
+            line = f"    {stage:<10} {group['seconds'][stage] * 1000:10.2f} ms"
+            if group["peak_bytes"]:
+                line += f" {group['peak_bytes'][stage] / 2**20:9.1f} MiB peak"
+            if key in baseline:
+                before = baseline[key]["seconds"][stage]
+                line += f"   was {before * 1000:.2f} ms ({before / max(group['seconds'][stage], 1e-9):.2f}x)"
+            print(line)
+    exponents = _exponents(groups, stages, results.get("map_sizes") == "auto")
+    if exponents:
+        print("  exponent in num_rooms: " + ", ".join(f"{stage} {exponent:.2f}" for stage, exponent in exponents.items()))
+
+
+def plot(results: dict, path: str, stages: list[str]) -> None:
+    """
+    Log-log plot of seconds per stage against the number of rooms, one panel per (map size rule, max_room_size, num_cycles)
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    panels = {}
+    for (num_rooms, map_size, max_room_size, num_cycles), group in sorted(_group(results).items()):
+        panels.setdefault((max_room_size, num_cycles), []).append((num_rooms, group))
+    figure, axes = plt.subplots(1, len(panels), figsize=(6 * len(panels), 5), squeeze=False)
+    for ax, ((max_room_size, num_cycles), points) in zip(axes[0], panels.items()):
+        for stage in stages:
+            ax.plot([n for n, _ in points], [group["seconds"][stage] for _, group in points], marker="o", label=stage)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("rooms")
+        ax.set_ylabel("seconds")
+        ax.set_title(f"max room {max_room_size}, {num_cycles} cycles")
+        ax.legend(fontsize="small")
+    figure.suptitle(f"{results['commit'] or ''} {results['mst_backend']} backend")
+    figure.savefig(path)
+    plt.close(figure)
+
+
+def _to_json(results: dict) -> dict:
+    # inf can't go in JSON, it only shows up for stages that never ran
+    for case in results["cases"]:
+        case["seconds"] = {stage: (None if seconds == math.inf else seconds) for stage, seconds in case["seconds"].items()}
+    return results
+
+
+def _from_json(results: dict) -> dict:
+    for case in results["cases"]:
+        case["seconds"] = {stage: (math.inf if seconds is None else seconds) for stage, seconds in case["seconds"].items()}
+    return results
+
+
+def main():
+    args = parse_args()
+    stages = [stage for stage in args.stages.split(",") if stage in STAGES]
+    results = measure(args, _harness.checkout(args))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(_to_json(results), output_file, indent=1)
+        _from_json(results)
+    if args.json:
+        print(json.dumps(_to_json(results)))
+        return
+
+    compare = None
+    if args.compare:
+        with open(args.compare) as compare_file:
+            compare = _from_json(json.load(compare_file))
+    if args.baseline:
+        compare = _from_json(_harness.measure_baseline(__file__, args, [
+            "--num_rooms", "--map_sizes", "--max_room_sizes", "--num_cycles", "--seeds", "--mst_backend",
+            "--repeats", "--no-memory"]))
+        _report("before", compare, stages)
+    _report("after " if args.baseline else "current", results, stages, compare)
+    if args.plot:
+        plot(results, args.plot, stages)
+        print(f"Saved {args.plot}")
+
+
+if __name__ == '__main__':
+    main()
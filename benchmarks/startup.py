@@ -0,0 +1,69 @@
+"""
+Measures how long importing the map modules takes and how much memory it adds, in a fresh interpreter.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --modules BoxMap,TargetHandler,generate_map --baseline /path/to/other/checkout
+
+Every run is a new Python process, so nothing is cached between imports. The best time of --repeats
+runs is reported, with the peak RSS of that process minus the RSS of an interpreter that imported nothing.
+"""
+from argparse import ArgumentParser, Namespace
+import subprocess
+import sys
+import _harness
+
+
+# Runs in the child process: argv[1] is the checkout, argv[2] the comma separated modules
+_MEASURE = """
+import sys, time, resource, importlib
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+for module in sys.argv[2].split(","):
+    importlib.import_module(module)
+seconds = time.perf_counter() - start
+print(seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "matplotlib" in sys.modules)
+"""
+
+
+def parse_args() -> Namespace:
+    arg_parser = ArgumentParser(description="Report import time and memory of the map modules.")
+
+    arg_parser.add_argument("--modules", type=str, default="BoxMap,TargetHandler", help="Comma separated modules to import")
+    arg_parser.add_argument("--repeats", type=int, default=5, help="Best of this many runs is reported")
+    _harness.add_arguments(arg_parser)
+
+    return arg_parser.parse_args()
+
+
+def _run(repo: str, modules: str) -> tuple:
+    output = subprocess.run([sys.executable, "-c", _MEASURE, repo, modules],
+                            capture_output=True, text=True, check=True, cwd=repo).stdout.split()
+    # ru_maxrss is in KiB on Linux
+    return float(output[0]), int(output[1]) * 1024, output[2] == "True"
+
+
+def measure(args: Namespace, repo: str) -> dict:
+    # An interpreter that only ran the measuring code
+    empty_rss = min(_run(repo, "sys")[1] for _ in range(args.repeats))
+    runs = [_run(repo, args.modules) for _ in range(args.repeats)]
+    seconds, rss, matplotlib = min(runs)
+    return {
+        "modules": args.modules,
+        "seconds": seconds,
+        "rss_bytes": rss - empty_rss,
+        "matplotlib_loaded": matplotlib,
+    }
+
+
+def _report(label: str, result: dict) -> None:
+    print(f"{label}: import {result['modules']} in {result['seconds'] * 1000:.0f} ms, "
+          f"+{result['rss_bytes'] / 2**20:.1f} MiB RSS, matplotlib {'loaded' if result['matplotlib_loaded'] else 'not loaded'}")
+
+
+def main():
+    args = parse_args()
+    _harness.run(__file__, args, measure, _report, ["--modules", "--repeats"])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures how many bytes a built map keeps alive per tile (tile + target + adjacency).
+
+    python benchmarks/tile_memory.py
+    python benchmarks/tile_memory.py --baseline /path/to/other/checkout
+
+With --baseline the same measurement is run against another checkout of the repo (e.g. a
+`git worktree` of an older commit), so the numbers can be compared before and after a change.
+"""
+from argparse import ArgumentParser, Namespace
+import tracemalloc
+import random
+import sys
+import gc
+import _harness
+
+
+def parse_args() -> Namespace:
+    arg_parser = ArgumentParser(description="Report bytes per tile of a generated map.")
+
+    arg_parser.add_argument("--num_rooms", type=int, default=60, help="Number of rooms on map")
+    arg_parser.add_argument("--room_seed", type=int, default=1, help="Determines what the map looks like")
+    arg_parser.add_argument("--map_size", type=int, default=300, help="X and Y axis size")
+    arg_parser.add_argument("--max_room_size", type=int, default=12, help="How large the rooms can be")
+    arg_parser.add_argument("--num_cycles", type=int, default=0, help="Extra connections between rooms")
+    _harness.add_arguments(arg_parser)
+
+    return arg_parser.parse_args()
+
+
+def measure(args: Namespace, repo: str) -> dict:
+    sys.path.insert(0, repo)
+    from BoxMap import BoxMap
+    from BoxMap_assets import MST
+
+    random.seed(args.room_seed)
+    mst = MST(args.num_rooms, args.map_size, args.map_size, args.max_room_size, args.room_seed)
+    mst.add_cycles(args.num_cycles)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    box_map = BoxMap(mst)
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    num_tiles = len(box_map.get_floors()) + len(box_map.get_walls())
+    return {
+        "floors": len(box_map.get_floors()),
+        "walls": len(box_map.get_walls()),
+        "bytes": after - before,
+        "peak_bytes": peak - before,
+        "bytes_per_tile": (after - before) / num_tiles,
+    }
+
+
+def _report(label: str, result: dict) -> None:
+    print(f"{label}: {result['floors']} floors, {result['walls']} walls, "
+          f"{result['bytes'] / 1024:.0f} KiB kept, {result['bytes_per_tile']:.1f} bytes per tile")
+
+
+def main():
+    args = parse_args()
+    _harness.run(__file__, args, measure, _report,
+                 ["--num_rooms", "--room_seed", "--map_size", "--max_room_size", "--num_cycles"])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+from TargetHandler import TargetHandler, ArrayTargetHandler
+import numpy as np
+
+"""
+Coverage tours: short walks over the target graph that visit every target
+
+The length of a good tour is the baseline agent scores are normalised against: an agent that needs
+twice the tour length to make is_fully_traveresed() true explored half as efficiently as the plan.
+
+    tour = plan_tour(target_handler)
+    tour.get_length()                   # steps
+    tour.save("coverage_tour.npz")      # next to the map, see generate_map.py --plan_tour
+    tour = CoverageTour.load("coverage_tour.npz", target_handler)
+
+Planning works in three passes over the target graph, treating links as two way (they are on generated maps):
+ 1. A BFS tree from the start. Rooms hang off each other through their hallways, so this follows the
+    room graph, and a depth first walk of it that goes into the deepest branch last is the best
+    covering walk of the tree: every step is taken twice except the ones on the way to the deepest target.
+ 2. The order targets are first reached in (the stops) is kept, but every jump back up the tree is
+    replaced by a shorter path through the graph if a hallway cycle gives one.
+ 3. 2-opt on the stops: reversing the stops between two jumps, when that makes the two jumps shorter.
+    Only jumps within window of each other are compared, so it stays linear in the map size.
+"""
+
+
+class CoverageTour():
+    """
+    A walk over target ids that visits every target reachable from its start.
+    walk holds every step, stops every target once in the order the walk was planned to reach them.
+    A step between two stops can pass through a later stop on the way.
+    """
+    def __init__(self, walk: np.ndarray, stops: np.ndarray, coordinates: np.ndarray, unreachable: int = 0) -> None:
+        self.walk = walk
+        self.stops = stops
+        self.coordinates = coordinates  # of every target id, to check the tour belongs to a map
+        self.unreachable = unreachable  # targets the walk can't get to from its start
+
+    def get_length(self) -> int:
+        return len(self.walk) - 1
+
+    def get_walk_coordinates(self) -> list[tuple]:
+        return [tuple(coordinates) for coordinates in self.coordinates[self.walk].tolist()]
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, walk=self.walk, stops=self.stops, coordinates=self.coordinates,
+                            unreachable=self.unreachable)
+
+    @classmethod
+    def load(cls, path: str, target_handler: TargetHandler = None) -> 'CoverageTour':
+        """
+        Loads a tour saved with save. If a target handler is given, the tour has to be for its map
+        """
+        with np.load(path) as saved:
+            tour = cls(saved["walk"], saved["stops"], saved["coordinates"], int(saved["unreachable"]))
+        if target_handler is not None:
+            handler = _array_handler(target_handler)
+            if not np.array_equal(tour.coordinates, np.array(handler.get_all_coordinates(), dtype=np.float64).reshape(-1, 2)):
+                raise ValueError(f"Coverage tour {path} was made for a different map")
+        return tour
+
+
+def plan_tour(target_handler: TargetHandler, start: tuple = None, window: int = 8, passes: int = 2) -> CoverageTour:
+    """
+    Plans a walk that visits every target reachable from start (the handler's starting coordinate by default)
+    """
+    handler = _array_handler(target_handler)
+    rows = handler.get_adjacency_rows()
+    start = handler.get_starting_coordinate() if start is None else start
+    start_id = handler.get_target_id(start)
+
+    stops = _deepest_last_order(rows, start_id)
+    jumps = [_Jump.find(rows, stops[i], stops[i + 1]) for i in range(len(stops) - 1)]
+    for _ in range(passes):
+        if not _two_opt(rows, stops, jumps, window):
+            break
+
+    walk = [start_id]
+    for jump in jumps:
+        walk += jump.get_path()[1:]
+    coordinates = np.array(handler.get_all_coordinates(), dtype=np.float64).reshape(-1, 2)
+    return CoverageTour(np.array(walk, dtype=np.int64), np.array(stops, dtype=np.int64), coordinates,
+                        unreachable=len(rows) - len(stops))
+
+
+def _array_handler(target_handler: TargetHandler) -> ArrayTargetHandler:
+    if isinstance(target_handler, ArrayTargetHandler):
+        return target_handler
+    return ArrayTargetHandler.from_handler(target_handler)
+
+
+def _deepest_last_order(rows: list[tuple[int, ...]], start_id: int) -> list[int]:
+    """
+    Targets in the order a depth first walk of the BFS tree from start reaches them,
+    going into the child with the deepest subtree last
+    """
+    parents = {start_id: None}
+    order = [start_id]
+    for target_id in order:
+        for adjacent_id in rows[target_id]:
+            if adjacent_id not in parents:
+                parents[adjacent_id] = target_id
+                order.append(adjacent_id)
+
+    # Height of every subtree, children before parents
+    heights = dict.fromkeys(order, 0)
+    children = {target_id: [] for target_id in order}
+    for target_id in reversed(order[1:]):
+        parent = parents[target_id]
+        children[parent].append(target_id)
+        heights[parent] = max(heights[parent], heights[target_id] + 1)
+
+    stops = []
+    stack = [start_id]
+    while stack:
+        target_id = stack.pop()
+        stops.append(target_id)
+        # Children were collected in reverse BFS order. Sorting by height keeps BFS order on ties,
+        # and pushing the deepest child first puts it at the bottom of the stack, so it is walked last
+        visit_order = sorted(children[target_id][::-1], key=heights.get)
+        stack += visit_order[::-1]
+    return stops
+
+
+class _Jump():
+    """
+    The walk between two consecutive stops
+    """
+    __slots__ = ("frm", "to", "path", "length")
+
+    def __init__(self, frm: int, to: int, path: list[int]) -> None:
+        self.frm = frm
+        self.to = to
+        self.path = path
+        self.length = None if path is None else len(path) - 1
+
+    @classmethod
+    def find(cls, rows: list[tuple[int, ...]], frm: int, to: int, limit: int = None) -> '_Jump':
+        """
+        Shortest walk from frm to to. Its length is None if that is longer than limit
+        """
+        return cls(frm, to, _bounded_path(rows, frm, to, limit))
+
+    def reverse(self) -> '_Jump':
+        # Links go both ways, so the walk back is the same walk backwards
+        return _Jump(self.to, self.frm, self.path[::-1])
+
+    def get_path(self) -> list[int]:
+        return self.path
+
+
+def _bounded_path(rows: list[tuple[int, ...]], frm: int, to: int, limit: int = None) -> list[int]:
+    """
+    Shortest path from frm to to, or None if it is longer than limit steps
+    """
+    parents = {frm: None}
+    frontier = [frm]
+    steps = 0
+    while frontier and to not in parents:
+        if limit is not None and steps >= limit:
+            return None
+        steps += 1
+        next_frontier = []
+        for target_id in frontier:
+            for adjacent_id in rows[target_id]:
+                if adjacent_id not in parents:
+                    parents[adjacent_id] = target_id
+                    next_frontier.append(adjacent_id)
+        frontier = next_frontier
+    if to not in parents:
+        return None
+    path = [to]
+    while path[-1] != frm:
+        path.append(parents[path[-1]])
+    return path[::-1]
+
+
+def _two_opt(rows: list[tuple[int, ...]], stops: list[int], jumps: list[_Jump], window: int) -> bool:
+    """
+    One 2-opt pass over the jumps longer than one step. Changes stops and jumps in place,
+    returns whether anything improved
+    """
+    improved = False
+    long_jumps = [i for i, jump in enumerate(jumps) if jump.length > 1]
+    a = 0
+    while a < len(long_jumps):
+        i = long_jumps[a]
+        for j in long_jumps[a + 1:a + 1 + window]:
+            # Reversing stops[i + 1:j + 1] turns jumps i and j into stops[i] -> stops[j] and stops[i + 1] -> stops[j + 1].
+            # Both are at least one step, which bounds how far each search has to look
+            old = jumps[i].length + jumps[j].length
+            first = _Jump.find(rows, stops[i], stops[j], old - 2)
+            if first.length is None:
+                continue
+            second = _Jump.find(rows, stops[i + 1], stops[j + 1], old - 1 - first.length)
+            if second.length is None:
+                continue
+            stops[i + 1:j + 1] = stops[i + 1:j + 1][::-1]
+            jumps[i + 1:j] = [jump.reverse() for jump in reversed(jumps[i + 1:j])]
+            jumps[i] = first
+            jumps[j] = second
+            improved = True
+            # The jumps in between moved, so find the long ones again
+            long_jumps = [k for k, jump in enumerate(jumps) if jump.length > 1]
+            a = long_jumps.index(i) - 1 if i in long_jumps else a - 1
+            break
+        a += 1
+    return improved
@@ -1,12 +1,16 @@
 # from ue_map_generator import ue_map_generator
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice, chain
+from typing import Iterator
 from TargetHandler import TargetHandler
 from BoxMap import BoxMap
-from BoxMap_assets import MST
-import matplotlib.pyplot as plt
+from BoxMap_assets import MST, BuildStats
 import random
 import pickle
+import sys
 import os
+import re
 
 
 def parse_args() -> Namespace:
@@ -19,48 +23,266 @@ def parse_args() -> Namespace:
     arg_parser.add_argument("--max_room_size", type=int, default=10, help="How large the rooms can be")
     arg_parser.add_argument("--target_offset", type=int, default=0, help="Offsets the targets from the center. Higher numbers can be further away. Keep below floor size / 2")
     arg_parser.add_argument("--num_cycles", type=int, default=2, help="Cycles will add complexity and loops to the map, creating more challenging exploration")
+    arg_parser.add_argument("--mst_backend", type=str, default="complete", choices=["complete", "sparse", "array"], help="How the room graph is built. sparse and array scale to thousands of rooms. All three place the same rooms for a seed, but can connect equally distant rooms differently")
     arg_parser.add_argument("--ue_scaling_factor", type=int, default=100, help="Scales the tiles up for Unreal Engine map")
-    
-    return arg_parser.parse_args()
+    arg_parser.add_argument("--render", type=str, default="matplotlib", choices=["matplotlib", "png"], help="How map_visualization.png is drawn. png paints it directly without a matplotlib figure, which is much faster for big maps and batches")
+    arg_parser.add_argument("--no-render", dest="no_render", action="store_true", help="Don't save map_visualization.png. Skips loading matplotlib and the drawing time")
+    arg_parser.add_argument("--save_format", type=str, default="pickle", choices=["pickle", "binary"], help="pickle saves BoxNav_map.pkl and target_handler.pkl, binary saves both in BoxNav_map.boxmap (see map_file.py)")
+    arg_parser.add_argument("--precompute_paths", action="store_true", help="Also save the distance between every pair of targets in target_distances.npz (see target_paths.py). Only for maps with up to 10000 targets")
+    arg_parser.add_argument("--plan_tour", action="store_true", help="Also save a walk that visits every target in coverage_tour.npz, as a baseline for exploration scores (see coverage_tour.py)")
+    arg_parser.add_argument("--export_geometry", type=str, default=None, choices=["json", "obj"], help="Also save the floors and walls merged into as few boxes as possible, as a box list (map_geometry.json) or a mesh (map_geometry.obj), scaled by --ue_scaling_factor (see map_export.py)")
+    arg_parser.add_argument("--corpus_dir", type=str, default=None, help="Append maps to a sharded corpus in this folder instead of one folder per seed (see map_corpus.py)")
+    arg_parser.add_argument("--output_dir", type=str, default=".", help="Maps are saved in a folder named after their seed inside this folder")
+    arg_parser.add_argument("--cache_dir", type=str, default=None, help="Reuse maps already generated with the same parameters from this folder (see map_cache.py)")
+    arg_parser.add_argument("--cache_size", type=int, default=1024, help="Size limit of --cache_dir in MB. Least recently used maps are deleted past it")
+    arg_parser.add_argument("--stats", action="store_true", help="Print the time of every generation stage and counts of what was built (see BoxMap_assets/stats.py). Can't be combined with --cache_dir")
+    arg_parser.add_argument("--seeds", type=str, default=None, help="Batch mode: build one map per seed, e.g. 0-9999 or 1,5,10-20. Overrides --room_seed")
+    arg_parser.add_argument("--workers", type=int, default=None, help="Batch mode: number of worker processes (default: one per CPU)")
 
+    args = arg_parser.parse_args()
+    if args.stats and args.cache_dir:
+        # Cached maps are loaded, not generated, so there would be nothing to time
+        arg_parser.error("--stats can't be combined with --cache_dir")
+    if args.seeds:
+        try:
+            args.seeds = parse_seeds(args.seeds)
+        except ValueError as error:
+            arg_parser.error(str(error))
+    return args
 
 
-def main():
-    args = parse_args()
-    random.seed(args.room_seed)
 
-    # Create Minimum Spanning Tree and add cycles to it
-    mst = MST(args.num_rooms, args.map_size_x, args.map_size_y, args.max_room_size, args.room_seed)
-    mst.add_cycles(args.num_cycles)
+_caches: dict[str, 'MapCache'] = {}
+
+def get_cache(args: Namespace) -> 'MapCache':
+    """
+    One MapCache per cache directory per process, so its memory tier lasts across seeds
+    """
+    if args.cache_dir not in _caches:
+        from map_cache import MapCache
+        _caches[args.cache_dir] = MapCache(args.cache_dir, max_bytes=args.cache_size << 20)
+    return _caches[args.cache_dir]
+
+
+def cache_parameters(args: Namespace, seed: int) -> dict:
+    return dict(corpus_parameters(args), seed=seed, mst_backend=args.mst_backend)
+
+
+def build(args: Namespace, seed: int, stats: BuildStats = None) -> tuple[BoxMap, TargetHandler]:
+    """
+    Builds the map and target handler for one seed, or loads them from --cache_dir.
+    With stats, the build is timed and counted into it.
+    """
+    if args.cache_dir:
+        # Pickles get the plain objects a fresh build makes, not ones backed by the cache's files
+        plain = args.save_format == "pickle" and not args.corpus_dir
+        return get_cache(args).get_or_build(plain, **cache_parameters(args, seed))
+
+    return build_map(args.num_rooms, args.map_size_x, args.map_size_y, args.max_room_size, seed, args.num_cycles,
+                     args.target_offset, args.mst_backend, stats)
+
+
+def build_map(num_rooms: int, map_size_x: int, map_size_y: int, max_room_size: int, seed: int,
+              num_cycles: int, target_offset, mst_backend: str = "complete",
+              stats: BuildStats = None) -> tuple[BoxMap, TargetHandler]:
+    """
+    Builds the map and target handler for these generation parameters. map_cache.py builds its maps
+    with this too, so cached maps are the same as fresh ones.
+    """
+    # Create Minimum Spanning Tree and add cycles to it. Every random draw for this map comes from its own rng.
+    mst = MST(num_rooms, map_size_x, map_size_y, max_room_size, seed, backend=mst_backend, rng=random.Random(seed), stats=stats)
+    mst.add_cycles(num_cycles)
     
     # Build Rooms and Hallways
-    map = BoxMap(mst, args.target_offset)
+    map = BoxMap(mst, target_offset)
     floors = map.get_floors()
     
     # Create Interface
     target_handler = TargetHandler()
     target_handler.add_targets_from_tiles(floors)
+    return map, target_handler
+
+
+def generate(args: Namespace, seed: int, stats: BuildStats = None) -> str:
+    """
+    Builds the map for one seed and saves it to a directory named after the seed.
+    Returns the directory.
+    """
+    map, target_handler = build(args, seed, stats)
     
-    # build unreal engine map
+    # build unreal engine map, one brush per merged box. Without the engine, use --export_geometry
     # ue_map = ue_map_generator(map, args.ue_scaling_factor)
 
     # Create a directory named after the seed
-    directory_name = f"./{args.room_seed}"
+    directory_name = os.path.join(args.output_dir, str(seed))
     os.makedirs(directory_name, exist_ok=True)
 
     # visualize and save image
-    map.draw_map(show=False)
-    plt.savefig(os.path.join(directory_name, "map_visualization.png"))
-    plt.close()  
-
-    # Save BoxNav map, target handler, and Unreal Engine map as pickle files
-    print("Saving to {directory_name}")
-    with open(os.path.join(directory_name, "BoxNav_map.pkl"), 'wb') as map_file:
-        pickle.dump(map, map_file)
-    with open(os.path.join(directory_name, "target_handler.pkl"), 'wb') as target_file:
-        pickle.dump(target_handler, target_file)
+    if not args.no_render:
+        save_image(map, os.path.join(directory_name, "map_visualization.png"), args.render)
+
+    # Save BoxNav map, target handler, and Unreal Engine map
+    print(f"Saving to {directory_name}")
+    if args.save_format == "binary":
+        from map_file import save_map
+        save_map(os.path.join(directory_name, "BoxNav_map.boxmap"), map, target_handler)
+    else:
+        _pickle(map, os.path.join(directory_name, "BoxNav_map.pkl"))
+        _pickle(target_handler, os.path.join(directory_name, "target_handler.pkl"))
+    if args.precompute_paths:
+        from target_paths import PathEngine
+        path_engine = PathEngine(target_handler)
+        path_engine.precompute()
+        path_engine.save_table(os.path.join(directory_name, "target_distances.npz"))
+    if args.plan_tour:
+        from coverage_tour import plan_tour
+        plan_tour(target_handler).save(os.path.join(directory_name, "coverage_tour.npz"))
+    if args.export_geometry:
+        from map_export import merge_tiles, export
+        geometry = merge_tiles(map)
+        export(geometry, os.path.join(directory_name, f"map_geometry.{args.export_geometry}"), args.ue_scaling_factor)
+        print(f"Seed {seed} geometry: {geometry.summary()}")
     # with open(os.path.join(directory_name, "ue_map.pkl"), 'wb') as ue_map_file:
         # pickle.dump(ue_map, ue_map_file)
+    return directory_name
+
+
+def save_image(map: BoxMap, path: str, render: str = "matplotlib") -> None:
+    if render == "png":
+        from map_render import save_png
+        save_png(path, map)
+        return
+    # Only load matplotlib when it is used
+    import matplotlib.pyplot as plt
+    map.draw_map(show=False)
+    plt.savefig(path)
+    plt.close()
+
+
+def _pickle(obj, path: str) -> None:
+    # BoxMap and TargetHandler pickle target links as indices, so this works at any map size
+    with open(path, 'wb') as pickle_file:
+        pickle.dump(obj, pickle_file)
+
+
+def generate_bytes(args: Namespace, seed: int, stats: BuildStats = None) -> bytes:
+    """
+    Builds the map for one seed and returns it in the binary map format, for adding to a corpus
+    """
+    from map_file import map_to_bytes
+    return map_to_bytes(*build(args, seed, stats))
+
+
+def corpus_parameters(args: Namespace) -> dict:
+    from map_corpus import PARAMETERS
+    return {name: getattr(args, name) for name in PARAMETERS}
+
+
+def _batch_task(args: Namespace, seed: int) -> tuple:
+    """
+    Runs one seed of a batch in a worker process. Returns the seed's result along with what the
+    parent adds up over the batch: its BuildStats (None without --stats) and how much each of this
+    process's cache stats went up (None without --cache_dir)
+    """
+    stats = BuildStats() if args.stats else None
+    cache_before = dict(get_cache(args).stats) if args.cache_dir else None
+    result = (generate_bytes if args.corpus_dir else generate)(args, seed, stats)
+    cache_stats = None
+    if args.cache_dir:
+        cache_stats = {name: count - cache_before[name] for name, count in get_cache(args).stats.items()}
+    return result, stats, cache_stats
+
+
+def generate_batch(args: Namespace, seeds: Iterator[int]) -> None:
+    """
+    Builds one map per seed in a process pool. Every worker saves its map as soon as it is
+    built, so finished maps are on disk while the rest of the batch is still running.
+    With --corpus_dir workers send back serialized maps and this process appends them to the corpus.
+    --stats and the cache stats are added up here and printed once for the whole batch.
+    Each map draws from its own random.Random(seed), so it is the same as a single run with that seed.
+    """
+    failed = []
+    pending = {}
+    seeds = iter(seeds)
+    # Workers only need the map parameters, not the seed iterator
+    args = Namespace(**dict(vars(args), seeds=None))
+    workers = args.workers or os.cpu_count() or 1
+    stats = BuildStats() if args.stats else None
+    cache_stats = {}
+    corpus = None
+    if args.corpus_dir:
+        from map_corpus import CorpusWriter
+        corpus = CorpusWriter(args.corpus_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Only keep a few seeds per worker queued, so huge seed ranges don't sit in memory
+        for seed in islice(seeds, 4 * workers):
+            pending[pool.submit(_batch_task, args, seed)] = seed
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                seed = pending.pop(future)
+                if future.exception() is not None:
+                    print(f"Seed {seed} failed: {future.exception()!r}")
+                    failed.append(seed)
+                else:
+                    result, seed_stats, seed_cache_stats = future.result()
+                    if corpus:
+                        corpus.add_bytes(result, seed, **corpus_parameters(args))
+                    if stats is not None:
+                        stats.add(seed_stats)
+                    for name, count in (seed_cache_stats or {}).items():
+                        cache_stats[name] = cache_stats.get(name, 0) + count
+                for next_seed in islice(seeds, 1):
+                    pending[pool.submit(_batch_task, args, next_seed)] = next_seed
+    if corpus:
+        corpus.close()
+    if stats is not None:
+        print(f"All seeds: {stats.summary()}")
+    if args.cache_dir:
+        print_cache_stats(cache_stats)
+    if failed:
+        print(f"{len(failed)} maps failed: {failed}")
+        sys.exit(1)
+
+
+def print_cache_stats(stats: dict) -> None:
+    from map_cache import hit_rate
+    print(f"Cache: {stats}, hit rate {hit_rate(stats):.0%}")
+
+
+_SEED_RANGE = re.compile(r"(-?\d+)(?:-(-?\d+))?")
+
+def parse_seeds(seeds: str) -> Iterator[int]:
+    """
+    Turns "0-9999" or "1,5,10-20" into an iterator over the seeds. Seeds can be negative, e.g. "-3" or "-5--1".
+    Every part is checked before the first seed comes out, and ranges are only walked as they are used.
+    """
+    ranges = []
+    for part in seeds.split(","):
+        match = _SEED_RANGE.fullmatch(part.strip())
+        if match is None:
+            raise ValueError(f"Can't read seeds {part!r}, use a seed or a range like 10-20")
+        start, end = match.groups()
+        ranges.append(range(int(start), int(start if end is None else end) + 1))
+    return chain.from_iterable(ranges)
+
+
+def main():
+    args = parse_args()
+    if args.seeds:
+        generate_batch(args, args.seeds)
+        return
+    stats = BuildStats() if args.stats else None
+    if args.corpus_dir:
+        from map_corpus import CorpusWriter
+        with CorpusWriter(args.corpus_dir) as corpus:
+            corpus.add_bytes(generate_bytes(args, args.room_seed, stats), args.room_seed, **corpus_parameters(args))
+    else:
+        generate(args, args.room_seed, stats)
+    if stats is not None:
+        print(f"Seed {args.room_seed}: {stats.summary()}")
+    if args.cache_dir:
+        print_cache_stats(get_cache(args).stats)
 
 
 if __name__ == '__main__':
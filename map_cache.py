@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from TargetHandler import TargetHandler
+from BoxMap import BoxMap
+from map_file import map_to_bytes, load_map_bytes
+from generate_map import build_map
+import hashlib
+import json
+import os
+
+"""
+Content addressed cache of generated maps
+
+A map is fully determined by its generation parameters and the generator code, so the cache key is a
+hash of both. Bump GENERATOR_VERSION whenever a change makes the same parameters give a different map.
+"""
+GENERATOR_VERSION = 3
+
+
+def cache_key(num_rooms: int, map_size_x: int, map_size_y: int, max_room_size: int, seed: int,
+              num_cycles: int, target_offset, mst_backend: str = "complete") -> str:
+    parameters = {
+        "generator_version": GENERATOR_VERSION,
+        "num_rooms": num_rooms,
+        "map_size_x": map_size_x,
+        "map_size_y": map_size_y,
+        "max_room_size": max_room_size,
+        "seed": seed,
+        "num_cycles": num_cycles,
+        "target_offset": float(target_offset),
+        "mst_backend": mst_backend,
+    }
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+class MapCache():
+    """
+    Two tier cache of generated maps.
+
+    Maps are stored on disk in the binary map format, named by their cache key. When the files go over
+    max_bytes the least recently used ones are deleted. The memory_items most recently used maps are
+    also kept in memory as bytes. Every get returns freshly loaded BoxMap/TargetHandler objects, so
+    traversal counts are never shared between callers. They are lazily loaded from the binary format
+    (see map_file.py), unless plain is set: then they are built out of ordinary tiles and Targets
+    like a fresh build, which is what pickling them needs.
+
+        cache = MapCache("map_cache")
+        box_map, target_handler = cache.get_or_build(num_rooms=5, map_size_x=80, map_size_y=80,
+                                                     max_room_size=10, seed=7, num_cycles=2, target_offset=0)
+    """
+    def __init__(self, directory: str, max_bytes: int = 1 << 30, memory_items: int = 128) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory: OrderedDict[str, bytes] = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = {}
+        for name in os.listdir(directory):
+            if name.endswith(".boxmap"):
+                self._sizes[name[:-len(".boxmap")]] = os.path.getsize(os.path.join(directory, name))
+
+    def get(self, plain: bool = False, **parameters) -> tuple[BoxMap, TargetHandler]:
+        """
+        Returns the cached map for these generation parameters (see cache_key), or None
+        """
+        key = cache_key(**parameters)
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return load_map_bytes(data, plain)
+
+        path = self._path(key)
+        try:
+            # The file's modification time is the last time it was used
+            os.utime(path)
+            with open(path, "rb") as map_file:
+                data = map_file.read()
+        except FileNotFoundError:
+            self.stats["misses"] += 1
+            self._sizes.pop(key, None)
+            return None
+        self.stats["disk_hits"] += 1
+        self._remember(key, data)
+        return load_map_bytes(data, plain)
+
+    def put(self, box_map: BoxMap, target_handler: TargetHandler, **parameters) -> None:
+        key = cache_key(**parameters)
+        data = map_to_bytes(box_map, target_handler)
+        path = self._path(key)
+        # Write then rename, so other processes sharing the cache never see half a file
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as map_file:
+            map_file.write(data)
+        os.replace(temporary_path, path)
+        self._sizes[key] = len(data)
+        self._remember(key, data)
+        self._evict()
+
+    def get_or_build(self, plain: bool = False, **parameters) -> tuple[BoxMap, TargetHandler]:
+        """
+        Returns the cached map, or builds it with generate_map.build_map and caches it
+        """
+        cached = self.get(plain, **parameters)
+        if cached is not None:
+            return cached
+        box_map, target_handler = build_map(**parameters)
+        self.put(box_map, target_handler, **parameters)
+        return box_map, target_handler
+
+    def hit_rate(self) -> float:
+        return hit_rate(self.stats)
+
+    def disk_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if self.memory_items <= 0:
+            return
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        if self.disk_bytes() <= self.max_bytes:
+            return
+        # Other processes may have used or added files, so look at the directory itself
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".boxmap"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(".boxmap")], stat.st_size))
+        entries.sort()
+        self._sizes = {key: size for _, key, size in entries}
+        disk_bytes = sum(self._sizes.values())
+        for _, key, size in entries:
+            if disk_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            del self._sizes[key]
+            disk_bytes -= size
+            self.stats["evictions"] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.boxmap")
+
+
+def hit_rate(stats: dict) -> float:
+    """
+    Share of gets that were answered from the cache, from MapCache.stats or several of them added up
+    """
+    hits = stats.get("memory_hits", 0) + stats.get("disk_hits", 0)
+    total = hits + stats.get("misses", 0)
+    return hits / total if total else 0.0
+
@@ -0,0 +1,195 @@
+from TargetHandler import TargetHandler
+from BoxMap import BoxMap
+from map_file import map_to_bytes, load_map
+import numpy as np
+import glob
+import os
+
+"""
+Sharded map corpus
+
+Maps are stored back to back in large shard files (shard-00000.maps, shard-00001.maps, ...) in the
+binary map format from map_file.py. Each finished shard has an index (shard-00000.index.npy) with one
+row per map: its seed, generation parameters, and where it starts in the shard.
+
+A shard's index is only written when the shard is closed, so a writer that dies halfway leaves
+a shard (or the end of one) that readers ignore. A new writer carries on with the last finished
+shard while it has room, so running the generator once per map doesn't leave a shard per map.
+A lock file (shard-00000.lock) keeps other writers off a shard that is being carried on with, so
+a corpus can be appended to at any time. The lock of a writer that died stays, and later writers
+just start a new shard.
+"""
+PARAMETERS = ("num_rooms", "map_size_x", "map_size_y", "max_room_size", "num_cycles", "target_offset")
+
+INDEX_DTYPE = np.dtype([
+    ("seed", "<i8"),
+    ("num_rooms", "<i4"),
+    ("map_size_x", "<i4"),
+    ("map_size_y", "<i4"),
+    ("max_room_size", "<i4"),
+    ("num_cycles", "<i4"),
+    ("target_offset", "<f8"),
+    ("shard", "<i4"),
+    ("offset", "<i8"),
+    ("length", "<i8"),
+])
+
+
+class CorpusWriter():
+    """
+    Appends maps to a corpus directory, starting with the last finished shard if it is smaller
+    than shard_size bytes. A new shard is started once the current one reaches shard_size bytes.
+
+        with CorpusWriter("corpus") as writer:
+            writer.add(box_map, target_handler, seed, num_rooms=5, map_size_x=80, map_size_y=80,
+                       max_room_size=10, num_cycles=2, target_offset=0)
+    """
+    def __init__(self, directory: str, shard_size: int = 1 << 30) -> None:
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        # Never reuse a shard number, even from a shard that was not finished
+        existing = [_shard_number(path) for path in glob.glob(os.path.join(directory, "shard-*.maps"))]
+        self._next_shard = max(existing, default=-1) + 1
+        self._shard = None
+        self._shard_file = None
+        self._rows = []
+        self._lock_path = None
+        self._reopen_last_shard()
+
+    def add(self, box_map: BoxMap, target_handler: TargetHandler, seed: int, **parameters) -> None:
+        self.add_bytes(map_to_bytes(box_map, target_handler), seed, **parameters)
+
+    def add_bytes(self, map_bytes: bytes, seed: int, **parameters) -> None:
+        """
+        Adds a map that was already serialized with map_file.map_to_bytes, e.g. by a worker process.
+        """
+        missing = set(PARAMETERS) - set(parameters)
+        if missing:
+            raise ValueError(f"Missing generation parameters: {sorted(missing)}")
+        if self._shard_file is None or self._shard_file.tell() >= self.shard_size:
+            self._start_shard()
+
+        offset = self._shard_file.tell()
+        self._shard_file.write(map_bytes)
+        row = (seed,) + tuple(parameters[name] for name in PARAMETERS) + (self._shard, offset, len(map_bytes))
+        self._rows.append(row)
+
+    def close(self) -> None:
+        """
+        Finishes the current shard by writing its index
+        """
+        if self._shard_file is None:
+            return
+        self._shard_file.close()
+        index = np.array(self._rows, dtype=INDEX_DTYPE)
+        index_path = _index_path(self.directory, self._shard)
+        np.save(index_path + ".tmp.npy", index)
+        os.replace(index_path + ".tmp.npy", index_path)
+        self._shard_file = None
+        self._rows = []
+        if self._lock_path is not None:
+            os.remove(self._lock_path)
+            self._lock_path = None
+
+    def _start_shard(self) -> None:
+        self.close()
+        while self._shard_file is None:
+            self._shard = self._next_shard
+            self._next_shard += 1
+            try:
+                # Another writer may have taken the number since this one looked
+                self._shard_file = open(_shard_path(self.directory, self._shard), "xb")
+            except FileExistsError:
+                pass
+
+    def _reopen_last_shard(self) -> None:
+        """
+        Carries on with the last finished shard if it has room and no other writer has it.
+        Its old index stays until this writer closes the shard, so if this writer dies the
+        shard's earlier maps are still there.
+        """
+        indexed = [_shard_number(path) for path in glob.glob(os.path.join(self.directory, "shard-*.index.npy"))]
+        if not indexed:
+            return
+        shard = max(indexed)
+        index = np.load(_index_path(self.directory, shard))
+        end = int((index["offset"] + index["length"]).max()) if len(index) else 0
+        if end >= self.shard_size:
+            return
+        lock_path = os.path.join(self.directory, f"shard-{shard:05d}.lock")
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return
+        self._lock_path = lock_path
+        self._shard = shard
+        self._shard_file = open(_shard_path(self.directory, shard), "r+b")
+        # Drop whatever a writer that died left after the indexed maps
+        self._shard_file.truncate(end)
+        self._shard_file.seek(end)
+        self._rows = index.tolist()
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CorpusReader():
+    """
+    Random access to the maps in a corpus directory by seed (and generation parameters).
+
+    All shard indexes are loaded and sorted by seed when the reader is created; fetching a map
+    is then a binary search plus a memory map of the shard at the map's offset.
+    Call refresh() to pick up shards finished after the reader was created.
+    """
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.refresh()
+
+    def refresh(self) -> None:
+        indexes = [np.load(path) for path in sorted(glob.glob(os.path.join(self.directory, "shard-*.index.npy")))]
+        index = np.concatenate(indexes) if indexes else np.zeros(0, dtype=INDEX_DTYPE)
+        self.index = index[np.argsort(index["seed"], kind="stable")]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def seeds(self) -> np.ndarray:
+        return np.unique(self.index["seed"])
+
+    def find(self, seed: int, **parameters) -> np.void:
+        """
+        Returns the index row of the map with this seed and parameters.
+        Parameters that are left out can be anything, as long as only one map matches.
+        """
+        start, end = np.searchsorted(self.index["seed"], [seed, seed + 1])
+        rows = self.index[start:end]
+        for name, value in parameters.items():
+            if name not in PARAMETERS:
+                raise ValueError(f"Unknown generation parameter: {name}")
+            rows = rows[rows[name] == value]
+        if len(rows) == 0:
+            raise KeyError(f"No map with seed {seed} and parameters {parameters}")
+        if len(rows) > 1:
+            raise KeyError(f"{len(rows)} maps have seed {seed} and parameters {parameters}, pass more parameters")
+        return rows[0]
+
+    def get(self, seed: int, **parameters) -> tuple[BoxMap, TargetHandler]:
+        row = self.find(seed, **parameters)
+        return load_map(_shard_path(self.directory, int(row["shard"])), int(row["offset"]))
+
+    def get_bytes(self, seed: int, **parameters) -> bytes:
+        row = self.find(seed, **parameters)
+        with open(_shard_path(self.directory, int(row["shard"])), "rb") as shard_file:
+            shard_file.seek(int(row["offset"]))
+            return shard_file.read(int(row["length"]))
+
+
+def _shard_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, f"shard-{shard:05d}.maps")
+def _index_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, f"shard-{shard:05d}.index.npy")
+def _shard_number(path: str) -> int:
+    return int(os.path.basename(path)[len("shard-"):].split(".")[0])
@@ -0,0 +1,223 @@
+from argparse import ArgumentParser, Namespace
+from BoxMap import BoxMap
+from map_render import tile_boundaries
+import numpy as np
+import json
+
+"""
+Geometry export
+
+Turns a map into as few boxes as possible, for engines that would otherwise get one actor per tile.
+Tiles of the same kind are merged:
+    floors          every floor (room floors and 1x1 hallway floors) is rasterised into unit cells,
+                    and their union is covered with rectangles by greedy meshing: each row is cut into
+                    the longest runs of cells, and a run is stacked onto the rectangle below it when
+                    that rectangle spans exactly the same columns
+    hallway walls   1x1 cells, merged the same way
+    room walls      lines with no thickness, merged when they lie on the same line and touch
+
+The boxes cover exactly the area the tiles covered, so the export can be checked against the map offline.
+
+    geometry = merge_tiles(box_map)
+    print(geometry.summary())                  # how many primitives were merged away
+    geometry.save_json("map_geometry.json")    # box list
+    geometry.save_obj("map_geometry.obj")      # mesh
+
+Coordinates are scaled by scale (default 100, Unreal Engine centimetres per map unit like --ue_scaling_factor).
+Heights are given in output units, like ue_map_generator: floors are floor_height tall and walls wall_height.
+"""
+
+
+class MapGeometry():
+    """
+    Merged floor and wall rectangles of a map, as (rectangles, 4) arrays of (left_x, bottom_y, right_x, top_y)
+    in map units. Room walls have no thickness, so their rectangles are lines.
+    """
+    def __init__(self, floors: np.ndarray, walls: np.ndarray, stats: dict) -> None:
+        self.floors = floors
+        self.walls = walls
+        self.stats = stats
+
+    def get_num_boxes(self) -> int:
+        return len(self.floors) + len(self.walls)
+
+    def boxes(self, scale: float = 100, floor_height: float = 1, wall_height: float = 100) -> dict[str, np.ndarray]:
+        """
+        (boxes, 6) arrays of (min_x, min_y, min_z, max_x, max_y, max_z) for floors and walls, in output units
+        """
+        return {"floors": _boxes(self.floors, scale, floor_height), "walls": _boxes(self.walls, scale, wall_height)}
+
+    def save_json(self, path: str, scale: float = 100, floor_height: float = 1, wall_height: float = 100) -> None:
+        boxes = self.boxes(scale, floor_height, wall_height)
+        data = {
+            "scale": scale,
+            "floor_height": floor_height,
+            "wall_height": wall_height,
+            "stats": self.stats,
+            "floors": boxes["floors"].tolist(),
+            "walls": boxes["walls"].tolist(),
+        }
+        with open(path, "w") as json_file:
+            json.dump(data, json_file, separators=(",", ":"))
+
+    def save_obj(self, path: str, scale: float = 100, floor_height: float = 1, wall_height: float = 100) -> None:
+        """
+        Writes a Wavefront OBJ with a floors and a walls group. Boxes get 6 faces,
+        walls without thickness a single upright face. Z is up
+        """
+        lines = [f"# {self.summary()}".replace("\n", "\n# ")]
+        num_vertices = 0
+        for group, boxes in self.boxes(scale, floor_height, wall_height).items():
+            lines.append(f"g {group}")
+            for box in boxes.tolist():
+                vertices, faces = _box_mesh(box)
+                lines += [f"v {x:g} {y:g} {z:g}" for x, y, z in vertices]
+                lines += ["f " + " ".join(str(num_vertices + i + 1) for i in face) for face in faces]
+                num_vertices += len(vertices)
+        with open(path, "w") as obj_file:
+            obj_file.write("\n".join(lines) + "\n")
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (f"floors: {stats['floor_tiles']} tiles -> {stats['floor_boxes']} boxes\n"
+                f"walls: {stats['wall_tiles']} tiles -> {stats['wall_boxes']} boxes\n"
+                f"merged away: {stats['merged_away']} of {stats['floor_tiles'] + stats['wall_tiles']} primitives")
+
+
+def merge_tiles(box_map: BoxMap) -> MapGeometry:
+    """
+    Merges the floors and walls of box_map (any map with get_floors()/get_walls()) into rectangles
+    """
+    floors = tile_boundaries(box_map.get_floors())
+    walls = tile_boundaries(box_map.get_walls())
+    lines = (walls[:, 0] == walls[:, 2]) | (walls[:, 1] == walls[:, 3])
+
+    merged_floors = merge_cells(floors)
+    merged_walls = np.concatenate((merge_cells(walls[~lines]), merge_lines(walls[lines])))
+    stats = {
+        "floor_tiles": len(floors),
+        "wall_tiles": len(walls),
+        "floor_boxes": len(merged_floors),
+        "wall_boxes": len(merged_walls),
+        "merged_away": len(floors) + len(walls) - len(merged_floors) - len(merged_walls),
+    }
+    return MapGeometry(merged_floors, merged_walls, stats)
+
+
+def merge_cells(rectangles: np.ndarray) -> np.ndarray:
+    """
+    Covers the union of rectangles (with integer corners and an area) with as few rectangles as greedy
+    meshing finds. The result doesn't overlap itself, and comes out bottom row first
+    """
+    if len(rectangles) == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    x, y = _cells(rectangles)
+    left, bottom = x.min(), y.min()
+    width = int(x.max() - left) + 1
+    keys = np.unique((y - bottom) * width + (x - left))  # sorted by row, then column
+    y, x = np.divmod(keys, width)
+
+    # Runs of consecutive cells in a row
+    starts = np.flatnonzero((np.diff(x, prepend=x[0] - 2) != 1) | (np.diff(y, prepend=y[0]) != 0))
+    ends = np.append(starts[1:], len(keys)) - 1
+    runs = zip(y[starts].tolist(), x[starts].tolist(), (x[ends] + 1).tolist())
+
+    merged = []  # [left_x, bottom_y, right_x, top_y], relative to (left, bottom)
+    open_rectangles = {}  # (left_x, right_x) -> the rectangle with those columns that ended highest
+    for row, run_left, run_right in runs:
+        rectangle = open_rectangles.get((run_left, run_right))
+        if rectangle is not None and rectangle[3] == row:
+            rectangle[3] = row + 1
+        else:
+            rectangle = [run_left, row, run_right, row + 1]
+            merged.append(rectangle)
+            open_rectangles[(run_left, run_right)] = rectangle
+    return np.array(merged, dtype=np.int64).reshape(-1, 4) + np.array([left, bottom, left, bottom])
+
+
+def merge_lines(lines: np.ndarray) -> np.ndarray:
+    """
+    Merges lines (rectangles with no width or no height) that lie on the same line and touch or overlap
+    """
+    if len(lines) == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    vertical = lines[:, 0] == lines[:, 2]
+    # (constant, start, end) along every line: x, bottom, top for vertical lines, y, left, right otherwise
+    spans = np.where(vertical[:, None], lines[:, [0, 1, 3]], lines[:, [1, 0, 2]])
+    order = np.lexsort((spans[:, 1], spans[:, 0], vertical))
+
+    merged = []
+    last = None
+    for is_vertical, (constant, start, end) in zip(vertical[order].tolist(), spans[order].tolist()):
+        if last is not None and last[0] == is_vertical and last[1] == constant and start <= last[3]:
+            last[3] = max(last[3], end)
+        else:
+            last = [is_vertical, constant, start, end]
+            merged.append(last)
+    return np.array([(constant, start, constant, end) if is_vertical else (start, constant, end, constant)
+                     for is_vertical, constant, start, end in merged], dtype=np.int64).reshape(-1, 4)
+
+
+def _cells(rectangles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    x and y of every unit cell inside rectangles
+    """
+    widths = rectangles[:, 2] - rectangles[:, 0]
+    heights = rectangles[:, 3] - rectangles[:, 1]
+    areas = widths * heights
+    first = np.repeat(np.cumsum(areas) - areas, areas)
+    index = np.arange(len(first)) - first
+    dy, dx = np.divmod(index, np.repeat(widths, areas))
+    return np.repeat(rectangles[:, 0], areas) + dx, np.repeat(rectangles[:, 1], areas) + dy
+
+
+def _boxes(rectangles: np.ndarray, scale: float, height: float) -> np.ndarray:
+    boxes = np.zeros((len(rectangles), 6), dtype=np.float64)
+    boxes[:, [0, 1, 3, 4]] = rectangles * scale
+    boxes[:, 5] = height
+    return boxes
+
+
+def _box_mesh(box: list[float]) -> tuple[list[tuple], list[tuple]]:
+    min_x, min_y, min_z, max_x, max_y, max_z = box
+    if min_x == max_x or min_y == max_y:
+        # No thickness: one upright face
+        return [(min_x, min_y, min_z), (max_x, max_y, min_z), (max_x, max_y, max_z), (min_x, min_y, max_z)], [(0, 1, 2, 3)]
+    vertices = [(x, y, z) for z in (min_z, max_z) for y in (min_y, max_y) for x in (min_x, max_x)]
+    # Corners are numbered x + 2y + 4z, faces wound to point outwards
+    faces = [(0, 2, 3, 1), (4, 5, 7, 6), (0, 1, 5, 4), (2, 6, 7, 3), (0, 4, 6, 2), (1, 3, 7, 5)]
+    return vertices, faces
+
+
+def parse_args() -> Namespace:
+    arg_parser = ArgumentParser(description="Merge a saved map's tiles into boxes and export them")
+    arg_parser.add_argument("map_path", type=str, help="A BoxNav_map.pkl or BoxNav_map.boxmap")
+    arg_parser.add_argument("output", type=str, help="Output file, .json for a box list or .obj for a mesh")
+    arg_parser.add_argument("--scale", type=float, default=100, help="Output units per map unit")
+    arg_parser.add_argument("--floor_height", type=float, default=1, help="Floor thickness in output units")
+    arg_parser.add_argument("--wall_height", type=float, default=100, help="Wall height in output units")
+    return arg_parser.parse_args()
+
+
+def export(geometry: MapGeometry, path: str, scale: float = 100, floor_height: float = 1, wall_height: float = 100) -> None:
+    """
+    Saves geometry as OBJ if path ends in .obj, as a JSON box list otherwise
+    """
+    if path.endswith(".obj"):
+        geometry.save_obj(path, scale, floor_height, wall_height)
+    else:
+        geometry.save_json(path, scale, floor_height, wall_height)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.map_path.endswith(".boxmap"):
+        from map_file import load_map
+        box_map, _ = load_map(args.map_path)
+    else:
+        import pickle
+        with open(args.map_path, "rb") as map_file:
+            box_map = pickle.load(map_file)
+    geometry = merge_tiles(box_map)
+    export(geometry, args.output, args.scale, args.floor_height, args.wall_height)
+    print(geometry.summary())
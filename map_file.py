@@ -0,0 +1,415 @@
+from argparse import ArgumentParser, Namespace
+from collections.abc import Mapping
+from TargetHandler import TargetHandler
+from BoxMap import BoxMap
+from BoxMap_assets import MST, FloorTile, WallTile, Target, TileView
+import numpy as np
+import pickle
+import random
+import struct
+import json
+import os
+
+"""
+Binary map format
+
+    magic (8 bytes) | version (uint32) | header length (uint32) | JSON header | arrays
+
+The JSON header holds the map parameters and, for every array, its dtype, shape and byte offset.
+Arrays are little endian and 64 byte aligned, so they can be memory mapped straight from the file:
+
+    vertices            (rooms, 2)      int64    MST.get_vertices(), in order
+    mst_keys            (keys, 2)       int64    keys of MST.get_mst(), in order
+    mst_edges           (edges, 3)      int64    (key index, key index, distance) for every MST entry
+    floor_boundaries    (floors, 4)     int32    get_floors() boundaries, in order
+    wall_boundaries     (walls, 4)      int32    get_walls() boundaries, in order
+    target_coordinates  (floors, 2)     float64  coordinates of each floor's target
+    target_traversals   (floors,)       int32    times each target has been traversed
+    adjacency_indptr    (floors + 1,)   int64    CSR adjacency: the targets next to target i are
+    adjacency_indices   (links,)        int32    adjacency_indices[indptr[i]:indptr[i+1]]
+    handler_targets     (handler,)      int32    targets in the TargetHandler, in its order
+"""
+MAGIC = b"BOXMAP\x00\x00"
+VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 64
+
+
+def save_map(path: str, box_map: BoxMap, target_handler: TargetHandler = None) -> None:
+    """
+    Writes a map, and optionally its target handler, in the binary map format.
+    """
+    with open(path, "wb") as map_file:
+        map_file.write(map_to_bytes(box_map, target_handler))
+
+
+def map_to_bytes(box_map: BoxMap, target_handler: TargetHandler = None) -> bytes:
+    """
+    Serializes a map, and optionally its target handler, in the binary map format.
+
+    Targets are matched to the handler by object, or by coordinates when the handler was
+    loaded separately (e.g. from its own pickle). Traversal counts come from the handler's targets.
+    """
+    arrays = _map_arrays(box_map, target_handler)
+    mst = box_map.map
+    header = {
+        "seed": mst.get_seed(),
+        "map_size": list(mst.get_map_size()),
+        "max_room_size": mst.get_max_room_size(),
+        "backend": getattr(mst, "backend", "complete"),
+        "arrays": {},
+    }
+
+    # Offsets are relative to the start of the array data, which follows the header
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    data = bytearray(data_start + offset)
+    data[:_PREAMBLE.size] = _PREAMBLE.pack(MAGIC, VERSION, len(header_bytes))
+    data[_PREAMBLE.size:_PREAMBLE.size + len(header_bytes)] = header_bytes
+    for name, array in arrays.items():
+        start = data_start + header["arrays"][name]["offset"]
+        data[start:start + array.nbytes] = array.tobytes()
+    return bytes(data)
+
+
+def load_map(path: str, offset: int = 0, plain: bool = False) -> tuple[BoxMap, TargetHandler]:
+    """
+    Loads a map saved with save_map.
+
+    The arrays are memory mapped and tiles/targets are only built when they are accessed, so loading
+    takes about the same time for any map size. offset is where the map starts inside the file.
+    Traversal counts can be changed but are not written back to the file.
+    With plain=True every tile and target is built straight away instead (see StoredMap.plain).
+    """
+    stored = StoredMap(path, offset)
+    if plain:
+        return stored.plain()
+    return stored.box_map(), stored.target_handler()
+
+
+def load_map_bytes(data: bytes, plain: bool = False) -> tuple[BoxMap, TargetHandler]:
+    """
+    Loads a map from bytes made by map_to_bytes. The arrays are views into data, unless plain is set.
+    """
+    stored = StoredMap(data)
+    if plain:
+        return stored.plain()
+    return stored.box_map(), stored.target_handler()
+
+
+def read_header(source, offset: int = 0) -> dict:
+    """
+    Reads the header of a map stored in a file (source is a path) or in bytes
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        header_length = _read_preamble(bytes(source[offset:offset + _PREAMBLE.size]))
+        header_start = offset + _PREAMBLE.size
+        header_bytes = bytes(source[header_start:header_start + header_length])
+    else:
+        with open(source, "rb") as map_file:
+            map_file.seek(offset)
+            header_length = _read_preamble(map_file.read(_PREAMBLE.size))
+            header_bytes = map_file.read(header_length)
+    header = json.loads(header_bytes)
+    header["data_start"] = _align(_PREAMBLE.size + header_length)  # relative to the start of the map
+    return header
+
+def _read_preamble(preamble: bytes) -> int:
+    if len(preamble) < _PREAMBLE.size:
+        raise ValueError("Not a BoxMap file")
+    magic, version, header_length = _PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise ValueError("Not a BoxMap file")
+    if version > VERSION:
+        raise ValueError(f"Map format version {version} is not supported, only up to {VERSION}")
+    return header_length
+
+
+class StoredMap():
+    """
+    Arrays of a saved map, plus the tiles and targets built from them so far.
+
+    source is either a path, which is memory mapped starting at offset, or bytes from map_to_bytes.
+    """
+    def __init__(self, source, offset: int = 0) -> None:
+        self.header = read_header(source, offset)
+        in_memory = isinstance(source, (bytes, bytearray, memoryview))
+        data_start = offset + self.header["data_start"]
+        self.arrays = {}
+        for name, info in self.header["arrays"].items():
+            shape = tuple(info["shape"])
+            if np.prod(shape) == 0:
+                array = np.zeros(shape, dtype=info["dtype"])
+            elif in_memory:
+                array = np.frombuffer(source, dtype=info["dtype"], count=int(np.prod(shape)),
+                                      offset=data_start + info["offset"]).reshape(shape)
+                if name == "target_traversals":
+                    array = array.copy()
+            else:
+                # Copy on write, so traversal counts can change without touching the file
+                mode = "c" if name == "target_traversals" else "r"
+                array = np.memmap(source, dtype=info["dtype"], mode=mode, shape=shape,
+                                  offset=data_start + info["offset"])
+            self.arrays[name] = array
+
+        self._targets: dict[int, StoredTarget] = {}
+        self._floor_tiles: dict[int, FloorTile] = {}
+        self._wall_tiles: dict[int, WallTile] = {}
+
+    def target(self, index: int) -> 'StoredTarget':
+        target = self._targets.get(index)
+        if target is None:
+            target = StoredTarget(self, index)
+            self._targets[index] = target
+        return target
+
+    def floor_tile(self, index: int) -> FloorTile:
+        tile = self._floor_tiles.get(index)
+        if tile is None:
+            left_x, bottom_y, right_x, top_y = self.arrays["floor_boundaries"][index].tolist()
+            tile = FloorTile(left_x, bottom_y, right_x, top_y, target=self.target(index))
+            self._floor_tiles[index] = tile
+        return tile
+
+    def wall_tile(self, index: int) -> WallTile:
+        tile = self._wall_tiles.get(index)
+        if tile is None:
+            tile = WallTile(*self.arrays["wall_boundaries"][index].tolist())
+            self._wall_tiles[index] = tile
+        return tile
+
+    def mst(self) -> MST:
+        """
+        Rebuilds the room graph. Its rng starts fresh from the seed.
+        """
+        header = self.header
+        mst = MST.__new__(MST)
+        mst.seed = header["seed"]
+        mst.map_size = tuple(header["map_size"])
+        mst.max_room_size = header["max_room_size"]
+        mst.backend = header["backend"]
+        mst.rng = random.Random(mst.seed)
+        mst.vertices = [tuple(vertex) for vertex in self.arrays["vertices"].tolist()]
+        if mst.backend == "array":
+            mst.points = np.array(self.arrays["vertices"])
+        keys = [tuple(key) for key in self.arrays["mst_keys"].tolist()]
+        mst.mst = {key: [] for key in keys}
+        for frm, to, distance in self.arrays["mst_edges"].tolist():
+            mst.mst[keys[frm]].append((keys[to], distance))
+        return mst
+
+    def box_map(self) -> BoxMap:
+        box_map = BoxMap.__new__(BoxMap)
+        box_map.map = self.mst()
+        box_map.floors = TileView([], range(len(self.arrays["floor_boundaries"])), self.floor_tile)
+        box_map.walls = TileView([], range(len(self.arrays["wall_boundaries"])), self.wall_tile)
+        box_map.grid = None
+        box_map.stats = None
+        return box_map
+
+    def target_handler(self) -> 'StoredTargetHandler':
+        return StoredTargetHandler(StoredTargets(self, self.arrays["handler_targets"]))
+
+    def plain(self) -> tuple[BoxMap, TargetHandler]:
+        """
+        Builds the map and target handler out of ordinary tiles and Targets, the types BoxMap and
+        TargetHandler make themselves, with nothing left pointing at the arrays. For pickling a
+        loaded map the same way as a freshly built one.
+        """
+        arrays = self.arrays
+        targets = [Target(x, y) for x, y in arrays["target_coordinates"].tolist()]
+        indptr = arrays["adjacency_indptr"].tolist()
+        indices = arrays["adjacency_indices"].tolist()
+        traversals = arrays["target_traversals"].tolist()
+        for i, target in enumerate(targets):
+            target._adjacent_targets = tuple(targets[j] for j in indices[indptr[i]:indptr[i + 1]])
+            target._times_traversed = traversals[i]
+
+        box_map = BoxMap.__new__(BoxMap)
+        box_map.map = self.mst()
+        box_map.floors = [FloorTile(*boundaries, target=target)
+                          for boundaries, target in zip(arrays["floor_boundaries"].tolist(), targets)]
+        box_map.walls = [WallTile(*boundaries) for boundaries in arrays["wall_boundaries"].tolist()]
+        box_map.grid = None
+        box_map.stats = None
+        target_handler = TargetHandler()
+        for index in arrays["handler_targets"].tolist():
+            target_handler._add_target(targets[index])
+        return box_map, target_handler
+
+
+class StoredTargetHandler(TargetHandler):
+    """
+    TargetHandler whose targets are read from a StoredMap. Adding targets copies them into
+    a plain dict first, since the stored lookup is read only.
+    """
+    def __init__(self, targets: 'StoredTargets') -> None:
+        super().__init__()
+        self.targets = targets
+
+    def add_targets_from_tiles(self, tiles: list[FloorTile]) -> None:
+        self._materialise()
+        super().add_targets_from_tiles(tiles)
+    def _add_target(self, target: Target) -> None:
+        self._materialise()
+        super()._add_target(target)
+
+    def _materialise(self) -> None:
+        if not isinstance(self.targets, dict):
+            self.targets = dict(self.targets.items())
+
+
+class StoredTarget(Target):
+    """
+    Target of a StoredMap. The traversal count lives in the map's arrays and the adjacent
+    targets are looked up the first time they are needed.
+    """
+    __slots__ = ("_stored", "_index")
+    _UNLINKED = None  # looked up again when needed
+
+    def __init__(self, stored: StoredMap, index: int):
+        super().__init__(*stored.arrays["target_coordinates"][index].tolist())
+        self._stored = stored
+        self._index = index
+        self._adjacent_targets = None
+
+    def get_times_traversed(self) -> int:
+        return int(self._stored.arrays["target_traversals"][self._index])
+    def get_adjacent_targets(self) -> tuple[Target, ...]:
+        if self._adjacent_targets is None:
+            indptr = self._stored.arrays["adjacency_indptr"]
+            indices = self._stored.arrays["adjacency_indices"][indptr[self._index]:indptr[self._index + 1]]
+            self._adjacent_targets = tuple(self._stored.target(i) for i in indices.tolist())
+        return self._adjacent_targets
+    def add_target(self, target: Target):
+        self.get_adjacent_targets()
+        super().add_target(target)
+    def remove_target(self, target: Target):
+        self.get_adjacent_targets()
+        super().remove_target(target)
+    def traverse(self):
+        self._stored.arrays["target_traversals"][self._index] += 1
+    def reset(self):
+        self._stored.arrays["target_traversals"][self._index] = 0
+
+
+class StoredTargets(Mapping):
+    """
+    Read only coordinates -> Target mapping for a TargetHandler, backed by a StoredMap.
+    The coordinate lookup table is built on the first lookup.
+    """
+    def __init__(self, stored: StoredMap, indices: np.ndarray) -> None:
+        self._stored = stored
+        self._indices = indices
+        self._lookup: dict[tuple, int] = None
+
+    def _coordinates(self, index: int) -> tuple:
+        return tuple(self._stored.arrays["target_coordinates"][index].tolist())
+
+    def __getitem__(self, coordinates: tuple) -> Target:
+        if self._lookup is None:
+            coordinates_list = self._stored.arrays["target_coordinates"][self._indices].tolist()
+            self._lookup = {tuple(c): i for c, i in zip(coordinates_list, self._indices.tolist())}
+        return self._stored.target(self._lookup[coordinates])
+    def __iter__(self):
+        for index in self._indices.tolist():
+            yield self._coordinates(index)
+    def __len__(self) -> int:
+        return len(self._indices)
+
+
+def _map_arrays(box_map: BoxMap, target_handler: TargetHandler) -> dict[str, np.ndarray]:
+    mst = box_map.map
+    floors = list(box_map.get_floors())
+    walls = list(box_map.get_walls())
+    targets = [floor.get_target() for floor in floors]
+    index_of = {id(target): i for i, target in enumerate(targets)}
+
+    keys = list(mst.get_mst())
+    key_index = {key: i for i, key in enumerate(keys)}
+    mst_edges = [(key_index[frm], key_index[to], distance)
+                 for frm, connections in mst.get_mst().items() for to, distance in connections]
+
+    indptr = [0]
+    indices = []
+    for target in targets:
+        indices.extend(index_of[id(adjacent)] for adjacent in target.get_adjacent_targets())
+        indptr.append(len(indices))
+
+    traversals = [target.get_times_traversed() for target in targets]
+    by_coordinates = {}
+    if target_handler is None:
+        # Same order and overwrite rules as TargetHandler.add_targets_from_tiles
+        for i, target in enumerate(targets):
+            by_coordinates[target.get_coordinates()] = i
+        handler_targets = list(by_coordinates.values())
+    else:
+        by_coordinates = {target.get_coordinates(): i for i, target in enumerate(targets)}
+        handler_targets = []
+        for coordinates, target in target_handler.targets.items():
+            i = index_of.get(id(target), by_coordinates.get(coordinates))
+            if i is None:
+                raise ValueError(f"Target handler has a target at {coordinates} that is not on the map")
+            handler_targets.append(i)
+            traversals[i] = target.get_times_traversed()
+
+    def _array(values, dtype, width=None):
+        array = np.array(values, dtype=dtype)
+        return array.reshape(-1, width) if width else array
+
+    return {
+        "vertices": _array(mst.get_vertices(), "<i8", 2),
+        "mst_keys": _array(keys, "<i8", 2),
+        "mst_edges": _array(mst_edges, "<i8", 3),
+        "floor_boundaries": _array([floor.get_boundaries() for floor in floors], "<i4", 4),
+        "wall_boundaries": _array([wall.get_boundaries() for wall in walls], "<i4", 4),
+        "target_coordinates": _array([target.get_coordinates() for target in targets], "<f8", 2),
+        "target_traversals": _array(traversals, "<i4"),
+        "adjacency_indptr": _array(indptr, "<i8"),
+        "adjacency_indices": _array(indices, "<i4"),
+        "handler_targets": _array(handler_targets, "<i4"),
+    }
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def convert_pickles(directory: str, output: str = None) -> str:
+    """
+    Converts BoxNav_map.pkl and target_handler.pkl in a map directory made by generate_map.py
+    into BoxNav_map.boxmap. Returns the path of the new file.
+    """
+    with open(os.path.join(directory, "BoxNav_map.pkl"), "rb") as map_file:
+        box_map = pickle.load(map_file)
+    target_handler = None
+    handler_path = os.path.join(directory, "target_handler.pkl")
+    if os.path.exists(handler_path):
+        with open(handler_path, "rb") as target_file:
+            target_handler = pickle.load(target_file)
+
+    output = output or os.path.join(directory, "BoxNav_map.boxmap")
+    save_map(output, box_map, target_handler)
+    return output
+
+
+def parse_args() -> Namespace:
+    arg_parser = ArgumentParser(description="Convert pickled maps made by generate_map.py to the binary map format.")
+
+    arg_parser.add_argument("directories", nargs="+", help="Map directories containing BoxNav_map.pkl (and target_handler.pkl)")
+
+    return arg_parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for directory in args.directories:
+        print(f"Saved {convert_pickles(directory)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+from BoxMap import BoxMap
+import numpy as np
+import struct
+import zlib
+
+"""
+Raster rendering of BoxMaps
+
+Tiles are painted into one RGB numpy array instead of one matplotlib patch per tile, so a map can be
+shown with a single imshow, or saved straight to a PNG without matplotlib.
+matplotlib is only imported by draw_map, the first time it is called.
+
+    image = render_map(box_map)
+    save_png("map_visualization.png", box_map)
+    draw_map(box_map, show=True)
+"""
+COLORS = {
+    "background": (255, 255, 255),
+    "floor": (128, 128, 128),   # grey
+    "wall": (0, 128, 0),        # green
+    "room_wall": (0, 0, 0),     # room walls are lines, drawn black
+    "target": (255, 0, 0),      # red
+    "traversed_target": (0, 128, 0),
+    "connection": (128, 0, 128),  # purple
+}
+
+
+def render_map(box_map: BoxMap, scale: int = None, targets: bool = True, connections: bool = False) -> np.ndarray:
+    """
+    Paints the map into a (height * scale, width * scale, 3) uint8 array, with scale pixels per map unit.
+    Row 0 is the bottom of the map, so show it with imshow(origin="lower") or flip it for image files.
+    By default scale keeps the image around 2000 pixels across, up to 8 pixels per unit.
+    """
+    width, height = box_map.map.get_map_size()
+    scale = scale or default_scale(box_map)
+    image = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+    image[:] = COLORS["background"]
+
+    _paint_tiles(image, tile_boundaries(box_map.get_floors()), scale, COLORS["floor"], COLORS["floor"])
+    _paint_tiles(image, tile_boundaries(box_map.get_walls()), scale, COLORS["wall"], COLORS["room_wall"])
+    if connections:
+        _paint_lines(image, target_edges(box_map), scale, COLORS["connection"])
+    if targets:
+        coordinates, traversed = target_points(box_map)
+        _paint_points(image, coordinates[~traversed], scale, COLORS["target"])
+        _paint_points(image, coordinates[traversed], scale, COLORS["traversed_target"])
+    return image
+
+
+def draw_map(box_map: BoxMap, show: bool = False, scale: int = None):
+    """
+    Draws a matplotlib graph of the tiles to visualize the tile map. Returns the axes.
+    Tiles are painted into one image with scale pixels per map unit, picked from the map size
+    if not given, and the connections between targets are drawn on top as one LineCollection.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    _, ax = plt.subplots()
+
+    x, y = box_map.map.get_map_size()
+    ax.set_xlim(0, x)
+    ax.set_ylim(0, y)
+
+    # Plot floor and wall tiles
+    ax.imshow(render_map(box_map, scale, targets=False), origin="lower", extent=(0, x, 0, y), interpolation="nearest")
+
+    # Draw connections between targets, each one once
+    ax.add_collection(LineCollection(target_edges(box_map), colors=_rgb(COLORS["connection"]), linewidths=0.5))
+
+    # Add targets
+    coordinates, traversed = target_points(box_map)
+    colors = np.where(traversed[:, None], _rgb(COLORS["traversed_target"]), _rgb(COLORS["target"]))
+    ax.scatter(coordinates[:, 0], coordinates[:, 1], s=1, c=colors, linewidths=0)
+
+    if show:
+        plt.show()
+    return ax
+
+
+def default_scale(box_map: BoxMap) -> int:
+    return max(1, min(8, 2048 // max(box_map.map.get_map_size())))
+
+
+def save_png(path: str, box_map: BoxMap, scale: int = None, targets: bool = True, connections: bool = True) -> None:
+    """
+    Renders the map and writes it as a PNG, without matplotlib
+    """
+    write_png(path, render_map(box_map, scale, targets, connections)[::-1])
+
+
+def write_png(path: str, image: np.ndarray) -> None:
+    """
+    Writes an (height, width, 3) uint8 array as an 8 bit RGB PNG. Row 0 is the top of the image.
+    """
+    height, width, _ = image.shape
+    # Every row starts with filter type 0 (none)
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n")
+        png_file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        png_file.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        png_file.write(chunk(b"IEND", b""))
+
+
+def tile_boundaries(tiles: list) -> np.ndarray:
+    """
+    (tiles, 4) array of (left_x, bottom_y, right_x, top_y)
+    """
+    return np.array([tile.get_boundaries() for tile in tiles], dtype=np.int64).reshape(-1, 4)
+
+
+def target_points(box_map: BoxMap) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Coordinates of every floor's target, and whether it has been traversed
+    """
+    targets = [tile.get_target() for tile in box_map.get_floors()]
+    coordinates = np.array([target.get_coordinates() for target in targets], dtype=np.float64).reshape(-1, 2)
+    traversed = np.array([target.get_times_traversed() > 0 for target in targets], dtype=bool)
+    return coordinates, traversed
+
+
+def target_edges(box_map: BoxMap) -> np.ndarray:
+    """
+    (edges, 2, 2) array of the connections between targets, each connection once
+    """
+    targets = [tile.get_target() for tile in box_map.get_floors()]
+    seen = set()
+    edges = []
+    for target in targets:
+        for connected_target in target.get_adjacent_targets():
+            key = (id(connected_target), id(target))
+            if key in seen:
+                continue
+            seen.add((id(target), id(connected_target)))
+            edges.append((target.get_coordinates(), connected_target.get_coordinates()))
+    return np.array(edges, dtype=np.float64).reshape(-1, 2, 2)
+
+
+def _rgb(color: tuple) -> tuple:
+    return tuple(channel / 255 for channel in color)
+
+
+def _paint_tiles(image: np.ndarray, boundaries: np.ndarray, scale: int, color: tuple, line_color: tuple) -> None:
+    if len(boundaries) == 0:
+        return
+    pixels = boundaries * scale
+    # Tiles with no width or height (room walls) are lines, one pixel thick
+    lines = (pixels[:, 2] == pixels[:, 0]) | (pixels[:, 3] == pixels[:, 1])
+    pixels[:, 2] = np.maximum(pixels[:, 2], pixels[:, 0] + 1)
+    pixels[:, 3] = np.maximum(pixels[:, 3], pixels[:, 1] + 1)
+    pixels[:, [0, 2]] = pixels[:, [0, 2]].clip(0, image.shape[1])
+    pixels[:, [1, 3]] = pixels[:, [1, 3]].clip(0, image.shape[0])
+
+    # Hallway tiles are all 1x1, so they are painted together
+    unit = ~lines & (boundaries[:, 2] - boundaries[:, 0] == 1) & (boundaries[:, 3] - boundaries[:, 1] == 1)
+    unit &= (pixels[:, 2] - pixels[:, 0] == scale) & (pixels[:, 3] - pixels[:, 1] == scale)
+    if unit.any():
+        offsets = np.arange(scale)
+        rows = pixels[unit, 1][:, None, None] + offsets[None, :, None]
+        columns = pixels[unit, 0][:, None, None] + offsets[None, None, :]
+        image[rows, columns] = color
+    for (left, bottom, right, top), line in zip(pixels[~unit].tolist(), lines[~unit].tolist()):
+        image[bottom:top, left:right] = line_color if line else color
+
+
+def _paint_points(image: np.ndarray, points: np.ndarray, scale: int, color: tuple) -> None:
+    if len(points) == 0:
+        return
+    # A dot about a fifth of a tile wide
+    radius = max(scale // 10, 0)
+    offsets = np.arange(-radius, radius + 1)
+    rows = np.floor(points[:, 1] * scale).astype(np.int64)[:, None, None] + offsets[None, :, None]
+    columns = np.floor(points[:, 0] * scale).astype(np.int64)[:, None, None] + offsets[None, None, :]
+    rows, columns = np.broadcast_arrays(rows, columns)
+    inside = (rows >= 0) & (rows < image.shape[0]) & (columns >= 0) & (columns < image.shape[1])
+    image[rows[inside], columns[inside]] = color
+
+
+def _paint_lines(image: np.ndarray, edges: np.ndarray, scale: int, color: tuple) -> None:
+    if len(edges) == 0:
+        return
+    starts = edges[:, 0] * scale
+    ends = edges[:, 1] * scale
+    # Sample every line about once per pixel along its longest axis
+    samples = np.ceil(np.abs(ends - starts).max(axis=1)).astype(np.int64) + 1
+    line = np.repeat(np.arange(len(edges)), samples)
+    step = np.arange(len(line)) - np.repeat(np.cumsum(samples) - samples, samples)
+    fraction = step / np.maximum(samples[line] - 1, 1)
+    points = starts[line] + (ends[line] - starts[line]) * fraction[:, None]
+    rows = np.floor(points[:, 1]).astype(np.int64)
+    columns = np.floor(points[:, 0]).astype(np.int64)
+    inside = (rows >= 0) & (rows < image.shape[0]) & (columns >= 0) & (columns < image.shape[1])
+    image[rows[inside], columns[inside]] = color
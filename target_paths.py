@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from TargetHandler import TargetHandler, ArrayTargetHandler
+import numpy as np
+
+"""
+Shortest paths over the target graph
+
+Distances are counted in steps from target to target along get_adjacent_targets(), the way an agent
+moves with find_new_target. A PathEngine answers distance and path queries for one map:
+
+    engine = PathEngine(target_handler)
+    engine.distance(start, goal)        # steps, or None if goal can't be reached
+    engine.path(start, goal)            # coordinates of every target on the way, both ends included
+    engine.distance_field(goal)         # steps from goal to every target, by target id, -1 if unreachable
+
+Full BFS distance fields are kept in a bounded LRU cache. A single distance/path query without a cached
+field runs a bidirectional BFS instead, which only covers about two balls of half the distance around
+the ends. (Links are all one step but differ in length, so A* with a Manhattan heuristic searched barely
+less than a plain BFS.) For small maps every field can be computed once with precompute() and saved
+next to the map with save_table(), as a compressed table in the smallest unsigned integer type that fits.
+"""
+
+
+class PathEngine():
+    """
+    Shortest paths over the targets of a TargetHandler. A plain TargetHandler is turned into an
+    ArrayTargetHandler, so the engine never changes the handler's traversal counts.
+
+    Links are followed in their direction, so distance(a, b) is the number of steps from a to b.
+    """
+    def __init__(self, target_handler: TargetHandler, cache_size: int = 256) -> None:
+        if not isinstance(target_handler, ArrayTargetHandler):
+            target_handler = ArrayTargetHandler.from_handler(target_handler)
+        self.target_handler = target_handler
+        self.cache_size = cache_size
+        self.fields: OrderedDict[int, np.ndarray] = OrderedDict()
+        self.table: np.ndarray = None
+        self.stats = {"table_hits": 0, "field_hits": 0, "fields_computed": 0, "searches": 0}
+
+        self._rows = target_handler.get_adjacency_rows()
+        self._coordinates = target_handler.get_all_coordinates()
+        self._reverse_rows: list[tuple[int, ...]] = None  # the targets linking to each target, built on the first search
+
+    def get_num_targets(self) -> int:
+        return len(self._rows)
+
+    def get_target_id(self, coordinates: tuple) -> int:
+        return self.target_handler.get_target_id(coordinates)
+
+    def distance(self, start: tuple, goal: tuple) -> int:
+        """
+        Steps from start to goal, or None if goal can't be reached
+        """
+        start_id, goal_id = self.get_target_id(start), self.get_target_id(goal)
+        if self.table is not None:
+            self.stats["table_hits"] += 1
+            distance = int(self.table[start_id, goal_id])
+            return None if distance == np.iinfo(self.table.dtype).max else distance
+        field = self._cached_field(start_id)
+        if field is not None:
+            distance = int(field[goal_id])
+            return None if distance < 0 else distance
+        path = self._search(start_id, goal_id)
+        return None if path is None else len(path) - 1
+
+    def path(self, start: tuple, goal: tuple) -> list[tuple]:
+        """
+        Coordinates of the targets on a shortest path from start to goal, both included, or None
+        """
+        path = self._search(self.get_target_id(start), self.get_target_id(goal))
+        return None if path is None else [self._coordinates[target_id] for target_id in path]
+
+    def distance_field(self, source: tuple) -> np.ndarray:
+        """
+        Steps from source to every target, indexed by target id, -1 where it can't be reached
+        """
+        source_id = self.get_target_id(source)
+        field = self._cached_field(source_id)
+        if field is None:
+            field = self._bfs(source_id)
+            self.stats["fields_computed"] += 1
+            if self.cache_size > 0:
+                self.fields[source_id] = field
+                while len(self.fields) > self.cache_size:
+                    self.fields.popitem(last=False)
+        return field
+
+    def precompute(self, max_targets: int = 10000) -> np.ndarray:
+        """
+        Computes the distance between every pair of targets. Row i is the distance field of target i,
+        unreachable pairs hold the largest value of the table's dtype.
+        The table takes targets^2 entries, so maps with more than max_targets targets raise a ValueError
+        """
+        num_targets = self.get_num_targets()
+        if num_targets > max_targets:
+            raise ValueError(f"{num_targets} targets would need a {num_targets}x{num_targets} table, "
+                             f"over max_targets={max_targets}")
+        fields = [self._bfs(source_id) for source_id in range(num_targets)]
+        longest = max((int(field.max()) for field in fields), default=0)
+        dtype = _smallest_dtype(longest + 1)
+        table = np.full((num_targets, num_targets), np.iinfo(dtype).max, dtype=dtype)
+        for source_id, field in enumerate(fields):
+            reachable = field >= 0
+            table[source_id, reachable] = field[reachable]
+        self.table = table
+        return table
+
+    def save_table(self, path: str) -> None:
+        """
+        Saves the precomputed table, with the target coordinates it belongs to, as a compressed .npz
+        """
+        if self.table is None:
+            raise ValueError("No table to save, call precompute() first")
+        np.savez_compressed(path, distances=self.table, coordinates=np.array(self._coordinates, dtype=np.float64))
+
+    def load_table(self, path: str) -> None:
+        """
+        Loads a table saved with save_table. It has to come from the same map
+        """
+        with np.load(path) as saved:
+            coordinates = saved["coordinates"]
+            if coordinates.shape != (self.get_num_targets(), 2) or not np.array_equal(coordinates, self._coordinates):
+                raise ValueError(f"Distance table {path} was made for a different map")
+            self.table = saved["distances"]
+
+    def _cached_field(self, source_id: int) -> np.ndarray:
+        field = self.fields.get(source_id)
+        if field is not None:
+            self.fields.move_to_end(source_id)
+            self.stats["field_hits"] += 1
+        return field
+
+    def _bfs(self, source_id: int) -> np.ndarray:
+        rows = self._rows
+        distances = [-1] * len(rows)
+        distances[source_id] = 0
+        frontier = [source_id]
+        steps = 0
+        while frontier:
+            steps += 1
+            next_frontier = []
+            for target_id in frontier:
+                for adjacent_id in rows[target_id]:
+                    if distances[adjacent_id] < 0:
+                        distances[adjacent_id] = steps
+                        next_frontier.append(adjacent_id)
+            frontier = next_frontier
+        return np.array(distances, dtype=np.int32)
+
+    def _search(self, start_id: int, goal_id: int) -> list[int]:
+        """
+        Bidirectional BFS between start and goal, returns the target ids on a shortest path or None.
+        Each round grows the side with the smaller frontier by a whole level, forwards along the links
+        from start or backwards along them from goal, until the two sides meet.
+        """
+        self.stats["searches"] += 1
+        if self._reverse_rows is None:
+            self._reverse_rows = _reverse(*self.target_handler.get_adjacency())
+        # target id -> (the next target towards that side's end, steps from that end)
+        forward = {start_id: (None, 0)}
+        backward = {goal_id: (None, 0)}
+        forward_frontier = [start_id]
+        backward_frontier = [goal_id]
+        meeting = start_id if start_id == goal_id else None
+        while meeting is None and forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = _grow(forward_frontier, self._rows, forward, backward)
+            else:
+                backward_frontier, meeting = _grow(backward_frontier, self._reverse_rows, backward, forward)
+        if meeting is None:
+            return None
+        path = []
+        target_id = meeting
+        while target_id is not None:
+            path.append(target_id)
+            target_id = forward[target_id][0]
+        path.reverse()
+        target_id = backward[meeting][0]
+        while target_id is not None:
+            path.append(target_id)
+            target_id = backward[target_id][0]
+        return path
+
+
+def _grow(frontier: list[int], rows: list[tuple[int, ...]], side: dict, other_side: dict) -> tuple[list[int], int]:
+    """
+    Grows one side of a bidirectional BFS by a whole level. Returns the new frontier, and of the new targets
+    the other side has reached the one closest to the other end, or None.
+    Taking the closest over the whole level is what keeps the path a shortest one.
+    """
+    next_frontier = []
+    meeting = None
+    for target_id in frontier:
+        steps = side[target_id][1] + 1
+        for adjacent_id in rows[target_id]:
+            if adjacent_id not in side:
+                side[adjacent_id] = (target_id, steps)
+                next_frontier.append(adjacent_id)
+                if adjacent_id in other_side and (meeting is None or other_side[adjacent_id][1] < other_side[meeting][1]):
+                    meeting = adjacent_id
+    return next_frontier, meeting
+
+
+def _reverse(indptr: np.ndarray, indices: np.ndarray) -> list[tuple[int, ...]]:
+    """
+    The targets linking to each target, from the CSR adjacency
+    """
+    num_targets = len(indptr) - 1
+    sources = np.repeat(np.arange(num_targets), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    reverse_indptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=num_targets)))).tolist()
+    reverse_sources = sources[order].tolist()
+    return [tuple(reverse_sources[start:end]) for start, end in zip(reverse_indptr, reverse_indptr[1:])]
+
+
+def _smallest_dtype(largest: int) -> np.dtype:
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if largest <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
@@ -0,0 +1,76 @@
+import os
+import sys
+import random
+import pytest
+
+# The modules live at the top of the repo, not in an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BoxMap import BoxMap
+from BoxMap_assets import MST, FloorTile
+from TargetHandler import TargetHandler
+
+
+def _make_mst(seed: int, num_rooms: int = 40, map_size: int = 300, max_room_size: int = 10, num_cycles: int = 4,
+              backend: str = "complete") -> MST:
+    mst = MST(num_rooms, map_size, map_size, max_room_size, seed, backend=backend, rng=random.Random(seed))
+    mst.add_cycles(num_cycles)
+    return mst
+
+
+def _make_map(seed: int, target_offset=0, grid: bool = False, stats=None, **mst_options) -> BoxMap:
+    return BoxMap(_make_mst(seed, **mst_options), target_offset, grid=grid, stats=stats)
+
+
+def _make_handler(box_map: BoxMap, handler_class=TargetHandler, **options) -> TargetHandler:
+    target_handler = handler_class(**options)
+    target_handler.add_targets_from_tiles(box_map.get_floors())
+    return target_handler
+
+
+def _describe(floors: list[FloorTile]) -> list:
+    return [(floor.get_boundaries(), floor.get_target().get_coordinates(),
+             [adjacent.get_coordinates() for adjacent in floor.get_target().get_adjacent_targets()])
+            for floor in floors]
+
+
+@pytest.fixture
+def make_mst():
+    """
+    make_mst(seed, num_rooms=40, map_size=300, max_room_size=10, num_cycles=4, backend="complete"):
+    a square map's room graph, with its own random.Random(seed)
+    """
+    return _make_mst
+
+
+@pytest.fixture
+def make_map():
+    """
+    make_map(seed, target_offset=0, grid=False, stats=None, **mst_options): the BoxMap of make_mst's room graph
+    """
+    return _make_map
+
+
+@pytest.fixture
+def make_handler():
+    """
+    make_handler(box_map, handler_class=TargetHandler, **options): a target handler holding the map's floors
+    """
+    return _make_handler
+
+
+@pytest.fixture
+def describe():
+    """
+    describe(floors): the boundaries, target and adjacent targets of every floor, in order, for comparing maps
+    """
+    return _describe
+
+
+@pytest.fixture
+def old_pickles() -> str:
+    """
+    Directory of a map and target handler pickled by the original generator, before the grid
+    backend, slots and packed links
+    """
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "7")
@@ -0,0 +1,77 @@
+from BoxMap import BoxMap, ChunkedBoxMap
+from BoxMap_assets.chunks import HallwayPlan, ChunkContents, cell_uniforms
+from TargetHandler import ChunkTargetHandler
+import random
+import pytest
+
+
+
+def chunk_tiles(chunked_map: ChunkedBoxMap, keys: list[tuple]) -> dict:
+    return {key: ([(floor.get_boundaries(), floor.get_target().get_coordinates()) for floor in chunked_map.get_chunk(key).get_floors()],
+                  [wall.get_boundaries() for wall in chunked_map.get_chunk(key).get_walls()])
+            for key in keys}
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("chunk_size, max_chunks", [(16, 4), (7, 2), (64, 256), (256, 8)])
+def test_chunks_give_the_eager_map(make_mst, describe, seed, chunk_size, max_chunks):
+    eager = BoxMap(make_mst(seed, map_size=200), 0)
+    chunked_map = ChunkedBoxMap(make_mst(seed, map_size=200), 0, chunk_size=chunk_size, max_chunks=max_chunks)
+    assert describe(chunked_map.get_floors()) == describe(eager.get_floors())
+    assert [wall.get_boundaries() for wall in chunked_map.get_walls()] == [wall.get_boundaries() for wall in eager.get_walls()]
+    assert chunked_map.count_targets() == len({floor.get_target().get_coordinates() for floor in eager.get_floors()})
+
+
+def test_chunks_dont_depend_on_build_order(make_mst):
+    chunked_map = ChunkedBoxMap(make_mst(3, map_size=200), 0.4, chunk_size=32, max_chunks=3)
+    fresh_map = ChunkedBoxMap(make_mst(3, map_size=200), 0.4, chunk_size=32, max_chunks=300)
+    keys = chunked_map.get_chunk_keys()
+    shuffled = list(keys)
+    random.Random(1).shuffle(shuffled)
+    assert chunk_tiles(chunked_map, keys) == chunk_tiles(fresh_map, shuffled)
+    assert chunked_map.chunk_stats["evictions"] > 0
+
+
+def test_walk_matches_the_eager_map_through_evictions(make_mst, make_handler):
+    target_handler = make_handler(BoxMap(make_mst(2, 80, 300), 0))
+    chunked_map = ChunkedBoxMap(make_mst(2, 80, 300), 0, chunk_size=16, max_chunks=6)
+    chunk_handler = ChunkTargetHandler(chunked_map)
+    coordinates = target_handler.get_starting_coordinate()
+    assert chunk_handler.get_starting_coordinate() == coordinates
+    chunk_coordinates = coordinates
+    for _ in range(5000):
+        target_handler.traverse_target(coordinates)
+        chunk_handler.traverse_target(chunk_coordinates)
+        coordinates = target_handler.find_new_target(coordinates)
+        chunk_coordinates = chunk_handler.find_new_target(chunk_coordinates)
+        assert chunk_coordinates == coordinates
+    untraversed = sum(1 for target in target_handler.targets.values() if target.get_times_traversed() == 0)
+    assert chunked_map.count_untraversed() == untraversed
+    assert chunked_map.chunk_stats["evictions"] > 0
+
+
+def test_local_cells_of_chunks_past_the_grid():
+    plan = HallwayPlan((80, 80), 256)
+    contents = ChunkContents((0, -1), plan)
+    assert contents.local(plan.cell(5, -1)) == 5 * 256 + 255
+    assert ChunkContents((-1, 0), plan).local(plan.cell(-1, 7)) == 255 * 256 + 7
+
+
+def test_cell_uniforms_are_pinned():
+    # Hallway target offsets of chunked maps come from these, so they mustn't change with the interpreter
+    assert cell_uniforms(7, [0, 1, 12345], 0).tolist() == [0.6926933172367656, 0.25334357967106147, 0.4274172836605947]
+    assert cell_uniforms(-3, [5], 1).tolist() == [0.48918139469357913]
+    assert cell_uniforms(7, [5], 1).tolist() != cell_uniforms(7, [5], 0).tolist()
+
+
+def test_chunk_targets_are_read_only(make_mst):
+    chunked_map = ChunkedBoxMap(make_mst(1, map_size=200), 0, chunk_size=32)
+    target_handler = ChunkTargetHandler(chunked_map)
+    room_target, hallway_target = chunked_map.get_floors()[0].get_target(), chunked_map.get_floors()[-1].get_target()
+    for target in (room_target, hallway_target):
+        with pytest.raises(TypeError):
+            target.add_target(room_target)
+        with pytest.raises(TypeError):
+            target.remove_target(room_target)
+    with pytest.raises(TypeError):
+        target_handler.add_targets_from_tiles(chunked_map.get_floors())
@@ -0,0 +1,51 @@
+from BoxMap_assets import FloorTile
+from TargetHandler import ArrayTargetHandler
+from coverage_tour import CoverageTour, plan_tour, _deepest_last_order, _Jump
+import pytest
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_tour_visits_every_target_along_links(make_map, make_handler, seed):
+    target_handler = make_handler(make_map(seed, 1, num_cycles=10), ArrayTargetHandler)
+    # Nothing links to this one, so the tour can't reach it
+    target_handler.add_targets_from_tiles([FloorTile(-50, -50, -49, -49)])
+    rows = target_handler.get_adjacency_rows()
+    tour = plan_tour(target_handler)
+
+    walk = tour.walk.tolist()
+    assert walk[0] == target_handler.get_target_id(target_handler.get_starting_coordinate())
+    assert all(to in rows[frm] for frm, to in zip(walk, walk[1:]))
+    reachable = set(_deepest_last_order(rows, walk[0]))
+    assert set(walk) == reachable and tour.unreachable == len(rows) - len(reachable)
+    assert target_handler.get_target_id((-49.5, -49.5)) not in reachable
+    # The stops come up along the walk in order, though a jump can pass through a later one on the way
+    position = 0
+    for stop in tour.stops.tolist():
+        position = walk.index(stop, position)
+    assert sorted(tour.stops.tolist()) == sorted(reachable)
+    # Never worse than walking the BFS tree depth first
+    assert tour.get_length() <= 2 * (len(reachable) - 1)
+
+
+def test_jumps_are_shortest_walks(make_map, make_handler):
+    target_handler = make_handler(make_map(2, 1), ArrayTargetHandler)
+    rows = target_handler.get_adjacency_rows()
+    stops = _deepest_last_order(rows, 0)
+    for frm, to in zip(stops[::37], stops[5::37]):
+        jump = _Jump.find(rows, frm, to)
+        path = jump.get_path()
+        assert path[0] == frm and path[-1] == to and jump.length == len(path) - 1
+        assert all(b in rows[a] for a, b in zip(path, path[1:]))
+        assert jump.reverse().get_path() == path[::-1]
+        assert _Jump.find(rows, frm, to, jump.length - 1).length is None
+
+
+def test_saved_tour_only_loads_for_its_map(make_map, make_handler, tmp_path):
+    target_handler = make_handler(make_map(1, 1), ArrayTargetHandler)
+    tour = plan_tour(target_handler)
+    path = str(tmp_path / "coverage_tour.npz")
+    tour.save(path)
+    loaded = CoverageTour.load(path, target_handler)
+    assert loaded.walk.tolist() == tour.walk.tolist() and loaded.get_walk_coordinates() == tour.get_walk_coordinates()
+    with pytest.raises(ValueError):
+        CoverageTour.load(path, make_handler(make_map(2, 1)))
@@ -0,0 +1,58 @@
+from generate_map import parse_seeds
+from itertools import islice
+import subprocess
+import sys
+import os
+import pytest
+
+OPTIONAL_MODULES = ["matplotlib", "map_file", "map_corpus", "map_cache", "map_render", "target_paths", "coverage_tour", "map_export"]
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_parse_seeds():
+    assert list(parse_seeds("0-3")) == [0, 1, 2, 3]
+    assert list(parse_seeds("1,5,10-12")) == [1, 5, 10, 11, 12]
+    assert list(parse_seeds("1,-3")) == [1, -3]
+    assert list(parse_seeds("-5--3, 2")) == [-5, -4, -3, 2]
+    # Far too many to list
+    assert list(islice(parse_seeds("7,0-1000000000000"), 3)) == [7, 0, 1]
+
+
+@pytest.mark.parametrize("seeds", ["1,,2", "a-3", "1-2-3", "0-1000000000000,x"])
+def test_parse_seeds_rejects_garbage(seeds):
+    with pytest.raises(ValueError):
+        parse_seeds(seeds)
+
+
+def run_generate_map(*options) -> str:
+    result = subprocess.run([sys.executable, os.path.join(REPO, "generate_map.py"), "--no-render", *options],
+                            capture_output=True, text=True, check=True, cwd=REPO)
+    return result.stdout
+
+
+def test_batch_stats_are_added_up_in_one_summary(tmp_path):
+    output = run_generate_map("--seeds", "1-3", "--workers", "2", "--stats", "--output_dir", str(tmp_path))
+    summaries = [line for line in output.splitlines() if "blueprint" in line]
+    assert len(summaries) == 1 and summaries[0].startswith("All seeds:")
+    assert "maps 3," in output
+
+
+def test_batch_cache_stats_are_added_up(tmp_path):
+    options = ("--seeds", "1-3", "--workers", "2", "--cache_dir", str(tmp_path / "cache"), "--output_dir", str(tmp_path))
+    assert "'misses': 3," in run_generate_map(*options)
+    output = run_generate_map(*options)
+    assert "'disk_hits': 3, 'misses': 0," in output and "hit rate 100%" in output
+
+
+def test_building_a_map_loads_no_optional_modules():
+    # In a fresh interpreter, since this one has imported everything already
+    code = ("import sys, random, generate_map\n"
+            "from BoxMap import BoxMap\n"
+            "from BoxMap_assets import MST\n"
+            "BoxMap(MST(10, 100, 100, 10, 1, rng=random.Random(1)))\n"
+            f"print(','.join(name for name in {OPTIONAL_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=REPO)
+    assert result.stdout.strip() == ""
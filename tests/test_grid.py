@@ -0,0 +1,40 @@
+import BoxMap as box_map_module
+from BoxMap_assets import OccupancyGrid, GridRoomIndex, Room, RoomRaster, SparseRoomRaster
+import numpy as np
+import random
+import pytest
+
+
+def make_rooms(seed: int) -> GridRoomIndex:
+    rng = random.Random(seed)
+    rooms = GridRoomIndex(12)
+    for _ in range(30):
+        rooms.add(Room((rng.randint(0, 100), rng.randint(0, 100)), 12, rooms, 0, rng))
+    return rooms
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_sparse_raster_matches_dense_raster(seed):
+    rooms = make_rooms(seed)
+    grid = OccupancyGrid((100, 100))
+    cells = np.arange(grid.shape[0] * grid.shape[1])
+    np.testing.assert_array_equal(SparseRoomRaster(grid, rooms).lookup(cells), RoomRaster(grid, rooms).lookup(cells))
+
+
+@pytest.mark.parametrize("grid", [False, True])
+def test_either_raster_builds_the_same_map(monkeypatch, make_map, describe, grid):
+    def build(raster_class):
+        monkeypatch.setattr(box_map_module, "_room_raster", lambda rooms, grid: raster_class(grid, rooms))
+        box_map = make_map(5, 1, grid=grid, num_rooms=60, max_room_size=12)
+        return describe(box_map.get_floors()), [wall.get_boundaries() for wall in box_map.get_walls()]
+    assert build(SparseRoomRaster) == build(RoomRaster)
+
+
+def test_offsets_and_traversals_are_kept_by_cell(make_map):
+    box_map = make_map(2, 1, grid=True, num_rooms=5, map_size=3000, num_cycles=0)
+    assert box_map.grid.offsets is not None and len(box_map.grid.offsets) == len(box_map.grid.floor_order)
+    target = box_map.grid.target(box_map.grid.floor_order[0])
+    target.traverse()
+    assert box_map.grid.traversals == {target._cell: 1}
+    target.reset()
+    assert target.get_times_traversed() == 0
@@ -0,0 +1,42 @@
+from BoxMap_assets import FloorTile, Target
+from TargetHandler import TargetHandler
+from map_cache import MapCache, cache_key
+import pickle
+import os
+
+PARAMETERS = dict(num_rooms=8, map_size_x=100, map_size_y=100, max_room_size=8, seed=4, num_cycles=2, target_offset=1)
+
+
+def test_integer_and_float_offsets_share_a_key():
+    assert cache_key(**dict(PARAMETERS, target_offset=1)) == cache_key(**dict(PARAMETERS, target_offset=1.0))
+
+
+def test_plain_hit_is_the_same_as_a_build(tmp_path, describe):
+    def contents(box_map, target_handler) -> tuple:
+        return (describe(box_map.get_floors()), [(type(floor), type(floor.get_target())) for floor in box_map.get_floors()],
+                [wall.get_boundaries() for wall in box_map.get_walls()], type(target_handler), list(target_handler.targets))
+
+    cache = MapCache(str(tmp_path))
+    built = cache.get_or_build(True, **PARAMETERS)
+    loaded = cache.get_or_build(True, **PARAMETERS)
+    assert cache.stats["memory_hits"] == 1
+    assert contents(*loaded) == contents(*built)
+    assert type(loaded[1]) is TargetHandler and type(loaded[1].targets) is dict
+    assert all(type(floor) is FloorTile and type(floor.get_target()) is Target for floor in loaded[0].get_floors())
+    assert contents(*pickle.loads(pickle.dumps(loaded))) == contents(*built)
+
+
+def test_eviction_drops_the_least_recently_used_maps(tmp_path):
+    cache = MapCache(str(tmp_path), memory_items=0)
+    maps = [dict(PARAMETERS, seed=seed) for seed in range(6)]
+    for parameters in maps:
+        cache.get_or_build(**parameters)
+    sizes = [os.path.getsize(cache._path(cache_key(**parameters))) for parameters in maps]
+    # Oldest first, whatever order the file system times say
+    for age, parameters in enumerate(maps):
+        os.utime(cache._path(cache_key(**parameters)), (1000 + age, 1000 + age))
+
+    cache.max_bytes = sum(sizes[3:])
+    cache._evict()
+    assert cache.stats["evictions"] == 3 and cache.disk_bytes() == cache.max_bytes
+    assert [cache.get(**parameters) is not None for parameters in maps] == [False] * 3 + [True] * 3
@@ -0,0 +1,47 @@
+from map_corpus import CorpusWriter, CorpusReader
+from map_file import map_to_bytes
+import glob
+import os
+
+PARAMETERS = dict(num_rooms=8, map_size_x=100, map_size_y=100, max_room_size=8, num_cycles=2, target_offset=0)
+
+
+def map_bytes(make_map, make_handler, seed: int) -> bytes:
+    box_map = make_map(seed, num_rooms=8, map_size=100, max_room_size=8, num_cycles=2)
+    return map_to_bytes(box_map, make_handler(box_map))
+
+
+def shards(directory) -> list[str]:
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(directory, "shard-*")))
+
+
+def test_one_map_per_writer_fills_one_shard(make_map, make_handler, tmp_path):
+    maps = {seed: map_bytes(make_map, make_handler, seed) for seed in range(4)}
+    for seed, data in maps.items():
+        with CorpusWriter(str(tmp_path)) as writer:
+            writer.add_bytes(data, seed, **PARAMETERS)
+    assert shards(tmp_path) == ["shard-00000.index.npy", "shard-00000.maps"]
+    reader = CorpusReader(str(tmp_path))
+    assert len(reader) == 4 and all(reader.get_bytes(seed) == data for seed, data in maps.items())
+
+    # A full shard isn't carried on with
+    with CorpusWriter(str(tmp_path), shard_size=1) as writer:
+        writer.add_bytes(maps[0], 10, **PARAMETERS)
+    assert "shard-00001.maps" in shards(tmp_path)
+
+
+def test_writers_dont_share_a_shard(make_map, make_handler, tmp_path):
+    data = map_bytes(make_map, make_handler, 1)
+    with CorpusWriter(str(tmp_path)) as writer:
+        writer.add_bytes(data, 0, **PARAMETERS)
+
+    first, second = CorpusWriter(str(tmp_path)), CorpusWriter(str(tmp_path))
+    first.add_bytes(data, 1, **PARAMETERS)
+    second.add_bytes(data, 2, **PARAMETERS)
+    # The first writer dies before closing its shard: the maps that were indexed are still there
+    first._shard_file.close()
+    second.close()
+    reader = CorpusReader(str(tmp_path))
+    assert sorted(reader.index["seed"].tolist()) == [0, 2]
+    assert reader.find(0)["shard"] == 0 and reader.find(2)["shard"] == 1
+    assert reader.get_bytes(0) == data
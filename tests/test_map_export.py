@@ -0,0 +1,68 @@
+from map_export import merge_tiles, merge_cells, merge_lines, _cells
+from map_render import tile_boundaries
+import numpy as np
+import json
+import pytest
+
+
+def cell_set(rectangles: np.ndarray) -> set:
+    x, y = _cells(rectangles)
+    return set(zip(x.tolist(), y.tolist()))
+
+
+def area(rectangles: np.ndarray) -> int:
+    return int(((rectangles[:, 2] - rectangles[:, 0]) * (rectangles[:, 3] - rectangles[:, 1])).sum())
+
+
+def line_points(lines: np.ndarray) -> set:
+    # Every half unit along the lines, so lines that touch end to end and ones with a gap can be told apart
+    points = set()
+    for left_x, bottom_y, right_x, top_y in lines.tolist():
+        if left_x == right_x:
+            points |= {("x", left_x, y) for y in range(2 * bottom_y, 2 * top_y + 1)}
+        else:
+            points |= {("y", bottom_y, x) for x in range(2 * left_x, 2 * right_x + 1)}
+    return points
+
+
+def is_line(rectangles: np.ndarray) -> np.ndarray:
+    return (rectangles[:, 0] == rectangles[:, 2]) | (rectangles[:, 1] == rectangles[:, 3])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_merged_boxes_cover_the_tiles_exactly(make_map, seed):
+    box_map = make_map(seed, num_rooms=60, map_size=400, num_cycles=5)
+    geometry = merge_tiles(box_map)
+    floors = tile_boundaries(box_map.get_floors())
+    walls = tile_boundaries(box_map.get_walls())
+    merged_walls = geometry.walls
+
+    assert cell_set(geometry.floors) == cell_set(floors)
+    assert area(geometry.floors) == len(cell_set(geometry.floors))  # no overlaps
+    assert cell_set(merged_walls[~is_line(merged_walls)]) == cell_set(walls[~is_line(walls)])
+    assert area(merged_walls[~is_line(merged_walls)]) == len(cell_set(merged_walls[~is_line(merged_walls)]))
+    assert line_points(merged_walls[is_line(merged_walls)]) == line_points(walls[is_line(walls)])
+
+    stats = geometry.stats
+    assert stats["merged_away"] == len(floors) + len(walls) - geometry.get_num_boxes()
+    assert geometry.get_num_boxes() < (len(floors) + len(walls)) / 2
+
+
+def test_greedy_meshing_stacks_equal_runs():
+    # An L of unit cells: two rows of width 3, then one cell
+    cells = np.array([(x, y, x + 1, y + 1) for x, y in [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1), (0, 2)]])
+    assert merge_cells(cells).tolist() == [[0, 0, 3, 2], [0, 2, 1, 3]]
+
+
+def test_lines_merge_only_when_touching():
+    lines = np.array([(0, 0, 0, 2), (0, 2, 0, 5), (0, 6, 0, 7), (1, 0, 3, 0)])
+    assert sorted(merge_lines(lines).tolist()) == [[0, 0, 0, 5], [0, 6, 0, 7], [1, 0, 3, 0]]
+
+
+def test_json_export(make_map, tmp_path):
+    geometry = merge_tiles(make_map(1, num_rooms=10, map_size=150, num_cycles=5))
+    path = tmp_path / "map_geometry.json"
+    geometry.save_json(str(path), scale=100)
+    saved = json.loads(path.read_text())
+    assert len(saved["floors"]) + len(saved["walls"]) == geometry.get_num_boxes()
+    assert saved["stats"] == geometry.stats
@@ -0,0 +1,40 @@
+from BoxMap_assets import FloorTile
+from map_file import map_to_bytes, load_map_bytes, save_map, load_map
+import pickle
+import pytest
+
+
+@pytest.fixture
+def saved(make_map, make_handler):
+    box_map = make_map(5, num_rooms=30, map_size=400, num_cycles=2)
+    return box_map, make_handler(box_map)
+
+
+def test_round_trip_keeps_tiles_and_links(saved, describe):
+    box_map, target_handler = saved
+    loaded_map, loaded_handler = load_map_bytes(map_to_bytes(box_map, target_handler))
+    assert describe(loaded_map.get_floors()) == describe(box_map.get_floors())
+    assert [wall.get_boundaries() for wall in loaded_map.get_walls()] == [wall.get_boundaries() for wall in box_map.get_walls()]
+    for coordinates, target in target_handler.targets.items():
+        loaded = loaded_handler.targets[coordinates]
+        assert [t.get_coordinates() for t in loaded.get_adjacent_targets()] == [t.get_coordinates() for t in target.get_adjacent_targets()]
+
+
+def test_loaded_handler_accepts_new_targets(saved):
+    _, loaded_handler = load_map_bytes(map_to_bytes(*saved))
+    num_targets = len(loaded_handler.targets)
+    floor = FloorTile(-10, -10, -9, -9)
+    loaded_handler.add_targets_from_tiles([floor])
+    assert len(loaded_handler.targets) == num_targets + 1
+    assert loaded_handler.get_current_target(floor.get_target().get_coordinates()) is floor.get_target()
+
+
+def test_loaded_map_pickles_with_its_links(saved, describe, tmp_path):
+    box_map, target_handler = saved
+    path = str(tmp_path / "BoxNav_map.boxmap")
+    save_map(path, box_map, target_handler)
+    loaded_map, loaded_handler = pickle.loads(pickle.dumps(load_map(path)))
+    assert describe(loaded_map.get_floors()) == describe(box_map.get_floors())
+    for coordinates, target in target_handler.targets.items():
+        loaded = loaded_handler.targets[coordinates]
+        assert [t.get_coordinates() for t in loaded.get_adjacent_targets()] == [t.get_coordinates() for t in target.get_adjacent_targets()]
@@ -0,0 +1,21 @@
+from map_render import render_map, save_png, default_scale, COLORS
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("scale", [None, 1, 3])
+def test_png_decodes_to_the_rendered_map(make_map, tmp_path, scale):
+    from matplotlib.image import imread
+    box_map = make_map(2, 0.3, num_rooms=20, map_size=150)
+    path = str(tmp_path / "map_visualization.png")
+    save_png(path, box_map, scale)
+
+    decoded = imread(path)
+    width, height = box_map.map.get_map_size()
+    pixels = scale or default_scale(box_map)
+    assert decoded.shape == (height * pixels, width * pixels, 3)
+    # Row 0 of the file is the top of the map
+    expected = render_map(box_map, scale, connections=True)[::-1]
+    np.testing.assert_array_equal(np.round(decoded * 255).astype(np.uint8), expected)
+    for color in ("floor", "wall", "room_wall", "target"):
+        assert (expected == COLORS[color]).all(axis=2).any(), color
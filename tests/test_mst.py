@@ -0,0 +1,115 @@
+from BoxMap import BoxMap, _hallway_blueprint
+from BoxMap_assets import MST
+from BoxMap_assets.MinimumSpanningTree import _create_points, _generate_sparse_graph
+import pickle
+import heapq
+import random
+import pytest
+
+
+def tree_weight(mst: MST) -> int:
+    return sum(distance for connections in mst.get_mst().values() for _, distance in connections)
+
+
+# The small maps put several rooms on the same spot
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("num_rooms, map_size", [(60, 300), (200, 60), (400, 5000)])
+def test_sparse_tree_weighs_the_same_as_the_complete_one(seed, num_rooms, map_size):
+    complete = MST(num_rooms, map_size, map_size, 10, seed)
+    sparse = MST(num_rooms, map_size, map_size, 10, seed, backend="sparse")
+    assert set(sparse.get_mst()) == set(complete.get_mst()) == set(complete.get_vertices())
+    assert sum(len(connections) for connections in sparse.get_mst().values()) == len(sparse.get_mst()) - 1
+    assert tree_weight(sparse) == tree_weight(complete)
+
+
+def test_sparse_graph_keeps_at_most_four_edges_per_room():
+    points = _create_points(2000, 10000, 10000, 10, random.Random(1))
+    graph = _generate_sparse_graph(points)
+    assert sum(len(edges) for edges in graph.values()) <= 2 * 4 * len(graph)
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("num_rooms, map_size", [(60, 300), (200, 60)])
+def test_array_backend_places_the_same_rooms(seed, num_rooms, map_size):
+    complete = MST(num_rooms, map_size, map_size, 10, seed)
+    array = MST(num_rooms, map_size, map_size, 10, seed, backend="array")
+    assert array.get_vertices() == complete.get_vertices()
+    assert array.points.tolist() == [list(vertex) for vertex in complete.get_vertices()]
+    assert set(array.get_mst()) == set(complete.get_mst())
+    assert tree_weight(array) == tree_weight(complete)
+    # BoxMap goes on drawing from the same point in the stream
+    assert array.get_rng().random() == complete.get_rng().random()
+
+
+@pytest.mark.parametrize("backend", ["complete", "sparse", "array"])
+def test_maps_follow_only_their_rng(describe, backend):
+    def build(global_seed):
+        random.seed(global_seed)
+        mst = MST(40, 300, 300, 10, 11, backend=backend)
+        random.random()
+        mst.add_cycles(4)
+        return describe(BoxMap(mst, 0.4).get_floors())
+    assert build(1) == build(2)
+
+    # An rng passed in replaces the seed's
+    mst = MST(40, 300, 300, 10, 99, backend=backend, rng=random.Random(11))
+    mst.add_cycles(4)
+    assert describe(BoxMap(mst, 0.4).get_floors()) == build(3)
+
+
+def scan_connected(tree: dict, room1: tuple, room2: tuple) -> bool:
+    # The adjacency list scan connectivity checks used to do
+    return any(to == room2 for to, _ in tree[room1]) or any(to == room1 for to, _ in tree[room2])
+
+
+def add_cycles_from_all_pairs(tree: dict, vertices: list, num_cycles: int) -> None:
+    # The all-pairs heap add_cycles used to build
+    def connected(room1, room2):
+        return scan_connected(tree, room1, room2)
+    pairs = []
+    for i, vertex1 in enumerate(vertices):
+        for vertex2 in vertices[i + 1:]:
+            if not connected(vertex1, vertex2):
+                distance = abs(vertex1[0] - vertex2[0]) + abs(vertex1[1] - vertex2[1])
+                heapq.heappush(pairs, (distance, vertex1, vertex2))
+    for _ in range(min(num_cycles, len(pairs))):
+        distance, room1, room2 = heapq.heappop(pairs)
+        tree[room1].append((room2, distance))
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("backend", ["complete", "sparse", "array"])
+@pytest.mark.parametrize("num_rooms, map_size", [(80, 400), (60, 40), (6, 300)])
+def test_cycles_come_in_the_all_pairs_order(seed, backend, num_rooms, map_size):
+    mst = MST(num_rooms, map_size, map_size, 10, seed, backend=backend)
+    tree = {room: list(connections) for room, connections in mst.get_mst().items()}
+    for num_cycles in (5, 1, 30):
+        mst.add_cycles(num_cycles)
+        add_cycles_from_all_pairs(tree, mst.get_vertices(), num_cycles)
+        assert mst.get_mst() == tree
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("num_rooms, map_size", [(80, 400), (60, 40)])
+def test_edge_index_matches_the_tree(seed, num_rooms, map_size):
+    mst = MST(num_rooms, map_size, map_size, 10, seed)
+    mst.add_cycles(10)
+    tree = mst.get_mst()
+    edges = list(mst.get_edges())
+    assert len(edges) == len({(room1, room2) for room1, room2, _ in edges}) == mst.get_num_edges()
+    assert sorted(edges) == sorted({(min(frm, to), max(frm, to), distance)
+                                    for frm, connections in tree.items() for to, distance in connections})
+    rooms = list(tree)
+    for room1 in rooms[:20]:
+        for room2 in rooms:
+            assert mst.is_connected(room1, room2) == mst.is_connected(room2, room1) == scan_connected(tree, room1, room2)
+
+    # The blueprint the pairwise scan used to give, duplicate rooms included
+    vertices = mst.get_vertices()
+    assert _hallway_blueprint(mst) == [(vertices[i], vertices[j]) for i in range(len(vertices)) for j in range(i + 1, len(vertices))
+                                       if scan_connected(tree, vertices[i], vertices[j])]
+
+    loaded = pickle.loads(pickle.dumps(mst))
+    assert "edge_index" not in vars(loaded)
+    # Rebuilt room by room, so only the order can differ
+    assert sorted(loaded.get_edges()) == sorted(edges)
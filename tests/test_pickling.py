@@ -0,0 +1,56 @@
+from TargetHandler import TargetHandler, ArrayTargetHandler
+import pickle
+import sys
+import os
+import pytest
+
+
+def dumps_shallow(obj) -> bytes:
+    # A hallway is hundreds of targets long, so following the links would need far more than this
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        return pickle.dumps(obj)
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+
+
+@pytest.mark.parametrize("grid", [False, True])
+def test_box_map_pickles_without_recursing(make_map, describe, grid):
+    box_map = make_map(3, grid=grid, map_size=600, num_cycles=3)
+    loaded = pickle.loads(dumps_shallow(box_map))
+    assert describe(loaded.get_floors()) == describe(box_map.get_floors())
+    assert [wall.get_boundaries() for wall in loaded.get_walls()] == [wall.get_boundaries() for wall in box_map.get_walls()]
+
+
+@pytest.mark.parametrize("handler_class", [TargetHandler, ArrayTargetHandler])
+def test_target_handler_pickles_without_recursing(make_map, make_handler, handler_class):
+    target_handler = make_handler(make_map(3, map_size=600, num_cycles=3), handler_class)
+    coordinates = target_handler.get_starting_coordinate()
+    for _ in range(100):
+        target_handler.traverse_target(coordinates)
+        coordinates = target_handler.find_new_target(coordinates)
+
+    loaded = pickle.loads(dumps_shallow(target_handler))
+    loaded_coordinates = coordinates
+    for _ in range(1000):
+        target_handler.traverse_target(coordinates)
+        loaded.traverse_target(loaded_coordinates)
+        coordinates = target_handler.find_new_target(coordinates)
+        loaded_coordinates = loaded.find_new_target(loaded_coordinates)
+        assert loaded_coordinates == coordinates
+
+
+def test_old_pickles_pickle_again(old_pickles, describe):
+    with open(os.path.join(old_pickles, "BoxNav_map.pkl"), "rb") as map_file:
+        box_map = pickle.load(map_file)
+    with open(os.path.join(old_pickles, "target_handler.pkl"), "rb") as target_file:
+        target_handler = pickle.load(target_file)
+
+    loaded_map = pickle.loads(dumps_shallow(box_map))
+    assert describe(loaded_map.get_floors()) == describe(box_map.get_floors())
+    loaded_handler = pickle.loads(dumps_shallow(target_handler))
+    assert {coordinates: [t.get_coordinates() for t in target.get_adjacent_targets()]
+            for coordinates, target in loaded_handler.targets.items()} == \
+           {coordinates: [t.get_coordinates() for t in target.get_adjacent_targets()]
+            for coordinates, target in target_handler.targets.items()}
@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_target_links_match_the_targets(make_map, seed):
+    box_map = make_map(seed, stats=True, num_rooms=60, num_cycles=5)
+    links = sum(len(floor.get_target().get_adjacent_targets()) for floor in box_map.get_floors())
+    assert box_map.stats.counters["target_links"] == links
+
+
+def test_counting_builds_no_grid_targets(make_map):
+    counted, plain = (make_map(1, grid=True, stats=stats, num_rooms=60, num_cycles=5) for stats in (True, None))
+    assert len(counted.grid._targets) == len(plain.grid._targets)
+
+
+def test_trace_memory_gives_a_peak_per_stage(make_map):
+    import tracemalloc
+    from BoxMap_assets import BuildStats
+    stats = BuildStats(trace_memory=True)
+    tracemalloc.start()
+    try:
+        make_map(1, stats=stats, num_rooms=60, num_cycles=5)
+    finally:
+        tracemalloc.stop()
+    assert set(stats.peak_bytes) == set(stats.seconds)
+    assert stats.peak_bytes["hallways"] > 0
+    assert BuildStats().peak_bytes is None
+
+
+@pytest.mark.parametrize("map_size", [300, 3000])
+def test_route_counts_every_room_lookup(make_map, monkeypatch, map_size):
+    from BoxMap_assets import RoomRaster, SparseRoomRaster
+    calls = {"find": 0, "cells": 0}
+    for raster in (RoomRaster, SparseRoomRaster):
+        def find(self, x, y, find=raster.find):
+            calls["find"] += 1
+            return find(self, x, y)
+        def lookup(self, cells, lookup=raster.lookup):
+            calls["cells"] += len(cells)
+            return lookup(self, cells)
+        monkeypatch.setattr(raster, "find", find)
+        monkeypatch.setattr(raster, "lookup", lookup)
+    box_map = make_map(2, stats=True, map_size=map_size, num_rooms=60, num_cycles=5)
+    counters = box_map.stats.counters
+    assert counters["lookup_cells"] == calls["cells"] > 0
+    assert counters["containment_queries"] == calls["find"]
+    assert counters["overlap_queries"] == 4 * 60
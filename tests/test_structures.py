@@ -0,0 +1,75 @@
+from BoxMap import BoxMap
+from BoxMap_assets import Room, RoomIndex, GridRoomIndex, FloorTile
+from BoxMap_assets.structures import _build_walls, is_in_any_room
+import random
+import pytest
+
+
+def make_rooms(seed: int, cell_size: int) -> tuple[RoomIndex, GridRoomIndex]:
+    rng = random.Random(seed)
+    rooms, grid_rooms = RoomIndex(), GridRoomIndex(cell_size)
+    for _ in range(40):
+        room = Room((rng.randint(-20, 100), rng.randint(-20, 100)), 12, grid_rooms, 0, rng)
+        rooms.add(room)
+        grid_rooms.add(room)
+    return rooms, grid_rooms
+
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("cell_size", [1, 7, 500])
+def test_grid_index_answers_like_a_scan(seed, cell_size):
+    rooms, grid_rooms = make_rooms(seed, cell_size)
+    for x in range(-40, 120):
+        for y in range(-40, 120):
+            assert grid_rooms.find(x, y) is rooms.find(x, y)
+    rng = random.Random(seed)
+    for _ in range(300):
+        left_x, bottom_y = rng.randint(-40, 120), rng.randint(-40, 120)
+        box = (left_x, bottom_y, left_x + rng.randint(0, 30), bottom_y + rng.randint(0, 30))
+        assert {id(room) for room in grid_rooms.overlapping(*box)} == {id(room) for room in rooms.overlapping(*box)}
+
+
+@pytest.mark.parametrize("grid", [False, True])
+def test_maps_dont_depend_on_the_room_index(make_mst, describe, grid):
+    scanned, indexed = (BoxMap(make_mst(4, num_rooms=60), 1, room_index=room_index, grid=grid)
+                        for room_index in (RoomIndex, None))
+    assert describe(indexed.get_floors()) == describe(scanned.get_floors())
+    assert [wall.get_boundaries() for wall in indexed.get_walls()] == [wall.get_boundaries() for wall in scanned.get_walls()]
+
+
+def walls_by_position(floor: FloorTile, rooms) -> list[tuple]:
+    # The position by position walk room walls used to be built with
+    left_x, bottom_y, right_x, top_y = floor.get_boundaries()
+    walls = []
+    for constant, range_start, range_end, vertical in ((left_x, bottom_y, top_y, True), (top_y, left_x, right_x, False),
+                                                       (right_x, bottom_y, top_y, True), (bottom_y, left_x, right_x, False)):
+        start = None
+        for pos in range(range_start, range_end + 1):
+            point = (pos, constant) if vertical else (constant, pos)
+            if is_in_any_room(*point, rooms) is None:
+                if start is None:
+                    start = pos
+                if pos < range_end:
+                    continue
+                end = pos
+            elif start is None:
+                continue
+            else:
+                end = pos - 1
+            walls.append((constant, start, constant, end) if vertical else (start, constant, end, constant))
+            start = None
+    return walls
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("index", [GridRoomIndex, list])
+def test_walls_match_the_position_by_position_walk(seed, index):
+    rng = random.Random(seed)
+    rooms = index()
+    add = rooms.append if index is list else rooms.add
+    # Crowded enough that most rooms overlap several others
+    for _ in range(60):
+        room = Room((rng.randint(0, 60), rng.randint(0, 60)), 12, rooms, 0, rng)
+        assert [wall.get_boundaries() for wall in _build_walls(room.get_floor(), rooms)] == walls_by_position(room.get_floor(), rooms)
+        assert [wall.get_boundaries() for wall in room.get_walls()] == walls_by_position(room.get_floor(), rooms)
+        add(room)
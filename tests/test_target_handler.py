@@ -0,0 +1,113 @@
+from BoxMap_assets import FloorTile
+from TargetHandler import TargetHandler, ArrayTargetHandler, BucketTargetHandler, BatchTargetHandler
+import numpy as np
+import random
+import pytest
+
+
+def walk(target_handler: TargetHandler, steps: int) -> list[tuple]:
+    coordinates = target_handler.get_starting_coordinate()
+    visited = [coordinates]
+    for _ in range(steps):
+        target_handler.traverse_target(coordinates)
+        coordinates = target_handler.find_new_target(coordinates)
+        visited.append(coordinates)
+    return visited
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_least_traversed_walks_match(make_map, make_handler, seed):
+    box_map = make_map(seed, 1, map_size=250)
+    handlers = [make_handler(box_map), make_handler(box_map, ArrayTargetHandler),
+                make_handler(box_map, BucketTargetHandler, tie_break="last")]
+    walks = [walk(target_handler, 3000) for target_handler in handlers]
+    assert walks[1] == walks[0] and walks[2] == walks[0]
+    # Again from scratch, through the array and bucket rebuilds
+    for target_handler in handlers:
+        target_handler.reset_targets()
+    assert [walk(target_handler, 500) for target_handler in handlers] == [walk_[:501] for walk_ in walks]
+
+
+def reachable(target_handler: ArrayTargetHandler, target_id: int) -> set[int]:
+    found = {target_id}
+    queue = [target_id]
+    while queue:
+        for adjacent_id in target_handler.get_adjacency_rows()[queue.pop()]:
+            if adjacent_id not in found:
+                found.add(adjacent_id)
+                queue.append(adjacent_id)
+    return found
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_frontier_walk_visits_everything_reachable(make_map, make_handler, seed):
+    box_map = make_map(seed, 1, map_size=250)
+    target_handler = make_handler(box_map, BucketTargetHandler, mode="frontier")
+    coordinates = target_handler.get_starting_coordinate()
+    left = reachable(target_handler, target_handler.get_target_id(coordinates))
+    steps = 0
+    while left:
+        target_handler.traverse_target(coordinates)
+        left.discard(target_handler.get_target_id(coordinates))
+        next_coordinates = target_handler.find_new_target(coordinates)
+        assert any(adjacent.get_coordinates() == next_coordinates
+                   for adjacent in target_handler.get_adjacent_targets(coordinates))
+        coordinates = next_coordinates
+        steps += 1
+        assert steps <= 4 * len(target_handler.targets)
+
+
+def test_frontier_falls_back_when_the_rest_is_unreachable(make_map, make_handler):
+    box_map = make_map(1, 1, map_size=250)
+    target_handler = make_handler(box_map, BucketTargetHandler, mode="frontier")
+    reference = make_handler(box_map, BucketTargetHandler)
+    # Nothing links to this one, so the frontier can never be emptied
+    for handler in (target_handler, reference):
+        handler.add_targets_from_tiles([FloorTile(-50, -50, -49, -49)])
+    for handler in (target_handler, reference):
+        coordinates = handler.get_starting_coordinate()
+        for _ in range(20 * len(handler.targets)):
+            handler.traverse_target(coordinates)
+            coordinates = handler.find_new_target(coordinates)
+    assert len(target_handler.frontier) == 1 and target_handler._stuck_at == 1
+    # Stuck, it picks what the least traversed rule picks on the same counts
+    reference.counts[:] = target_handler.counts
+    reference._build_buckets()
+    for coordinates in list(target_handler.targets)[:200]:
+        target_id = target_handler.get_target_id(coordinates)
+        assert target_handler.find_new_target_id(target_id) == reference.find_new_target_id(target_id)
+
+    # Once the frontier is empty there is nothing to search for
+    target_handler.traverse_target((-49.5, -49.5))
+    coordinates = target_handler.get_starting_coordinate()
+    target_handler.find_new_target(coordinates)
+    assert not target_handler.frontier and target_handler._stuck_at == 1
+
+
+def test_batch_steps_match_separate_handlers(make_map, make_handler):
+    maps = [make_map(seed, 1, map_size=250) for seed in range(3)]
+    handlers = [make_handler(box_map, ArrayTargetHandler) for box_map in maps]
+    agent_handlers = [0, 0, 1, 2, 1, 0]
+    batch = BatchTargetHandler(handlers, agent_handlers)
+    # Agents sharing a map start in different places
+    rng = random.Random(0)
+    target_ids = np.array([rng.randrange(len(handlers[h].counts)) for h in agent_handlers])
+    # Plain handlers count in the map's own targets, so each agent needs its own copy of the map
+    agents = [make_handler(make_map(h, 1, map_size=250)) for h in agent_handlers]
+    coordinates = [handlers[h].get_coordinates(target_id) for h, target_id in zip(agent_handlers, target_ids)]
+
+    for step in range(3000):
+        if step == 1500:
+            batch.reset_targets([1, 3])
+            for agent in (1, 3):
+                agents[agent].reset_targets()
+        target_ids, counts = batch.step(target_ids)
+        for agent, target_handler in enumerate(agents):
+            target_handler.traverse_target(coordinates[agent])
+            assert counts[agent] == target_handler.get_current_target(coordinates[agent]).get_times_traversed()
+            coordinates[agent] = target_handler.find_new_target(coordinates[agent])
+        assert [handlers[h].get_coordinates(target_id) for h, target_id in zip(agent_handlers, target_ids)] == coordinates
+        if step % 100 == 0:
+            assert batch.is_fully_traveresed().tolist() == [target_handler.is_fully_traveresed() for target_handler in agents]
+    # Long enough for some agents to have covered their map, but not all
+    assert 0 < batch.is_fully_traveresed().sum() < len(agents)
@@ -0,0 +1,28 @@
+from target_paths import PathEngine
+import random
+import pytest
+
+
+@pytest.fixture
+def engine(make_map, make_handler) -> PathEngine:
+    return PathEngine(make_handler(make_map(2, 1, num_cycles=8)), cache_size=0)
+
+
+def test_search_finds_shortest_paths(engine):
+    coordinates = engine.target_handler.get_all_coordinates()
+    rows = engine.target_handler.get_adjacency_rows()
+    rng = random.Random(0)
+    for _ in range(200):
+        start, goal = rng.choice(coordinates), rng.choice(coordinates)
+        steps = int(engine._bfs(engine.get_target_id(start))[engine.get_target_id(goal)])
+        path = engine.path(start, goal)
+        assert engine.distance(start, goal) == (None if steps < 0 else steps)
+        if path is not None:
+            ids = [engine.get_target_id(c) for c in path]
+            assert path[0] == start and path[-1] == goal and len(path) == steps + 1
+            assert all(next_id in rows[target_id] for target_id, next_id in zip(ids, ids[1:]))
+
+
+def test_search_to_itself(engine):
+    start = engine.target_handler.get_all_coordinates()[0]
+    assert engine.path(start, start) == [start]
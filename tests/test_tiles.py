@@ -0,0 +1,39 @@
+from BoxMap_assets import FloorTile, WallTile, Target
+import pickle
+import os
+import pytest
+
+
+def test_tiles_and_targets_have_no_dict(make_map):
+    box_map = make_map(1, grid=True)
+    objects = [WallTile(0, 0, 1, 1), FloorTile(0, 0, 1, 1), Target(0, 0),
+               box_map.get_floors()[0].get_target(), box_map.get_floors()[-1].get_target()]
+    for obj in objects:
+        assert not hasattr(obj, "__dict__"), type(obj)
+
+
+def test_adjacent_targets_keep_one_copy_in_order():
+    target, first, second = Target(0, 0), Target(1, 0), Target(0, 1)
+    target.add_target(first)
+    target.add_target(second)
+    target.add_target(first)
+    assert target.get_adjacent_targets() == (first, second)
+    target.remove_target(first)
+    assert target.get_adjacent_targets() == (second,)
+    with pytest.raises(KeyError):
+        target.remove_target(first)
+
+
+def test_pickles_from_before_slots_load(old_pickles):
+    adjacent = Target(1, 1)
+    target = Target.__new__(Target)
+    # The attribute dict of an unslotted Target, which kept its neighbours in a set
+    target.__setstate__({"_coordinates": (0, 0), "_times_traversed": 2, "_adjacent_targets": {adjacent}})
+    assert target.get_coordinates() == (0, 0) and target.get_times_traversed() == 2
+    assert target.get_adjacent_targets() == (adjacent,)
+
+    with open(os.path.join(old_pickles, "BoxNav_map.pkl"), "rb") as map_file:
+        box_map = pickle.load(map_file)
+    for floor in box_map.get_floors():
+        assert type(floor.get_target().get_adjacent_targets()) is tuple
+        assert floor.get_type() == "floor"